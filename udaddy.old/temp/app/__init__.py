@@ -1,26 +1,64 @@
 # flake8: noqa
 # This file is used to simplify imports for other modules.
+# 导出的名称在第一次被访问时才导入（PEP 562），
+# 导入 app.core、app.tasks 等子模块时不会连带加载全部CRUD、模型和schema。
+
+import importlib
+
+# 导出名称 -> (模块, 属性)；同名时后面的条目覆盖前面的，与逐行 from ... import 的效果一致
+_LAZY_EXPORTS = {}
 
 # Import CRUDBase and all specific CRUD objects
-from .crud.base import CRUDBase
-from .crud.crud_user import user
-from .crud.crud_agent import agent
-from .crud.crud_dag_template import dag_template
-from .crud.crud_task_instance import task_instance
-from .crud.crud_workflow_instance import workflow_instance
+_LAZY_EXPORTS.update({
+    "CRUDBase": (".crud.base", "CRUDBase"),
+    "user": (".crud.crud_user", "user"),
+    "agent": (".crud.crud_agent", "agent"),
+    "dag_template": (".crud.crud_dag_template", "dag_template"),
+    "task_instance": (".crud.crud_task_instance", "task_instance"),
+    "task_dependency": (".crud.crud_task_dependency", "task_dependency"),
+    "task_result_cache": (".crud.crud_task_result_cache", "task_result_cache"),
+    "workflow_instance": (".crud.crud_workflow_instance", "workflow_instance"),
+})
 
 # Import all models to be accessible for Alembic and other parts of the app
-from .models.user import User
-from .models.agent import Agent
-from .models.dag_template import DAGTemplate
-from .models.task_instance import TaskInstance
-from .models.workflow_instance import WorkflowInstance
+_LAZY_EXPORTS.update({
+    "User": (".models.user", "User"),
+    "Agent": (".models.agent", "Agent"),
+    "DAGTemplate": (".models.dag_template", "DAGTemplate"),
+    "TaskInstance": (".models.task_instance", "TaskInstance"),
+    "WorkflowInstance": (".models.workflow_instance", "WorkflowInstance"),
+})
 
 # Import all schemas
-from .schemas.agent import Agent, AgentCreate, AgentUpdate
-from .schemas.dag_template import DAGTemplate, DAGTemplateCreate, DAGTemplateUpdate
-from .schemas.msg import Msg
-from .schemas.task_instance import TaskInstance, TaskInstanceCreate, TaskInstanceUpdate
-from .schemas.token import Token, TokenPayload
-from .schemas.user import User, UserCreate, UserUpdate
-from .schemas.workflow_instance import WorkflowInstance, WorkflowInstanceCreate, WorkflowInstanceUpdate
\ No newline at end of file
+_LAZY_EXPORTS.update({
+    "Agent": (".schemas.agent", "Agent"),
+    "AgentCreate": (".schemas.agent", "AgentCreate"),
+    "AgentUpdate": (".schemas.agent", "AgentUpdate"),
+    "DAGTemplate": (".schemas.dag_template", "DAGTemplate"),
+    "DAGTemplateCreate": (".schemas.dag_template", "DAGTemplateCreate"),
+    "DAGTemplateUpdate": (".schemas.dag_template", "DAGTemplateUpdate"),
+    "Msg": (".schemas.msg", "Msg"),
+    "TaskInstance": (".schemas.task_instance", "TaskInstance"),
+    "TaskInstanceCreate": (".schemas.task_instance", "TaskInstanceCreate"),
+    "TaskInstanceUpdate": (".schemas.task_instance", "TaskInstanceUpdate"),
+    "Token": (".schemas.token", "Token"),
+    "TokenPayload": (".schemas.token", "TokenPayload"),
+    "User": (".schemas.user", "User"),
+    "UserCreate": (".schemas.user", "UserCreate"),
+    "UserUpdate": (".schemas.user", "UserUpdate"),
+    "WorkflowInstance": (".schemas.workflow_instance", "WorkflowInstance"),
+    "WorkflowInstanceCreate": (".schemas.workflow_instance", "WorkflowInstanceCreate"),
+    "WorkflowInstanceUpdate": (".schemas.workflow_instance", "WorkflowInstanceUpdate"),
+})
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _LAZY_EXPORTS:
+        # 交给导入系统按子模块处理，如 from app import crud
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attr = _LAZY_EXPORTS[name]
+    value = getattr(importlib.import_module(module_name, __name__), attr)
+    globals()[name] = value
+    return value
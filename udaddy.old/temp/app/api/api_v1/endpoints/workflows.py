@@ -8,6 +8,8 @@ from app import crud, schemas
 from app.api import deps
 from app.db import base as models
 from app.managers.workflow_manager import workflow_manager # 导入业务逻辑管理器
+from app.tasks.execution_plan import get_execution_plan
+from app.tasks.memo import lookup_stats
 
 router = APIRouter()
 
@@ -45,6 +47,19 @@ def read_dag_template(
         raise HTTPException(status_code=403, detail="没有权限访问此模板")
     return template
 
+# --- Result Cache Endpoints ---
+
+@router.get("/cache/stats", response_model=schemas.workflow_instance.MemoCacheStats)
+def read_memo_cache_stats(
+    *,
+    db: Session = Depends(deps.get_db),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    获取确定性Agent结果缓存的命中率统计（所有调度器进程累计）以及当前的缓存条目数。
+    """
+    return {**lookup_stats(), "entries": crud.task_result_cache.count(db)}
+
 # --- Workflow Instance Endpoints ---
 
 @router.post("/instances/", response_model=schemas.WorkflowInstanceCreateResponse)
@@ -95,4 +110,47 @@ def get_workflow_instance_status(
     if instance.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="没有权限访问此实例")
         
-    return instance
\ No newline at end of file
+    return instance
+
+
+@router.post("/instances/{instance_id}/rerun", response_model=schemas.WorkflowInstanceCreateResponse)
+def rerun_workflow_instance(
+    *,
+    db: Session = Depends(deps.get_db),
+    instance_id: int,
+    rerun_in: schemas.workflow_instance.WorkflowInstanceRerun,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    增量重跑一个已有的工作流实例。
+    只有 changed_nodes 及其所有下游节点（以及来源实例中没有成功结果的节点）会重新执行，
+    其余节点的已完成结果被复制到新实例中，重跑的开销与改动的范围成正比。
+    """
+    source = crud.workflow_instance.get(db, id=instance_id)
+    if not source:
+        raise HTTPException(status_code=404, detail="工作流实例未找到")
+    if source.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="没有权限访问此实例")
+    # 运行中的实例还没有完整的结果可以复用，复制时也可能读到正在变化的任务
+    if source.status not in (models.WorkflowStatus.COMPLETED, models.WorkflowStatus.FAILED):
+        raise HTTPException(status_code=409, detail=f"只能重跑已完成或已失败的实例，当前状态为 {source.status.value}")
+
+    template = workflow_manager.get_template(db=db, template_id=source.template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="实例所使用的工作流模板未找到")
+    # 重跑实例使用模板的当前版本，changed_nodes 按当前版本校验
+    plan = get_execution_plan(db, template.id)
+    unknown_nodes = [node_id for node_id in rerun_in.changed_nodes if node_id not in plan.node_index]
+    if unknown_nodes:
+        raise HTTPException(status_code=400, detail=f"模板中不存在这些节点: {unknown_nodes}")
+
+    instance = workflow_manager.create_rerun_instance(
+        db=db,
+        source=source,
+        template=template,
+        rerun_in=rerun_in,
+        owner_id=current_user.id
+    )
+    workflow_manager.trigger_workflow_rerun(instance, rerun_in.changed_nodes)
+
+    return {"instance_id": instance.id, "status": instance.status.value}
@@ -1,4 +1,6 @@
 # app/core/config.py
+from typing import List
+
 from pydantic_settings import BaseSettings
 
 from pydantic import PostgresDsn, RedisDsn, EmailStr
@@ -29,6 +31,118 @@ class Settings(BaseSettings):
     FIRST_SUPERUSER_PASSWORD: str
     FIRST_SUPERUSER_EMAIL: EmailStr
 
+    # --- 调度器配置 ---
+    # 每个调度器Worker进程缓存的DAG执行计划数量（LRU淘汰）
+    DAG_PLAN_CACHE_SIZE: int = 256
+    # 结果缓存：只对Agent配置中声明了 deterministic 的Agent生效，命中的任务不再分发给Worker
+    MEMO_CACHE_ENABLED: bool = True
+    # 缓存条目的有效期（秒）和最大条目数，超出时按最近使用时间淘汰
+    MEMO_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    MEMO_CACHE_MAX_ENTRIES: int = 100_000
+    # 同一调度器进程两次淘汰之间的最短间隔（秒）
+    MEMO_CACHE_EVICTION_INTERVAL: float = 60.0
+    # 任务组发件箱：在发件箱中滞留超过该时间（秒）的任务组视为发送失败，由重试的调度事件或定时中继任务重新发送。
+    # 不应小于正常情况下提交与发送之间的间隔，否则正在发送的任务组可能被重复发送
+    SCHEDULER_OUTBOX_RELAY_AFTER_SECONDS: float = 5.0
+    # 定时中继任务（需要运行 celery beat）的执行间隔（秒）
+    SCHEDULER_OUTBOX_RELAY_INTERVAL: float = 30.0
+    # 对账（python -m app.reconcile_counters）时，分发后超过该时间（秒）仍为PENDING、或开始后超过该时间仍为RUNNING的任务
+    # 视为消息丢失或Worker崩溃，重新分发。应大于任务组超时（ASYNC_WORKER_GROUP_TIMEOUT），避免重复执行仍在正常运行的任务
+    SCHEDULER_RESEND_AFTER_SECONDS: float = 2 * 3600
+
+    # --- 优先级调度 ---
+    # 计算队列的基础名称。任务组按所属工作流的 priority 分为三档：<基础名>.high、<基础名>、<基础名>.low
+    COMPUTE_QUEUE: str = "compute_queue"
+    # priority >= PRIORITY_HIGH_THRESHOLD 进入高优先级队列，< PRIORITY_LOW_THRESHOLD 进入低优先级队列，其余为普通
+    PRIORITY_HIGH_THRESHOLD: int = 10
+    PRIORITY_LOW_THRESHOLD: int = 0
+    # 原生异步Worker加权公平消费三档队列的权重（高、普通、低），必须恰好三项。
+    # Celery Worker不使用权重，按档位部署专用的Worker池来达到类似的效果
+    PRIORITY_QUEUE_WEIGHTS: List[int] = [8, 3, 1]
+
+    # --- Worker配置 ---
+    # 每个Worker进程使用一个常驻的后台事件循环执行任务组，而不是每组调用一次 asyncio.run
+    WORKER_PERSISTENT_LOOP: bool = True
+    # 流式结果写回：任务一完成就按微批次写回结果并通知调度器，而不是等待整个任务组结束
+    WORKER_STREAM_RESULTS: bool = True
+    # 微批次的最大结果数和最长等待时间（秒），任一条件满足即写回
+    WORKER_RESULT_FLUSH_SIZE: int = 64
+    WORKER_RESULT_FLUSH_INTERVAL: float = 0.05
+
+    # --- 大对象存储 ---
+    # 存储后端："local"（本地或共享文件系统）、"s3"（S3兼容的对象存储，需要安装boto3）或 "none"（禁用）
+    BLOB_STORE_BACKEND: str = "local"
+    # local后端的存储根目录，需要对调度器和所有Worker可见（通常位于共享文件系统上）；设为空字符串则禁用
+    BLOB_STORE_ROOT: str | None = "/mnt/netbase_shared/blobs"
+    # s3后端的桶、键前缀、服务地址（如MinIO的 http://minio:9000，为空时使用AWS）和区域
+    BLOB_S3_BUCKET: str = "netbase-blobs"
+    BLOB_S3_PREFIX: str = "blobs/"
+    BLOB_S3_ENDPOINT_URL: str | None = None
+    BLOB_S3_REGION: str | None = None
+    # s3后端下，WASM任务的输入大对象被下载到这个本地目录后再挂载进沙箱
+    BLOB_LOCAL_STAGING_ROOT: str = "/tmp/netbase-blob-staging"
+    # 超过该字节数的输入值和任务输出值写入大对象存储，数据库和消息中只保存引用。
+    # 只对Agent配置中声明了 blob_refs 的Agent生效，其它Agent的数据始终内联
+    BLOB_INLINE_THRESHOLD_BYTES: int = 1024 * 1024
+    # 大对象GC（python -m app.gc_blobs）：删除不被任何任务实例的输入/输出或结果缓存引用、
+    # 且超过该时间（秒）未被写入或重新引用的对象。应远大于写入大对象到提交引用它的任务行之间的时间
+    BLOB_GC_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # --- WASM运行时配置 ---
+    # 共享文件系统的根目录，仅供声明了 shared_fs 的Agent使用；设为空字符串则禁用
+    SHARED_FS_ROOT: str | None = "/mnt/netbase_shared"
+    # 本地（建议为tmpfs）工作区目录池的根目录，以及每个进程预先创建的目录数
+    WASM_WORKSPACE_ROOT: str = "/dev/shm/netbase-workspaces"
+    WASM_WORKSPACE_POOL_SIZE: int = 32
+    # 资源限制的默认值，可被Agent配置或节点定义中的 resource_limits 逐项覆盖
+    WASM_DEFAULT_FUEL: int = 100_000_000  # 约等于几百毫秒的纯计算时间
+    WASM_DEFAULT_MAX_MEMORY_BYTES: int = 512 * 1024 ** 2  # 单个Store的线性内存上限
+    WASM_DEFAULT_MAX_TABLE_ELEMENTS: int = -1  # -1 表示不限制
+    WASM_DEFAULT_TIMEOUT: float = 5.0  # 墙钟超时（秒）
+    # 推进引擎epoch的间隔（秒），即超时检测的精度
+    WASM_EPOCH_TICK_SECONDS: float = 0.01
+    # 预编译模块的磁盘缓存目录，同一主机上的所有Worker进程共享；设为空字符串则禁用
+    WASM_ARTIFACT_CACHE_DIR: str | None = "/var/cache/netbase/wasm_artifacts"
+    # 磁盘缓存的容量上限（字节），超出后按最近使用时间淘汰
+    WASM_ARTIFACT_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
+    # WASM任务的执行位置: "inline"（事件循环内）、"thread"（线程池）或 "process"（进程池）
+    WASM_EXECUTOR: str = "thread"
+    # 线程池/进程池大小，默认为CPU核数。prefork模式下每个Celery子进程各有一个执行器，注意不要超额订阅
+    WASM_EXECUTOR_WORKERS: int | None = None
+    # Worker启动时预热最近 WASM_PREWARM_WINDOW_HOURS 小时内最常用的 WASM_PREWARM_TOP_N 个WASM模块
+    WASM_PREWARM_ENABLED: bool = True
+    WASM_PREWARM_TOP_N: int = 20
+    WASM_PREWARM_WINDOW_HOURS: int = 24
+    WASM_PREWARM_CONCURRENCY: int | None = None  # 并行编译的线程数，默认为CPU核数
+    # Worker进程预热完成后写入的就绪文件，供编排系统的就绪探针检查；设为空字符串则不写入。
+    # {pid} 会被替换为进程号：每个Celery子进程和原生异步Worker进程各写各的文件，互不覆盖或删除；
+    # 被强制杀死的进程遗留的文件在下一个Worker进程启动时删除
+    WORKER_READY_FILE: str | None = "/tmp/netbase-worker-{pid}.ready"
+    # Celery子进程初始化（包括模块预热）的最长时间（秒），超时的子进程会被主进程终止并重建
+    WORKER_PROCESS_INIT_TIMEOUT: float = 60.0
+    # 同一任务组内同一模块的WASM任务自动合并为批量执行，单批最多 WASM_BATCH_MAX_SIZE 个任务
+    WASM_BATCH_ENABLED: bool = True
+    WASM_BATCH_MAX_SIZE: int = 256
+    # 进程内已编译模块缓存的容量上限（条目数和WASM字节码总字节数）
+    WASM_MODULE_CACHE_MAX_ENTRIES: int = 64
+    WASM_MODULE_CACHE_MAX_BYTES: int = 512 * 1024 ** 2
+    # 实例池：复用模块的预链接结果；声明 stateless 的Agent还会复用Store和实例
+    WASM_INSTANCE_POOL_ENABLED: bool = True
+    # 每个模块最多保留的空闲实例数
+    WASM_INSTANCE_POOL_SIZE: int = 8
+    # 单个实例最多被复用的次数，达到后丢弃以回收其线性内存
+    WASM_INSTANCE_MAX_REUSE: int = 1000
+
+    # --- 原生异步Worker配置 (python -m app.tasks.async_worker) ---
+    # 所有优先级队列都为空时，在高优先级队列上阻塞等待的时长（秒）；其它队列的新消息最多延迟这么久被发现
+    ASYNC_WORKER_IDLE_WAIT: float = 0.1
+    # 单个进程同时运行的任务组上限，达到上限后停止拉取新消息
+    ASYNC_WORKER_MAX_GROUPS: int = 64
+    # 单个任务组的超时时间（秒），与Celery入口的 soft_time_limit 保持一致
+    ASYNC_WORKER_GROUP_TIMEOUT: float = 3600
+    # Worker名称，决定其“处理中”列表的键名；同一主机上运行多个进程时必须各不相同。默认为主机名
+    ASYNC_WORKER_NAME: str | None = None
+
     class Config:
         # Pydantic将自动从.env文件和环境变量中读取配置
         env_file = ".env"
@@ -1,6 +1,8 @@
 # app/crud/base.py
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import Any, Dict, Generic, Iterator, List, Optional, Sequence, Type, TypeVar, Union
 from pydantic import BaseModel
+from sqlalchemy import update as sa_update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from app.db.base import Base
 
@@ -8,7 +10,14 @@ ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+def _chunks(items: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    # 批量操作每条SQL语句处理的最大行数，可在调用时通过 chunk_size 覆盖
+    bulk_chunk_size: int = 500
+
     def __init__(self, model: Type[ModelType]):
         """
         通用的CRUD对象，包含最常见的数据库操作方法。
@@ -19,6 +28,20 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def get(self, db: Session, id: Any) -> Optional[ModelType]:
         return db.query(self.model).filter(self.model.id == id).first()
 
+    def get_many(
+        self, db: Session, *, ids: Sequence[Any], chunk_size: Optional[int] = None
+    ) -> List[ModelType]:
+        """
+        按ID批量获取对象，每个分块一次IN查询。
+        返回结果的顺序与 ids 一致，不存在的ID会被跳过。
+        """
+        ids = list(dict.fromkeys(ids))
+        found: Dict[Any, ModelType] = {}
+        for chunk in _chunks(ids, chunk_size or self.bulk_chunk_size):
+            for obj in db.query(self.model).filter(self.model.id.in_(chunk)).all():
+                found[obj.id] = obj
+        return [found[id] for id in ids if id in found]
+
     def get_multi(
         self, db: Session, *, skip: int = 0, limit: int = 100
     ) -> List[ModelType]:
@@ -61,4 +84,118 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             db.commit()
         return obj
         db.commit()
-        return obj
\ No newline at end of file
+        return obj
+
+    # --- 批量操作 ---
+    # 以下方法都在单个事务中完成：分块执行SQL，最后只提交一次。
+    # commit=False 时由调用方负责提交，便于与其它变更合并到同一事务。
+    # refresh=False 时跳过提交后的重新加载，适合只关心写入是否成功的热路径。
+
+    @staticmethod
+    def _to_dict(obj_in: Union[BaseModel, Dict[str, Any]], *, exclude_unset: bool = False) -> Dict[str, Any]:
+        if isinstance(obj_in, dict):
+            return obj_in
+        return obj_in.model_dump(exclude_unset=exclude_unset)
+
+    def create_many(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        chunk_size: Optional[int] = None,
+        commit: bool = True,
+        refresh: bool = True,
+    ) -> List[ModelType]:
+        """
+        批量创建对象。每个分块一次flush，主键通过多行 INSERT ... RETURNING 一次性取回，
+        refresh=True 时提交后用一次IN查询重新加载所有对象，而不是逐个refresh。
+        refresh=False 时提交不会使返回的对象过期，访问其属性不会再逐行查询数据库。
+        """
+        db_objs = [self.model(**self._to_dict(obj_in)) for obj_in in objs_in]
+        for chunk in _chunks(db_objs, chunk_size or self.bulk_chunk_size):
+            db.add_all(chunk)
+            db.flush()
+        if commit:
+            if refresh:
+                ids = [db_obj.id for db_obj in db_objs]
+                db.commit()
+                return self.get_many(db, ids=ids, chunk_size=chunk_size)
+            # 相当于本次提交使用 expire_on_commit=False：flush 时已写入的属性保持有效
+            expire_on_commit = db.expire_on_commit
+            db.expire_on_commit = False
+            try:
+                db.commit()
+            finally:
+                db.expire_on_commit = expire_on_commit
+        return db_objs
+
+    def update_many(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[Dict[str, Any]],
+        chunk_size: Optional[int] = None,
+        commit: bool = True,
+        refresh: bool = True,
+    ) -> Optional[List[ModelType]]:
+        """
+        按主键批量更新。objs_in 中每个字典都必须包含 "id" 以及要更新的字段，
+        每个分块以 executemany 方式执行同一条 UPDATE，不需要事先读取对象。
+        refresh=True 时返回更新后的对象，否则返回None。
+        """
+        objs_in = list(objs_in)
+        for chunk in _chunks(objs_in, chunk_size or self.bulk_chunk_size):
+            db.execute(sa_update(self.model), list(chunk))
+        if commit:
+            db.commit()
+        if refresh:
+            return self.get_many(db, ids=[obj_in["id"] for obj_in in objs_in], chunk_size=chunk_size)
+        return None
+
+    def upsert(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        index_elements: Sequence[str] = ("id",),
+        update_fields: Optional[Sequence[str]] = None,
+        chunk_size: Optional[int] = None,
+        commit: bool = True,
+        refresh: bool = True,
+    ) -> Optional[List[ModelType]]:
+        """
+        基于 PostgreSQL INSERT ... ON CONFLICT DO UPDATE 的批量插入或更新。
+        :param index_elements: 冲突判定所用的唯一约束列
+        :param update_fields: 冲突时需要覆盖的列，默认为输入中除冲突列以外的所有列
+        refresh=True 时通过 RETURNING 直接取回最终的行，否则返回None。
+        """
+        rows = [self._to_dict(obj_in) for obj_in in objs_in]
+        if not rows:
+            return [] if refresh else None
+        if update_fields is None:
+            update_fields = [field for field in rows[0] if field not in index_elements]
+
+        results: List[ModelType] = []
+        for chunk in _chunks(rows, chunk_size or self.bulk_chunk_size):
+            stmt = pg_insert(self.model).values(list(chunk))
+            if update_fields:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=list(index_elements),
+                    set_={field: stmt.excluded[field] for field in update_fields},
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=list(index_elements))
+            if refresh:
+                stmt = stmt.returning(self.model).execution_options(populate_existing=True)
+                results.extend(db.scalars(stmt).all())
+            else:
+                db.execute(stmt)
+        if not refresh:
+            if commit:
+                db.commit()
+            return None
+        if commit:
+            ids = [obj.id for obj in results]
+            db.commit()
+            return self.get_many(db, ids=ids, chunk_size=chunk_size)
+        return results
\ No newline at end of file
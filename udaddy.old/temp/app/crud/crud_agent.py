@@ -1,7 +1,9 @@
+from datetime import datetime
 from typing import List
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from app.crud.base import CRUDBase
-from app.db.base import Agent
+from app.db.base import Agent, AgentType, TaskInstance
 from app.schemas.agent import AgentCreate, AgentUpdate
 
 class CRUDAgent(CRUDBase[Agent, AgentCreate, AgentUpdate]):
@@ -29,4 +31,23 @@ class CRUDAgent(CRUDBase[Agent, AgentCreate, AgentUpdate]):
             .all()
         )
 
+    def get_most_used(
+        self, db: Session, *, agent_type: AgentType, since: datetime, limit: int
+    ) -> List[Agent]:
+        """
+        按 since 之后启动的任务数从多到少返回指定类型的Agent；近期未被使用的Agent按最近更新时间排在后面。
+        """
+        usage = func.count(TaskInstance.id)
+        return list(db.scalars(
+            select(self.model)
+            .outerjoin(
+                TaskInstance,
+                (TaskInstance.agent_id == self.model.id) & (TaskInstance.started_at >= since),
+            )
+            .where(self.model.agent_type == agent_type)
+            .group_by(self.model.id)
+            .order_by(usage.desc(), self.model.updated_at.desc())
+            .limit(limit)
+        ))
+
 agent = CRUDAgent(Agent)
\ No newline at end of file
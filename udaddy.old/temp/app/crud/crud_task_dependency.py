@@ -0,0 +1,75 @@
+# app/crud/crud_task_dependency.py
+from collections import defaultdict
+from typing import Dict, List, Type
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.db.base import TaskDependencyCounter
+
+
+class CRUDTaskDependency:
+    def __init__(self, model: Type[TaskDependencyCounter]):
+        """
+        依赖计数表的CRUD对象。
+        该表以 (workflow_instance_id, node_id_in_dag) 为复合主键，没有单列id，
+        因此不继承通用的 CRUDBase。所有方法都不提交事务，由调用方统一提交。
+        """
+        self.model = model
+
+    def init_for_workflow(self, db: Session, *, workflow_instance_id: int, in_degree: Dict[str, int]) -> None:
+        """为一个工作流实例中所有存在上游依赖的节点写入初始计数。"""
+        rows = [
+            {"workflow_instance_id": workflow_instance_id, "node_id_in_dag": node_id, "remaining": count}
+            for node_id, count in in_degree.items() if count > 0
+        ]
+        if rows:
+            db.execute(insert(self.model), rows)
+
+    def reset_for_workflow(self, db: Session, *, workflow_instance_id: int, remaining: Dict[str, int]) -> None:
+        """用重新计算出的剩余依赖数整体替换一个工作流实例的计数，用于崩溃后的对账。"""
+        db.execute(delete(self.model).where(self.model.workflow_instance_id == workflow_instance_id))
+        self.init_for_workflow(db, workflow_instance_id=workflow_instance_id, in_degree=remaining)
+
+    def decrement(self, db: Session, *, workflow_instance_id: int, decrements: Dict[str, int]) -> List[str]:
+        """
+        原子地扣减一组节点的剩余依赖数，返回本次恰好归零（即刚刚就绪）的节点ID。
+        扣减通过 UPDATE ... RETURNING 完成，同一行的并发扣减由行锁串行化，
+        因此只有最后一个完成的上游会看到计数归零：同一个汇合节点既不会被重复分发，也不会被遗漏。
+        先按节点ID顺序加锁，避免两个并发完成事件以相反顺序锁定同一批行而死锁。
+        """
+        if not decrements:
+            return []
+
+        node_ids = sorted(decrements)
+        db.execute(
+            select(self.model.node_id_in_dag)
+            .where(
+                self.model.workflow_instance_id == workflow_instance_id,
+                self.model.node_id_in_dag.in_(node_ids),
+            )
+            .order_by(self.model.node_id_in_dag)
+            .with_for_update()
+        )
+
+        # 绝大多数情况下每个节点只扣减1，按扣减量分组后通常只需一条UPDATE
+        by_amount: Dict[int, List[str]] = defaultdict(list)
+        for node_id in node_ids:
+            by_amount[decrements[node_id]].append(node_id)
+
+        ready_node_ids = []
+        for amount, amount_node_ids in by_amount.items():
+            rows = db.execute(
+                update(self.model)
+                .where(
+                    self.model.workflow_instance_id == workflow_instance_id,
+                    self.model.node_id_in_dag.in_(amount_node_ids),
+                )
+                .values(remaining=self.model.remaining - amount)
+                .returning(self.model.node_id_in_dag, self.model.remaining)
+            ).all()
+            ready_node_ids.extend(node_id for node_id, remaining in rows if remaining == 0)
+        return ready_node_ids
+
+
+task_dependency = CRUDTaskDependency(TaskDependencyCounter)
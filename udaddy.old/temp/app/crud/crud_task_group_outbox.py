@@ -0,0 +1,51 @@
+# app/crud/crud_task_group_outbox.py
+from datetime import datetime
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.crud.base import CRUDBase
+from app.db.base import TaskGroupOutbox
+
+
+class CRUDTaskGroupOutbox(CRUDBase[TaskGroupOutbox, Dict[str, Any], Dict[str, Any]]):
+    """任务组发件箱的CRUD对象。所有方法都不提交事务，由调度器统一提交。"""
+
+    def add(self, db: Session, *, payloads: List[Dict[str, Any]]) -> List[int]:
+        """写入一批任务组载荷，返回发件箱行ID。与任务实例在同一事务中提交，二者要么都落库，要么都不落库。"""
+        if not payloads:
+            return []
+        rows = self.create_many(db, objs_in=[{"payload": payload} for payload in payloads], commit=False, refresh=False)
+        return [row.id for row in rows]
+
+    def lock_many(self, db: Session, *, ids: Sequence[int]) -> List[TaskGroupOutbox]:
+        """
+        以 SELECT ... FOR UPDATE SKIP LOCKED 锁定一批待发送的行，锁持续到调用方提交。
+        已被其它进程锁定（正在发送）或已删除（已发送）的行会被跳过，同一任务组不会被并发地重复发送。
+        """
+        if not ids:
+            return []
+        return list(db.scalars(
+            select(self.model)
+            .where(self.model.id.in_(ids))
+            .order_by(self.model.id)
+            .with_for_update(skip_locked=True)
+        ))
+
+    def lock_stale(self, db: Session, *, created_before: datetime, limit: int) -> List[TaskGroupOutbox]:
+        """锁定最多 limit 行写入时间早于 created_before、且未被其它进程锁定的行，按写入顺序返回。"""
+        return list(db.scalars(
+            select(self.model)
+            .where(self.model.created_at < created_before)
+            .order_by(self.model.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ))
+
+    def delete_many(self, db: Session, *, ids: Sequence[int]) -> None:
+        if ids:
+            db.execute(delete(self.model).where(self.model.id.in_(list(ids))))
+
+
+task_group_outbox = CRUDTaskGroupOutbox(TaskGroupOutbox)
@@ -1,9 +1,196 @@
 # app/crud/crud_task_instance.py
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import Integer, and_, func, insert, literal, or_, select, true, update
+from sqlalchemy.orm import Session
+
 from app.crud.base import CRUDBase
+from app.db.base import TaskStatus
 from app.models.task_instance import TaskInstance
 from app.schemas.task_instance import TaskInstanceCreate, TaskInstanceUpdate
 
 class CRUDTaskInstance(CRUDBase[TaskInstance, TaskInstanceCreate, TaskInstanceUpdate]):
-    pass
+    def bulk_update_status(
+        self, db: Session, *, task_instance_ids: List[int], status: TaskStatus
+    ) -> None:
+        """批量更新一组任务的状态；切换到RUNNING时同时记录开始时间。"""
+        now = datetime.utcnow()
+        values: Dict[str, Any] = {"status": status}
+        if status == TaskStatus.RUNNING:
+            values["started_at"] = now
+        elif status in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+            values["completed_at"] = now
+        self.update_many(
+            db,
+            objs_in=[{"id": task_instance_id, **values} for task_instance_id in task_instance_ids],
+            refresh=False,
+        )
+
+    def bulk_fail_tasks(
+        self, db: Session, *, task_instance_ids: List[int], error_message: str
+    ) -> List[int]:
+        """
+        将一组任务中尚未结束的任务标记为失败并记录错误信息。
+        已经COMPLETED/FAILED的任务保持不变。返回本次被标记为失败的任务ID。
+        """
+        unfinished_ids = [
+            obj.id for obj in self.get_many(db, ids=task_instance_ids)
+            if obj.status not in (TaskStatus.COMPLETED, TaskStatus.FAILED)
+        ]
+        now = datetime.utcnow()
+        self.update_many(
+            db,
+            objs_in=[
+                {"id": task_instance_id, "status": TaskStatus.FAILED, "logs": error_message, "completed_at": now}
+                for task_instance_id in unfinished_ids
+            ],
+            refresh=False,
+        )
+        return unfinished_ids
+
+    def bulk_write_results(self, db: Session, *, results: Dict[int, Dict[str, Any]]) -> None:
+        """
+        将一组任务的执行结果（WasmManager等执行器返回的 {"status", "output", "error", "fuel_consumed"} 字典）
+        通过一次批量UPDATE写回数据库，不需要事先读取任务行。
+        """
+        now = datetime.utcnow()
+        self.update_many(
+            db,
+            objs_in=[
+                {
+                    "id": task_instance_id,
+                    "status": TaskStatus.COMPLETED if result["status"] == "SUCCESS" else TaskStatus.FAILED,
+                    "outputs": result.get("output"),
+                    "logs": result.get("error"),
+                    "fuel_consumed": result.get("fuel_consumed"),
+                    "completed_at": now,
+                }
+                for task_instance_id, result in results.items()
+            ],
+            refresh=False,
+        )
+
+    def claim_completions(self, db: Session, *, task_instance_ids: List[int]) -> List[int]:
+        """
+        原子地将一批任务标记为“调度器已处理”，返回本次成功认领的任务ID。
+        已被处理过（重复投递）的任务不会出现在返回值中，其事件应被直接丢弃。
+        不提交事务，由调用方统一提交。
+        """
+        if not task_instance_ids:
+            return []
+        return list(db.scalars(
+            update(self.model)
+            .where(self.model.id.in_(task_instance_ids), self.model.scheduler_processed.is_(False))
+            .values(scheduler_processed=True)
+            .returning(self.model.id)
+        ))
+
+    def get_node_statuses(self, db: Session, *, workflow_instance_id: int) -> Dict[str, TaskStatus]:
+        """获取一个工作流实例中每个已创建节点的任务状态 (node_id_in_dag -> status)。"""
+        return dict(db.execute(
+            select(self.model.node_id_in_dag, self.model.status)
+            .where(self.model.workflow_instance_id == workflow_instance_id)
+        ).all())
+
+    def get_stale(
+        self, db: Session, *, workflow_instance_id: int, dispatched_before: datetime, started_before: datetime
+    ) -> List[TaskInstance]:
+        """
+        一个工作流实例中疑似丢失的任务：dispatched_before 之前分发却仍为PENDING，
+        或 started_before 之前开始却仍为RUNNING（执行它的Worker可能已崩溃）。
+        """
+        return list(db.scalars(
+            select(self.model)
+            .where(
+                self.model.workflow_instance_id == workflow_instance_id,
+                or_(
+                    and_(self.model.status == TaskStatus.PENDING, self.model.dispatched_at < dispatched_before),
+                    and_(self.model.status == TaskStatus.RUNNING, self.model.started_at < started_before),
+                ),
+            )
+            .order_by(self.model.id)
+        ))
+
+    def mark_redispatched(self, db: Session, *, task_instance_ids: List[int], now: datetime) -> None:
+        """把重新分发的任务恢复为PENDING并刷新分发时间，下一次对账不会立即再次分发它们。不提交事务。"""
+        if task_instance_ids:
+            db.execute(
+                update(self.model)
+                .where(self.model.id.in_(task_instance_ids))
+                .values(status=TaskStatus.PENDING, dispatched_at=now, started_at=None)
+            )
+
+    def get_latest_completed_ids(
+        self, db: Session, *, workflow_instance_id: int, node_ids: List[str]
+    ) -> Dict[str, int]:
+        """一个工作流实例中指定节点最近一次成功完成的任务ID (node_id_in_dag -> task_instance_id)，一次查询。"""
+        if not node_ids:
+            return {}
+        return dict(db.execute(
+            select(self.model.node_id_in_dag, func.max(self.model.id))
+            .where(
+                self.model.workflow_instance_id == workflow_instance_id,
+                self.model.node_id_in_dag.in_(node_ids),
+                self.model.status == TaskStatus.COMPLETED,
+            )
+            .group_by(self.model.node_id_in_dag)
+        ).all())
+
+    def get_outputs(self, db: Session, *, ids: List[int]) -> Dict[int, Any]:
+        """只读取一批任务的 outputs 列 (task_instance_id -> outputs)，不加载整行。"""
+        if not ids:
+            return {}
+        return dict(db.execute(select(self.model.id, self.model.outputs).where(self.model.id.in_(ids))).all())
+
+    def copy_completed(
+        self, db: Session, *, task_instance_ids: List[int], workflow_instance_id: int
+    ) -> List[int]:
+        """
+        把其它工作流实例中已完成的任务复制到 workflow_instance_id 下，用于增量重跑。
+        复制出的任务保留原来的输入、输出和执行时间，标记为 from_cache 且“调度器已处理”，
+        不会再产生结束事件。整个复制是一条 INSERT ... SELECT，任务的输入输出不经过应用进程。
+        返回新任务的ID。不提交事务。
+        """
+        if not task_instance_ids:
+            return []
+        source = select(
+            literal(workflow_instance_id, Integer),
+            self.model.node_id_in_dag,
+            self.model.agent_id,
+            literal(TaskStatus.COMPLETED, self.model.status.type),
+            self.model.inputs,
+            self.model.outputs,
+            literal(0, Integer),
+            self.model.fuel_consumed,
+            self.model.memo_key,
+            true(),
+            true(),
+            self.model.started_at,
+            self.model.completed_at,
+        ).where(self.model.id.in_(task_instance_ids))
+        return list(db.scalars(
+            insert(self.model)
+            .from_select(
+                [
+                    "workflow_instance_id", "node_id_in_dag", "agent_id", "status", "inputs", "outputs",
+                    "retry_count", "fuel_consumed", "memo_key", "from_cache", "scheduler_processed",
+                    "started_at", "completed_at",
+                ],
+                source,
+            )
+            .returning(self.model.id)
+        ))
+
+    def mark_finished_processed(self, db: Session, *, workflow_instance_id: int) -> None:
+        """将一个工作流实例中所有已结束的任务标记为“调度器已处理”。不提交事务。"""
+        db.execute(
+            update(self.model)
+            .where(
+                self.model.workflow_instance_id == workflow_instance_id,
+                self.model.status.in_([TaskStatus.COMPLETED, TaskStatus.FAILED]),
+            )
+            .values(scheduler_processed=True)
+        )
 
-task_instance = CRUDTaskInstance(TaskInstance)
\ No newline at end of file
+task_instance = CRUDTaskInstance(TaskInstance)
@@ -0,0 +1,59 @@
+# app/crud/crud_task_result_cache.py
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.crud.base import CRUDBase
+from app.db.base import TaskResultCache
+
+
+class CRUDTaskResultCache(CRUDBase[TaskResultCache, Dict[str, Any], Dict[str, Any]]):
+    """结果缓存表的CRUD对象。所有方法都不提交事务，由调度器与任务实例的变更一起提交。"""
+
+    def lookup(self, db: Session, *, memo_keys: List[str], now: datetime) -> Dict[str, Any]:
+        """
+        查找一批未过期的缓存条目并同时记录命中（UPDATE ... RETURNING，一次往返），
+        返回 memo_key -> outputs。
+        """
+        if not memo_keys:
+            return {}
+        return dict(db.execute(
+            update(self.model)
+            .where(self.model.memo_key.in_(memo_keys), self.model.expires_at > now)
+            .values(hit_count=self.model.hit_count + 1, last_hit_at=now)
+            .returning(self.model.memo_key, self.model.outputs)
+        ).all())
+
+    def store(self, db: Session, *, entries: List[Dict[str, Any]], now: datetime, ttl_seconds: int) -> None:
+        """写入一批 {memo_key, agent_id, outputs}；键已存在时覆盖输出并重新计算过期时间。"""
+        expires_at = now + timedelta(seconds=ttl_seconds)
+        self.upsert(
+            db,
+            objs_in=[
+                {**entry, "created_at": now, "last_hit_at": now, "expires_at": expires_at}
+                for entry in entries
+            ],
+            index_elements=("memo_key",),
+            update_fields=("outputs", "last_hit_at", "expires_at"),
+            commit=False,
+            refresh=False,
+        )
+
+    def evict(self, db: Session, *, now: datetime, max_entries: int) -> int:
+        """删除所有过期条目，然后按最近使用时间淘汰超出 max_entries 的条目。返回删除的条目数。"""
+        removed = db.execute(delete(self.model).where(self.model.expires_at <= now)).rowcount
+        overflow = (
+            select(self.model.id)
+            .order_by(self.model.last_hit_at.desc())
+            .offset(max_entries)
+        )
+        removed += db.execute(delete(self.model).where(self.model.id.in_(overflow))).rowcount
+        return removed
+
+    def count(self, db: Session) -> int:
+        return db.scalar(select(func.count()).select_from(self.model))
+
+
+task_result_cache = CRUDTaskResultCache(TaskResultCache)
@@ -1,8 +1,69 @@
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
 from app.crud.base import CRUDBase
+from app.db.base import TaskInstance, TaskStatus
 from app.models.workflow_instance import WorkflowInstance
 from app.schemas.workflow_instance import WorkflowInstanceCreate, WorkflowInstanceUpdate
 
 class CRUDWorkflowInstance(CRUDBase[WorkflowInstance, WorkflowInstanceCreate, WorkflowInstanceUpdate]):
-    pass
+    def lock_many(self, db: Session, *, ids: Sequence[int]) -> List[WorkflowInstance]:
+        """
+        以 SELECT ... FOR UPDATE 锁定一批工作流实例并返回最新状态，锁持续到调用方提交或回滚。
+        按ID顺序加锁，并发的事件处理与对账不会以相反顺序锁定同一批实例而死锁。
+        """
+        if not ids:
+            return []
+        return list(db.scalars(
+            select(self.model)
+            .where(self.model.id.in_(ids))
+            .order_by(self.model.id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        ))
+
+    def lock(self, db: Session, *, id: int) -> Optional[WorkflowInstance]:
+        locked = self.lock_many(db, ids=[id])
+        return locked[0] if locked else None
+
+    def record_task_outcomes(
+        self, db: Session, *, workflow_instance_id: int, completed: int = 0, failed: int = 0
+    ) -> Tuple[int, int]:
+        """
+        原子地累加工作流实例的任务结束计数，返回累加后的 (completed_count, failed_count)。
+        使用 UPDATE ... RETURNING，并发的完成事件不会互相覆盖。不提交事务。
+        """
+        return tuple(db.execute(
+            update(self.model)
+            .where(self.model.id == workflow_instance_id)
+            .values(
+                completed_count=self.model.completed_count + completed,
+                failed_count=self.model.failed_count + failed,
+            )
+            .returning(self.model.completed_count, self.model.failed_count)
+        ).one())
+
+    def recompute_task_counts(self, db: Session, *, workflow_instance_id: int) -> Tuple[int, int]:
+        """
+        根据 task_instances 中的实际状态重新计算结束计数并写回，用于崩溃后的对账。不提交事务。
+        """
+        counts = dict(db.execute(
+            select(TaskInstance.status, func.count())
+            .where(
+                TaskInstance.workflow_instance_id == workflow_instance_id,
+                TaskInstance.status.in_([TaskStatus.COMPLETED, TaskStatus.FAILED]),
+            )
+            .group_by(TaskInstance.status)
+        ).all())
+        completed = counts.get(TaskStatus.COMPLETED, 0)
+        failed = counts.get(TaskStatus.FAILED, 0)
+        db.execute(
+            update(self.model)
+            .where(self.model.id == workflow_instance_id)
+            .values(completed_count=completed, failed_count=failed)
+        )
+        return completed, failed
 
-workflow_instance = CRUDWorkflowInstance(WorkflowInstance)
\ No newline at end of file
+workflow_instance = CRUDWorkflowInstance(WorkflowInstance)
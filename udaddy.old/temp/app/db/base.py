@@ -3,9 +3,9 @@
 import enum
 from datetime import datetime
 
-from sqlalchemy import (Column, Integer, String, Boolean, DateTime,
+from sqlalchemy import (Column, Integer, BigInteger, String, Boolean, DateTime,
                         ForeignKey, Text, Enum)
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.orm import relationship, declarative_base, deferred
 from sqlalchemy.dialects.postgresql import JSONB
 
 # 创建一个所有模型都会继承的基类
@@ -71,6 +71,7 @@ class Agent(Base):
     
     input_schema = Column(JSONB, comment="输入参数的JSON Schema定义")
     output_schema = Column(JSONB, comment="输出结果的JSON Schema定义")
+    config = Column(JSONB, comment="运行时配置，如 stateless（可复用WASM实例）、resource_limits（WASM资源限制）、blob_refs（以引用交换大对象）")
 
     owner_id = Column(Integer, ForeignKey("users.id"), comment="所属用户的ID")
     owner = relationship("User", back_populates="agents")
@@ -111,6 +112,17 @@ class WorkflowInstance(Base):
     
     inputs = Column(JSONB, comment="本次执行的初始输入参数")
     outputs = Column(JSONB, comment="工作流执行完成后的最终输出")
+
+    # 创建时固定的模板版本与DAG快照：运行期间模板被修改，调度器仍按启动时的版本计算依赖
+    template_version = Column(DateTime, comment="所使用的模板版本（创建实例时模板的 updated_at）")
+    dag_definition = deferred(Column(JSONB, comment="创建实例时模板 dag_definition 的快照"))
+
+    # 增量重跑时的来源实例：未受影响节点的结果从该实例复制而来
+    rerun_of_id = Column(Integer, ForeignKey("workflow_instances.id"), comment="增量重跑的来源实例ID")
+
+    # 增量维护的任务结束计数，调度器据此以O(1)判断工作流是否完成
+    completed_count = Column(Integer, nullable=False, default=0, server_default="0", comment="已成功完成的任务数")
+    failed_count = Column(Integer, nullable=False, default=0, server_default="0", comment="已失败的任务数")
     
     owner_id = Column(Integer, ForeignKey("users.id"), comment="发起此次执行的用户的ID")
     owner = relationship("User", back_populates="workflow_instances")
@@ -141,6 +153,44 @@ class TaskInstance(Base):
     logs = Column(Text, comment="任务执行过程中的日志")
     
     retry_count = Column(Integer, default=0, comment="任务失败后的重试次数")
+    fuel_consumed = Column(BigInteger, comment="WASM任务实际消耗的燃料，用于容量规划")
+
+    # 确定性Agent的结果缓存键（模块内容哈希 + 输入哈希），成功后结果以此写入 task_result_cache
+    memo_key = Column(String(64), comment="结果缓存键，仅确定性Agent的任务有值")
+    from_cache = Column(Boolean, nullable=False, default=False, server_default="false", comment="结果是否直接取自结果缓存或增量重跑的来源实例（未实际执行）")
+
+    # 调度器处理完成/失败事件时原子地置位，用于丢弃重复投递的事件，保证依赖计数只被扣减一次
+    scheduler_processed = Column(Boolean, nullable=False, default=False, server_default="false", comment="调度器是否已处理该任务的结束事件")
     
+    dispatched_at = Column(DateTime, comment="最近一次分发给Worker的时间，对账时据此重新分发消息丢失的任务")
     started_at = Column(DateTime, comment="任务开始执行时间")
-    completed_at = Column(DateTime, comment="任务执行结束时间")
\ No newline at end of file
+    completed_at = Column(DateTime, comment="任务执行结束时间")
+
+
+class TaskResultCache(Base):
+    """确定性Agent的结果缓存表：相同模块内容、相同输入的任务直接复用之前的输出"""
+    __tablename__ = "task_result_cache"
+    id = Column(Integer, primary_key=True, index=True)
+    memo_key = Column(String(64), nullable=False, unique=True, comment="sha256(模块内容哈希 + 规范化输入哈希)")
+    agent_id = Column(Integer, ForeignKey("agents.id", ondelete="CASCADE"), nullable=False, comment="写入此条目的Agent ID")
+    outputs = Column(JSONB, comment="缓存的任务输出（大对象只保存 $blob 引用）")
+    hit_count = Column(Integer, nullable=False, default=0, server_default="0", comment="命中次数")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_hit_at = Column(DateTime, default=datetime.utcnow, index=True, comment="最近一次写入或命中的时间，超出容量时按此淘汰")
+    expires_at = Column(DateTime, nullable=False, index=True, comment="过期时间")
+
+
+class TaskDependencyCounter(Base):
+    """任务依赖计数表：记录每个(工作流实例, 节点)尚未完成的上游依赖数量"""
+    __tablename__ = "task_dependency_counters"
+    workflow_instance_id = Column(Integer, ForeignKey("workflow_instances.id", ondelete="CASCADE"), primary_key=True, comment="所属工作流实例的ID")
+    node_id_in_dag = Column(String, primary_key=True, comment="在DAG定义中的节点ID")
+    remaining = Column(Integer, nullable=False, comment="尚未完成的上游依赖数量，归零时节点就绪")
+
+
+class TaskGroupOutbox(Base):
+    """任务组发件箱：与任务实例在同一事务中写入的待发送任务组，发送成功后删除"""
+    __tablename__ = "task_group_outbox"
+    id = Column(Integer, primary_key=True, index=True)
+    payload = Column(JSONB, nullable=False, comment="发送给Worker的任务组载荷")
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True, comment="写入时间，滞留过久的行由中继任务重新发送")
@@ -0,0 +1,59 @@
+# app/gc_blobs.py
+# 大对象存储的GC命令：删除不再被任何任务实例或结果缓存引用、且超过TTL的大对象。
+# 用法: python -m app.gc_blobs [--ttl-seconds N]
+
+import argparse
+import logging
+from typing import Set
+
+from sqlalchemy import func, select, union
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import base as models
+from app.db.session import SessionLocal
+from app.storage.blob_store import blob_store
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 匹配JSON中任意深度的 {"$blob": "<sha256>"} 引用。lax模式下缺少该键的对象被跳过而不是报错，重复结果由UNION去除
+BLOB_REF_PATH = 'lax $.**."$blob"'
+
+
+def referenced_digests(db: Session) -> Set[str]:
+    """在数据库中用 jsonb_path_query 收集所有被引用的大对象摘要，任务的输入输出不需要读入Python进程。"""
+    columns = [
+        models.TaskInstance.inputs,
+        models.TaskInstance.outputs,
+        models.TaskResultCache.outputs,
+    ]
+    queries = [
+        select(func.jsonb_path_query(column, BLOB_REF_PATH).op("#>>")("{}").label("digest")).where(column.isnot(None))
+        for column in columns
+    ]
+    return set(db.scalars(union(*queries)))
+
+
+def gc(ttl_seconds: float) -> int:
+    if blob_store is None:
+        logger.info("未配置大对象存储，无需GC。")
+        return 0
+    db = SessionLocal()
+    try:
+        # 先收集引用再列出对象：收集之后才写入的新对象都在TTL之内，不会被误删
+        referenced = referenced_digests(db)
+    finally:
+        db.close()
+    removed = blob_store.sweep(referenced, ttl_seconds=ttl_seconds)
+    logger.info(f"大对象GC完成: {len(referenced)} 个对象仍被引用，删除了 {removed} 个对象。")
+    return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="删除不再被引用的大对象")
+    parser.add_argument("--ttl-seconds", type=float, default=settings.BLOB_GC_TTL_SECONDS,
+                        help="只删除超过这个时间未被写入或重新引用的对象，默认为 BLOB_GC_TTL_SECONDS")
+    args = parser.parse_args()
+
+    gc(args.ttl_seconds)
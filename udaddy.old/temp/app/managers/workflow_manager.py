@@ -38,6 +38,9 @@ class WorkflowManager:
         """根据模板和输入参数创建一个新的工作流实例"""
         db_obj = models.WorkflowInstance(
             template_id=template.id,
+            # 固定本次运行使用的模板版本，运行期间模板被修改不影响调度
+            template_version=template.updated_at,
+            dag_definition=template.dag_definition,
             owner_id=owner_id,
             inputs=instance_in.inputs,
             priority=instance_in.priority,
@@ -58,5 +61,34 @@ class WorkflowManager:
         }
         submit_to_scheduler(event)
 
+    def create_rerun_instance(self, db: Session, *, source: models.WorkflowInstance, template: models.DAGTemplate, rerun_in: schemas.workflow_instance.WorkflowInstanceRerun, owner_id: int) -> models.WorkflowInstance:
+        """基于一个已有实例创建增量重跑的新实例，使用模板的当前版本；未指定的输入和优先级沿用来源实例"""
+        db_obj = models.WorkflowInstance(
+            template_id=template.id,
+            template_version=template.updated_at,
+            dag_definition=template.dag_definition,
+            owner_id=owner_id,
+            inputs=rerun_in.inputs if rerun_in.inputs is not None else source.inputs,
+            priority=rerun_in.priority if rerun_in.priority is not None else source.priority,
+            rerun_of_id=source.id,
+            status=models.WorkflowStatus.QUEUED
+        )
+        db.add(db_obj)
+        db.commit()
+        db.refresh(db_obj)
+        return db_obj
+
+    def trigger_workflow_rerun(self, instance: models.WorkflowInstance, changed_nodes: list[str]):
+        """
+        向调度器发送“增量重跑”的事件。
+        """
+        event = {
+            "event_type": "RERUN_WORKFLOW",
+            "instance_id": instance.id,
+            "source_instance_id": instance.rerun_of_id,
+            "changed_nodes": changed_nodes,
+        }
+        submit_to_scheduler(event)
+
 # 创建一个管理器的单例，方便在其他地方直接导入使用
 workflow_manager = WorkflowManager()
\ No newline at end of file
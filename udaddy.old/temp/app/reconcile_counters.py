@@ -0,0 +1,43 @@
+# app/reconcile_counters.py
+# 崩溃恢复命令：根据 task_instances 重新计算工作流实例的增量计数。
+# 用法: python -m app.reconcile_counters [--instance-id ID ...]
+
+import argparse
+import logging
+
+from app.db import base as models
+from app.db.session import SessionLocal
+from app.tasks.scheduler import reconcile_workflow_instance, relay_task_group_outbox
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def reconcile(instance_ids: list[int] | None = None) -> None:
+    db = SessionLocal()
+    try:
+        # 先重新发送发件箱中滞留的任务组，再根据任务实例的状态对账
+        relay_task_group_outbox(db)
+
+        query = db.query(models.WorkflowInstance)
+        if instance_ids:
+            query = query.filter(models.WorkflowInstance.id.in_(instance_ids))
+        else:
+            # 默认只处理仍在运行中的实例
+            query = query.filter(models.WorkflowInstance.status == models.WorkflowStatus.RUNNING)
+
+        for instance in query.all():
+            redispatched = reconcile_workflow_instance(db, instance)
+            if redispatched:
+                logger.info(f"工作流实例 {instance.id} 重新分发了节点: {redispatched}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="重新计算工作流实例的完成计数与依赖计数")
+    parser.add_argument("--instance-id", type=int, action="append", dest="instance_ids", help="只对账指定的工作流实例，可重复指定")
+    args = parser.parse_args()
+
+    logger.info("Reconciling workflow counters")
+    reconcile(args.instance_ids)
+    logger.info("Reconciliation finished")
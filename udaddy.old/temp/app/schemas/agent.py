@@ -14,6 +14,7 @@ class AgentBase(BaseModel):
     source_reference: str = Field(..., description="执行源引用（如Docker镜像名, Wasm文件路径）")
     input_schema: Dict[str, Any] | None = Field({}, description="输入参数的JSON Schema定义, 用于自动生成UI和校验。")
     output_schema: Dict[str, Any] | None = Field({}, description="输出结果的JSON Schema定义。")
+    config: Dict[str, Any] | None = Field({}, description="运行时配置，如 {\"stateless\": true} 允许Worker复用WASM实例，{\"blob_refs\": true} 让大输入和大输出以 $blob/$file 引用交换。")
 
 class AgentCreate(AgentBase):
     """创建Agent时使用的模型"""
@@ -11,7 +11,8 @@ class DAGTemplateBase(BaseModel):
         description=(
             "核心DAG结构定义。包含'nodes'和'edges'两个键。"
             "每个node应包含'id'(唯一标识), 'agent_id'。"
-            "每个edge应包含'from'(源节点id), 'to'(目标节点id)。"
+            "每个edge应包含'from'(源节点id), 'to'(目标节点id)；"
+            "可选的'data'把上游输出的键映射为下游输入的键，'*'表示上游的整个输出。"
             "Node内可包含高级策略，如 'retry_policy': {'max_retries': 3}, 'timeout_seconds': 600"
         ),
         example={
@@ -21,7 +22,7 @@ class DAGTemplateBase(BaseModel):
                 {"id": "end", "agent_id": 3}
             ],
             "edges": [
-                {"from": "start", "to": "process"},
+                {"from": "start", "to": "process", "data": {"result": "numbers"}},
                 {"from": "process", "to": "end"}
             ]
         }
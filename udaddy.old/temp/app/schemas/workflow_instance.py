@@ -25,6 +25,25 @@ class WorkflowInstanceCreate(BaseModel):
         example=10
     )
 
+class WorkflowInstanceRerun(BaseModel):
+    """增量重跑一个已有工作流实例的请求体"""
+    changed_nodes: List[str] = Field(
+        ...,
+        description=(
+            "参数或实现发生变化的节点ID。这些节点及其所有下游节点会重新执行，"
+            "其余节点直接复用来源实例中已完成的结果。"
+        ),
+        example=["process"]
+    )
+    inputs: Dict[str, Any] | None = Field(
+        None,
+        description="新实例的初始输入参数，默认沿用来源实例的输入。",
+    )
+    priority: int | None = Field(
+        None,
+        description="新实例的执行优先级，默认沿用来源实例的优先级。",
+    )
+
 class WorkflowInstanceCreateResponse(BaseModel):
     """成功触发工作流后的响应体"""
     instance_id: int = Field(..., description="新创建的工作流实例的唯一ID，可用于后续状态查询。")
@@ -35,6 +54,8 @@ class TaskInstanceInfo(BaseModel):
     id: int
     node_id_in_dag: str
     status: TaskStatus
+    fuel_consumed: int | None = None
+    from_cache: bool = False
     started_at: datetime | None
     completed_at: datetime | None
 
@@ -55,4 +76,11 @@ class WorkflowInstanceInfo(BaseModel):
     task_instances: List[TaskInstanceInfo]
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class MemoCacheStats(BaseModel):
+    """结果缓存的命中率统计；Redis不可用时命中率相关字段为None"""
+    hits: int | None
+    misses: int | None
+    hit_rate: float | None
+    entries: int
@@ -0,0 +1,248 @@
+# app/storage/backends.py
+# 大对象存储的后端：只负责按SHA-256摘要存取不可变的对象，哈希、去重和引用格式由 BlobStore 处理。
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # S3后端是可选的，只在配置了 BLOB_STORE_BACKEND="s3" 时才需要
+    boto3 = None
+    ClientError = None
+
+logger = logging.getLogger(__name__)
+
+
+class BlobBackend(ABC):
+    """存储后端接口。对象按摘要寻址、写入后不再修改，因此所有写操作都是幂等的。"""
+
+    @abstractmethod
+    def exists(self, digest: str) -> bool:
+        ...
+
+    @abstractmethod
+    def write_bytes(self, digest: str, data: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def write_file(self, digest: str, source: Path, *, move: bool = False) -> None:
+        """写入一个本地文件；move=True 时写入后源文件不再存在。"""
+        ...
+
+    @abstractmethod
+    def read_bytes(self, digest: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def materialize(self, digest: str, target: Path) -> None:
+        """把对象放到本地路径 target（用于WASM沙箱的 /inputs），target 已存在时不做任何事。"""
+        ...
+
+    @abstractmethod
+    def staging_root(self) -> Path:
+        """本地暂存目录的父目录，materialize 到这里的代价应尽可能低。"""
+        ...
+
+    @abstractmethod
+    def touch(self, digest: str) -> bool:
+        """确认对象存在并刷新其修改时间，被重新引用的旧对象因此不会被GC删除。对象不存在时返回False。"""
+        ...
+
+    @abstractmethod
+    def iter_digests(self, *, modified_before: float) -> Iterator[str]:
+        """列出修改时间（Unix时间戳）早于 modified_before 的所有对象的摘要，供GC使用。"""
+        ...
+
+    @abstractmethod
+    def delete(self, digest: str) -> None:
+        """删除一个对象，对象不存在时不做任何事。"""
+        ...
+
+
+class LocalFSBackend(BlobBackend):
+    """本地或共享文件系统（NFS等）上的存储，按摘要前两位分目录存放。"""
+
+    def __init__(self, root: Path):
+        self._root = root
+
+    def path(self, digest: str) -> Path:
+        return self._root / digest[:2] / digest
+
+    def exists(self, digest: str) -> bool:
+        return self.path(digest).is_file()
+
+    def write_bytes(self, digest: str, data: bytes) -> None:
+        self._write_atomic(digest, lambda f: f.write(data))
+
+    def write_file(self, digest: str, source: Path, *, move: bool = False) -> None:
+        if move:
+            target = self.path(digest)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.replace(source, target)  # 同一文件系统上只是一次rename
+                return
+            except OSError:
+                pass  # 跨文件系统，退回到复制
+        self._write_atomic(digest, lambda f: _copy_into(source, f))
+        if move:
+            source.unlink()
+
+    def read_bytes(self, digest: str) -> bytes:
+        return self.path(digest).read_bytes()
+
+    def materialize(self, digest: str, target: Path) -> None:
+        if target.exists():
+            return
+        source = self.path(digest)
+        try:
+            os.link(source, target)  # 暂存目录与存储在同一文件系统上，硬链接不复制数据
+        except OSError:
+            shutil.copyfile(source, target)
+
+    def staging_root(self) -> Path:
+        return self._root / ".staging"
+
+    def touch(self, digest: str) -> bool:
+        try:
+            os.utime(self.path(digest))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def iter_digests(self, *, modified_before: float) -> Iterator[str]:
+        # 只遍历按摘要前两位命名的子目录，跳过 .staging 和写入中的 .tmp 文件
+        for shard in os.scandir(self._root):
+            if len(shard.name) != 2 or not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    if entry.stat().st_mtime < modified_before:
+                        yield entry.name
+                except FileNotFoundError:
+                    continue
+
+    def delete(self, digest: str) -> None:
+        # 已硬链接到暂存目录中的对象在执行结束前仍可读
+        self.path(digest).unlink(missing_ok=True)
+
+    def _write_atomic(self, digest: str, write) -> None:
+        target = self.path(digest)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, target)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+
+class S3Backend(BlobBackend):
+    """
+    S3兼容的对象存储（AWS S3、MinIO、Ceph RGW等），endpoint_url 为空时使用AWS。
+    凭证沿用boto3的标准来源（环境变量、配置文件、实例角色）。
+    boto3客户端不能跨fork共享，每个进程在第一次使用时创建自己的客户端。
+    """
+
+    def __init__(self, bucket: str, *, prefix: str = "", endpoint_url: str | None = None,
+                 region_name: str | None = None, staging_root: Path, touch_after_seconds: float = 24 * 3600):
+        if boto3 is None:
+            raise RuntimeError("BLOB_STORE_BACKEND='s3' requires boto3, install it with 'pip install boto3'.")
+        self._bucket = bucket
+        self._prefix = prefix
+        self._endpoint_url = endpoint_url
+        self._region_name = region_name
+        self._staging_root = staging_root
+        self._touch_after_seconds = touch_after_seconds
+        self._client_obj = None
+        self._client_pid: int | None = None
+        self._lock = threading.Lock()
+
+    def _client(self):
+        with self._lock:
+            if self._client_pid != os.getpid():
+                self._client_obj = boto3.client(
+                    "s3", endpoint_url=self._endpoint_url, region_name=self._region_name
+                )
+                self._client_pid = os.getpid()
+            return self._client_obj
+
+    def key(self, digest: str) -> str:
+        return f"{self._prefix}{digest[:2]}/{digest}"
+
+    def exists(self, digest: str) -> bool:
+        try:
+            self._client().head_object(Bucket=self._bucket, Key=self.key(digest))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def write_bytes(self, digest: str, data: bytes) -> None:
+        self._client().put_object(Bucket=self._bucket, Key=self.key(digest), Body=data)
+
+    def write_file(self, digest: str, source: Path, *, move: bool = False) -> None:
+        # upload_file 对大文件自动使用分段并发上传
+        self._client().upload_file(str(source), self._bucket, self.key(digest))
+        if move:
+            source.unlink()
+
+    def read_bytes(self, digest: str) -> bytes:
+        response = self._client().get_object(Bucket=self._bucket, Key=self.key(digest))
+        return response["Body"].read()
+
+    def materialize(self, digest: str, target: Path) -> None:
+        if target.exists():
+            return
+        tmp_path = target.with_name(f"{target.name}.part")
+        try:
+            self._client().download_file(self._bucket, self.key(digest), str(tmp_path))
+            os.replace(tmp_path, target)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def staging_root(self) -> Path:
+        return self._staging_root
+
+    def touch(self, digest: str) -> bool:
+        # S3只能通过原地复制刷新修改时间，代价与对象大小相关，因此只刷新超过 touch_after_seconds 的对象
+        try:
+            head = self._client().head_object(Bucket=self._bucket, Key=self.key(digest))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        if time.time() - head["LastModified"].timestamp() > self._touch_after_seconds:
+            key = self.key(digest)
+            self._client().copy(
+                {"Bucket": self._bucket, "Key": key}, self._bucket, key, ExtraArgs={"MetadataDirective": "REPLACE"}
+            )
+        return True
+
+    def iter_digests(self, *, modified_before: float) -> Iterator[str]:
+        paginator = self._client().get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self._bucket, Prefix=self._prefix):
+            for obj in page.get("Contents", []):
+                if obj["LastModified"].timestamp() < modified_before:
+                    yield obj["Key"].rsplit("/", 1)[-1]
+
+    def delete(self, digest: str) -> None:
+        self._client().delete_object(Bucket=self._bucket, Key=self.key(digest))
+
+
+def _copy_into(source: Path, target_file) -> None:
+    with open(source, "rb") as f:
+        shutil.copyfileobj(f, target_file)
@@ -0,0 +1,283 @@
+# app/storage/blob_store.py
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+import uuid
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.storage.backends import BlobBackend, LocalFSBackend, S3Backend
+
+logger = logging.getLogger(__name__)
+
+# 任务数据中引用大对象的两种形式：
+#   {"$blob": "<sha256>", "size": N, "encoding": ...}  - 存储中的内容寻址大对象，可出现在数据库、Celery消息和任务输出中
+#   {"$file": "/inputs/<sha256>", "size": N, "encoding": ...}  - WASM沙箱内的文件路径，只在一次执行期间有效
+# encoding 缺省为 "text"（UTF-8字符串），"json" 表示JSON编码的任意值，"binary" 表示原始字节（如WASM输出的文件）
+BLOB_KEY = "$blob"
+FILE_KEY = "$file"
+ENCODING_TEXT = "text"
+ENCODING_JSON = "json"
+ENCODING_BINARY = "binary"
+# 输入大对象在WASM沙箱内的只读挂载点
+INPUTS_GUEST_DIR = "/inputs"
+
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, dict) and isinstance(value.get(BLOB_KEY), str)
+
+
+def is_file_ref(value: Any) -> bool:
+    return isinstance(value, dict) and isinstance(value.get(FILE_KEY), str)
+
+
+def uses_blob_refs(agent_config: Optional[Dict[str, Any]]) -> bool:
+    """
+    Agent配置是否声明了 blob_refs。只有声明了的Agent的大输入、大输出才以 $blob/$file 引用的形式交换，
+    其它Agent始终收到和返回内联的值。
+    """
+    return bool((agent_config or {}).get("blob_refs"))
+
+
+class BlobStore:
+    """
+    内容寻址的大对象存储，按SHA-256去重，相同内容只保存一份；实际存取交给可替换的后端
+    （本地/共享文件系统或S3兼容的对象存储，见 app/storage/backends.py）。
+    本地文件的哈希通过mmap完成，大对象不会被整体读入Python进程的内存。
+    """
+
+    def __init__(self, backend: BlobBackend):
+        self.backend = backend
+
+    def exists(self, digest: str) -> bool:
+        return self.backend.exists(digest)
+
+    def put_bytes(self, data: bytes, *, encoding: str = ENCODING_TEXT) -> Dict[str, Any]:
+        digest = hashlib.sha256(data).hexdigest()
+        # 已存在的对象刷新修改时间而不是重写，使其在GC的TTL内不会被删除
+        if not self.backend.touch(digest):
+            self.backend.write_bytes(digest, data)
+        return _make_ref(digest, len(data), encoding)
+
+    def put_file(self, source: Path, *, move: bool = False) -> Dict[str, Any]:
+        """
+        把一个文件存入存储并返回引用。move=True 时源文件会被移走（本地后端在同一文件系统上只是一次rename），
+        否则数据被复制，都不经过Python对象。
+        """
+        size = source.stat().st_size
+        digest = _hash_file(source)
+        if self.backend.touch(digest):
+            if move:
+                source.unlink()
+        else:
+            self.backend.write_file(digest, source, move=move)
+        return _make_ref(digest, size, ENCODING_BINARY)
+
+    def read(self, ref: Dict[str, Any]) -> Any:
+        """读取引用指向的值：JSON编码的对象被解析，文本按UTF-8解码，二进制返回bytes。"""
+        data = self.backend.read_bytes(ref[BLOB_KEY])
+        encoding = ref.get("encoding", ENCODING_TEXT)
+        if encoding == ENCODING_JSON:
+            return json.loads(data)
+        if encoding == ENCODING_TEXT:
+            return data.decode("utf-8")
+        return data
+
+    def new_staging_dir(self) -> Path:
+        """创建一个本地临时目录；本地后端下它与存储位于同一文件系统，放入其中的硬链接不需要复制数据。"""
+        path = self.backend.staging_root() / uuid.uuid4().hex
+        path.mkdir(parents=True)
+        return path
+
+    def link_into(self, ref: Dict[str, Any], target: Path) -> None:
+        self.backend.materialize(ref[BLOB_KEY], target)
+
+    def sweep(self, referenced: Set[str], *, ttl_seconds: float) -> int:
+        """
+        删除超过 ttl_seconds 未被写入或刷新、且不在 referenced 中的对象，返回删除的数量。
+        TTL保护刚写入、引用它的数据库行还没有提交的对象。
+        """
+        removed = 0
+        for digest in list(self.backend.iter_digests(modified_before=time.time() - ttl_seconds)):
+            if digest in referenced:
+                continue
+            self.backend.delete(digest)
+            removed += 1
+        return removed
+
+
+def _make_ref(digest: str, size: int, encoding: str) -> Dict[str, Any]:
+    ref = {BLOB_KEY: digest, "size": size}
+    if encoding != ENCODING_TEXT:
+        ref["encoding"] = encoding
+    return ref
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+    return digest.hexdigest()
+
+
+# --- 任务数据与大对象引用之间的转换 ---
+
+def externalize_large_values(store: BlobStore, data: Dict[str, Any], threshold: int) -> Dict[str, Any]:
+    """
+    把顶层超过阈值的值写入存储，替换为 $blob 引用：字符串按UTF-8原样保存，列表和字典按JSON保存。
+    用于调度器创建任务之前（输入）和Worker写回结果之前（输出），相同内容只保存一份。
+    """
+    return {key: _externalize_value(store, value, threshold) for key, value in data.items()}
+
+
+def externalize_output(store: BlobStore, output: Any, threshold: int) -> Any:
+    """任务输出通常是字典，逐个顶层值处理；其它类型的输出作为一个整体判断。"""
+    if isinstance(output, dict) and not is_blob_ref(output):
+        return externalize_large_values(store, output, threshold)
+    return _externalize_value(store, output, threshold)
+
+
+def _externalize_value(store: BlobStore, value: Any, threshold: int) -> Any:
+    if isinstance(value, str):
+        if len(value) > threshold:
+            encoded = value.encode("utf-8")
+            if len(encoded) > threshold:
+                return store.put_bytes(encoded)
+    elif isinstance(value, (dict, list)) and not is_blob_ref(value):
+        encoded = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        if len(encoded) > threshold:
+            return store.put_bytes(encoded, encoding=ENCODING_JSON)
+    return value
+
+
+class LazyInputs(Mapping):
+    """
+    输入参数的只读视图：其中的 $blob 引用在Agent第一次读取对应的键时才从存储中取回并解码，之后缓存。
+    Agent用不到的大对象不会被下载。打印或记录日志时只显示引用本身。
+    """
+
+    def __init__(self, store: Optional[BlobStore], data: Dict[str, Any]):
+        self._store = store
+        self._data = data
+        self._resolved: Dict[str, Any] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._resolved:
+            return self._resolved[key]
+        value = self._data[key]
+        if is_blob_ref(value):
+            if self._store is None:
+                raise RuntimeError(f"Input '{key}' references a blob, but no blob store is configured.")
+            value = self._resolved[key] = self._store.read(value)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return repr(self._data)
+
+
+def contains_blob_refs(data: Any) -> bool:
+    if is_blob_ref(data):
+        return True
+    if isinstance(data, dict):
+        return any(contains_blob_refs(value) for value in data.values())
+    if isinstance(data, list):
+        return any(contains_blob_refs(value) for value in data)
+    return False
+
+
+def resolve_blob_refs(store: Optional[BlobStore], data: Any) -> Any:
+    """把数据中的所有 $blob 引用替换为其内容，用于把上游的大对象输出交给未声明 blob_refs 的Agent。"""
+    if is_blob_ref(data):
+        if store is None:
+            raise RuntimeError("Input references a blob, but no blob store is configured.")
+        return store.read(data)
+    if isinstance(data, dict):
+        return {key: resolve_blob_refs(store, value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [resolve_blob_refs(store, value) for value in data]
+    return data
+
+
+def stage_inputs(store: BlobStore, input_data: Any) -> Tuple[Optional[Path], Any]:
+    """
+    把输入中的 $blob 引用放入一个临时的暂存目录（文件名为sha256），并替换为沙箱内的 $file 路径。
+    暂存目录应以只读方式挂载到沙箱的 /inputs，硬链接指向的存储文件因此不会被WASM修改。
+    输入中没有大对象引用时返回 (None, input_data)。调用方负责在执行结束后删除暂存目录。
+    """
+    if not contains_blob_refs(input_data):
+        return None, input_data
+    staging_dir = store.new_staging_dir()
+
+    def stage(value: Any) -> Any:
+        if is_blob_ref(value):
+            digest = value[BLOB_KEY]
+            store.link_into(value, staging_dir / digest)
+            file_ref = {FILE_KEY: f"{INPUTS_GUEST_DIR}/{digest}", "size": value.get("size")}
+            if "encoding" in value:
+                file_ref["encoding"] = value["encoding"]
+            return file_ref
+        if isinstance(value, dict):
+            return {key: stage(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [stage(item) for item in value]
+        return value
+
+    try:
+        return staging_dir, stage(input_data)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+
+def collect_outputs(store: BlobStore, output: Any, workspace_dir: Path) -> Any:
+    """把WASM输出中的 $file 引用（工作区内的文件）存入存储，替换为 $blob 引用。"""
+    if is_file_ref(output):
+        host_path = _resolve_in_workspace(workspace_dir, output[FILE_KEY])
+        return store.put_file(host_path, move=True)
+    if isinstance(output, dict):
+        return {key: collect_outputs(store, value, workspace_dir) for key, value in output.items()}
+    if isinstance(output, list):
+        return [collect_outputs(store, value, workspace_dir) for value in output]
+    return output
+
+
+def _resolve_in_workspace(workspace_dir: Path, guest_path: str) -> Path:
+    """把WASM内部的路径映射到宿主路径，并拒绝任何指向工作区之外的路径（包括只读的 /inputs）。"""
+    root = workspace_dir.resolve()
+    host_path = (root / guest_path.lstrip("/")).resolve()
+    if not host_path.is_relative_to(root) or not host_path.is_file():
+        raise ValueError(f"Output file reference '{guest_path}' does not point to a file inside the workspace.")
+    return host_path
+
+
+def _create_blob_store() -> Optional[BlobStore]:
+    if settings.BLOB_STORE_BACKEND == "s3":
+        return BlobStore(S3Backend(
+            settings.BLOB_S3_BUCKET,
+            prefix=settings.BLOB_S3_PREFIX,
+            endpoint_url=settings.BLOB_S3_ENDPOINT_URL,
+            region_name=settings.BLOB_S3_REGION,
+            staging_root=Path(settings.BLOB_LOCAL_STAGING_ROOT),
+            touch_after_seconds=settings.BLOB_GC_TTL_SECONDS / 2,
+        ))
+    if settings.BLOB_STORE_BACKEND == "local" and settings.BLOB_STORE_ROOT:
+        return BlobStore(LocalFSBackend(Path(settings.BLOB_STORE_ROOT)))
+    return None
+
+
+blob_store: Optional[BlobStore] = _create_blob_store()
@@ -0,0 +1,182 @@
+# app/tasks/async_worker.py
+# 原生asyncio Worker运行时：不经过Celery prefork进程池，直接从Redis消费三档优先级的计算队列（COMPUTE_QUEUE）。
+# 一个进程即可在可配置的信号量下并发运行大量任务组，适合以I/O等待为主的工作负载。
+# 与 netbase.worker.execute_group 使用完全相同的载荷格式，两种Worker可以同时消费同一批队列。
+# 用法: python -m app.tasks.async_worker
+
+import asyncio
+import logging
+import signal
+import socket
+from typing import Dict, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+from app.tasks.messages import InvalidMessageError, decode_execute_group_message
+from app.tasks.prewarm import clear_ready, prewarm_and_mark_ready
+from app.tasks.priority import WeightedFairSelector, tier_queues
+from app.tasks.worker import fail_task_group, run_async_task_group, wasm_executor, wasm_manager, workspace_manager
+
+logging.basicConfig(level=settings.LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+# 按给定顺序尝试把第一条可用消息从某个队列原子地移入其对应的处理中列表，一次往返。
+# KEYS = [队列1, 处理中列表1, 队列2, 处理中列表2, ...]，返回 [队列序号(从0开始), 消息] 或 nil
+_MOVE_FIRST_AVAILABLE = """
+for i = 1, #KEYS, 2 do
+    local raw = redis.call('LMOVE', KEYS[i], KEYS[i + 1], 'RIGHT', 'LEFT')
+    if raw then
+        return {(i - 1) / 2, raw}
+    end
+end
+return nil
+"""
+
+
+class AsyncGroupWorker:
+    """
+    从Redis直接拉取任务组并在当前事件循环中并发执行。
+    - 并发度由信号量限制；信号量耗尽时停止拉取新消息，把积压留给其它Worker（背压）。
+    - 同时消费多个优先级队列（从高到低排列），按权重做平滑加权轮询：高优先级队列获得大部分拉取机会，
+      低优先级队列也保证有固定比例，不会被饿死；某个队列为空时依次尝试其它队列。
+    - 消息原子地移入本Worker在对应队列上的处理中列表，执行完毕后才删除，
+      进程崩溃后重启时会把遗留的消息放回原队列。
+    """
+
+    def __init__(
+        self,
+        client: aioredis.Redis,
+        *,
+        queues: List[Tuple[str, int]],
+        max_groups: int,
+        group_timeout: float,
+        name: str,
+        idle_wait: float = 0.1,
+    ):
+        self._client = client
+        self._queues = [queue for queue, _ in queues]
+        self._processing_keys = [f"{queue}:processing:{name}" for queue in self._queues]
+        self._unhandled_key = f"{self._queues[0]}:unhandled"
+        self._selector = WeightedFairSelector([weight for _, weight in queues])
+        self._move_first_available = client.register_script(_MOVE_FIRST_AVAILABLE)
+        self._group_timeout = group_timeout
+        self._idle_wait = idle_wait
+        self._slots = asyncio.Semaphore(max_groups)
+        self._inflight: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+
+    def request_shutdown(self):
+        logger.info("收到停止信号，不再拉取新的任务组，等待运行中的任务组结束...")
+        self._stopping.set()
+
+    async def _requeue_orphans(self):
+        """把上次进程崩溃时遗留在处理中列表的消息放回原队列。"""
+        for queue, processing_key in zip(self._queues, self._processing_keys):
+            requeued = 0
+            while await self._client.lmove(processing_key, queue, "RIGHT", "RIGHT"):
+                requeued += 1
+            if requeued:
+                logger.warning(f"已将 {requeued} 个遗留的任务组消息放回队列 '{queue}'。")
+
+    async def _pull(self) -> Optional[Tuple[int, bytes]]:
+        """按加权公平顺序拉取一条消息，返回 (队列序号, 消息)；所有队列都为空时短暂阻塞等待高优先级队列。"""
+        order = self._selector.next_order()
+        keys = [key for i in order for key in (self._queues[i], self._processing_keys[i])]
+        result = await self._move_first_available(keys=keys)
+        if result is not None:
+            position, raw = result
+            return order[int(position)], raw
+        raw = await self._client.blmove(self._queues[0], self._processing_keys[0], self._idle_wait, "RIGHT", "LEFT")
+        return (0, raw) if raw is not None else None
+
+    async def run(self):
+        await self._requeue_orphans()
+        logger.info(f"原生异步Worker开始消费 {self._queues}。")
+
+        while not self._stopping.is_set():
+            # 先占用并发槽位再拉取消息：饱和时消息留在队列中，由其它Worker消费
+            await self._slots.acquire()
+            pulled = None
+            try:
+                pulled = await self._pull()
+            finally:
+                if pulled is None:
+                    self._slots.release()
+            if pulled is None:
+                continue
+
+            task = asyncio.create_task(self._handle(*pulled))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        logger.info("原生异步Worker已停止。")
+
+    async def _run_group(self, group_id: str, tasks: List[Dict]):
+        await run_async_task_group(group_id, tasks)
+
+    async def _handle(self, queue_index: int, raw: bytes):
+        try:
+            try:
+                payload = decode_execute_group_message(raw)
+            except InvalidMessageError as e:
+                logger.error(f"队列 '{self._queues[queue_index]}' 中出现无法解析的消息（{e}），已移至 '{self._unhandled_key}'。")
+                await self._client.lpush(self._unhandled_key, raw)
+                return
+            if payload is None:
+                logger.error(f"队列 '{self._queues[queue_index]}' 中出现无法处理的消息，已移至 '{self._unhandled_key}'。")
+                await self._client.lpush(self._unhandled_key, raw)
+                return
+
+            group_id = payload.get("group_id", "unknown_group")
+            tasks = payload.get("tasks", [])
+            if not tasks:
+                logger.warning(f"接收到空的任务组: {group_id}")
+                return
+
+            try:
+                await asyncio.wait_for(self._run_group(group_id, tasks), self._group_timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"任务组 {group_id} 因超时而失败。")
+                await asyncio.to_thread(fail_task_group, payload, error_message="Task group timed out.")
+            except Exception as e:
+                # 消息随后会被删除，不会重试：把组内尚未结束的任务标记为失败，避免它们一直停留在RUNNING
+                logger.critical(f"执行任务组 {group_id} 时发生异常: {e}", exc_info=True)
+                await asyncio.to_thread(fail_task_group, payload, error_message=f"Task group failed: {e}")
+        except Exception as e:
+            logger.critical(f"处理任务组消息时发生顶层异常: {e}", exc_info=True)
+        finally:
+            await self._client.lrem(self._processing_keys[queue_index], 1, raw)
+            self._slots.release()
+
+
+async def main():
+    client = aioredis.from_url(str(settings.REDIS_URL))
+    worker = AsyncGroupWorker(
+        client,
+        queues=tier_queues(settings.COMPUTE_QUEUE),
+        max_groups=settings.ASYNC_WORKER_MAX_GROUPS,
+        group_timeout=settings.ASYNC_WORKER_GROUP_TIMEOUT,
+        name=settings.ASYNC_WORKER_NAME or socket.gethostname(),
+        idle_wait=settings.ASYNC_WORKER_IDLE_WAIT,
+    )
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.request_shutdown)
+
+    try:
+        # 开始消费之前完成模块预热，并发出就绪信号
+        await asyncio.to_thread(prewarm_and_mark_ready, wasm_manager, wasm_executor)
+        await worker.run()
+    finally:
+        clear_ready()
+        await client.aclose()
+        wasm_executor.shutdown()
+        workspace_manager.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -20,12 +20,29 @@ celery_app.conf.update(
     task_track_started=True,
     # 在启动时如果连接不上broker，会自动重试
     broker_connection_retry_on_startup=True,
+    # 子进程在 worker_process_init 中预热WASM模块，默认的4秒可能不够
+    worker_proc_alive_timeout=settings.WORKER_PROCESS_INIT_TIMEOUT,
     
     # --- 任务路由 ---
     # 这是实现调度器和计算Worker隔离的关键。
     # 它告诉Celery，哪个任务应该被发送到哪个队列。
+    # Redis broker 默认会把带 priority 的消息拆到多个子列表中，原生异步Worker只读取队列本身的列表。
+    # 优先级已经通过三档队列实现（见 app/tasks/priority.py），这里让所有消息都留在队列本身的列表中；
+    # RabbitMQ 等原生支持消息优先级的broker仍会使用 send_task 的 priority 参数在队列内排序。
+    broker_transport_options={"priority_steps": [0]},
+
     task_routes = {
         'app.tasks.scheduler.handle_scheduler_event': {'queue': 'scheduler_queue'},
         'app.tasks.worker.run_agent_task': {'queue': 'compute_queue'},
-    }
+    },
+
+    # --- 定时任务（celery beat） ---
+    # 兜底重新发送发件箱中滞留的任务组，见 app/tasks/scheduler.py
+    beat_schedule={
+        'relay-task-group-outbox': {
+            'task': 'relay_task_group_outbox',
+            'schedule': settings.SCHEDULER_OUTBOX_RELAY_INTERVAL,
+            'options': {'queue': 'scheduler_queue'},
+        },
+    },
 )
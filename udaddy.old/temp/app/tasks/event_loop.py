@@ -0,0 +1,80 @@
+# app/tasks/event_loop.py
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundEventLoop:
+    """
+    在独立后台线程中运行的长生命周期asyncio事件循环。
+    每个Worker进程启动时创建一次，之后所有任务组的协程都提交到这个循环上执行，
+    因此绑定在事件循环上的异步资源（连接池、HTTP会话、WASM存储等）可以跨任务组复用，
+    不会像 asyncio.run 那样在每个任务组结束时被销毁。
+    """
+
+    def __init__(self, name: str = "netbase-event-loop"):
+        self._name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None and self._loop.is_running()
+
+    @property
+    def loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        return self._loop
+
+    def start(self) -> None:
+        """启动后台线程并等待事件循环就绪。重复调用是安全的。"""
+        if self.running:
+            return
+        self._started.clear()
+        self._thread = threading.Thread(target=self._run_forever, name=self._name, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        logger.info(f"后台事件循环 '{self._name}' 已启动。")
+
+    def _run_forever(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.call_soon(self._started.set)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.close()
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> Future:
+        """把协程提交到后台事件循环，返回一个线程安全的 concurrent.futures.Future。"""
+        if not self.running:
+            raise RuntimeError(f"后台事件循环 '{self._name}' 尚未启动。")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """
+        阻塞地在后台事件循环上执行协程并返回其结果，语义上等价于 asyncio.run(coro)。
+        如果调用线程在等待期间被中断（例如Celery的软超时），会同时取消后台协程。
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """停止事件循环并等待后台线程退出。"""
+        if not self.running:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._loop = None
+        self._thread = None
+        logger.info(f"后台事件循环 '{self._name}' 已停止。")
@@ -0,0 +1,233 @@
+# app/tasks/execution_plan.py
+
+import logging
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import base as models
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutionPlan:
+    """
+    DAG模板的“编译后”执行计划。
+    在构建时一次性解析 dag_definition，把节点ID映射为连续的整数下标，
+    并预先计算邻接表、反向邻接表、入度和节点定义索引。
+    调度器处理单个事件时只需 O(出度) 的工作量，而不必反复扫描整个边列表。
+    """
+
+    def __init__(self, template_id: int, version: Optional[datetime], dag_definition: Dict[str, Any]):
+        nodes = dag_definition.get("nodes", [])
+        edges = dag_definition.get("edges", [])
+
+        self.template_id = template_id
+        self.version = version
+
+        # 节点ID <-> 下标 的双向映射，以及 节点ID -> 节点定义 的索引
+        self.node_ids: List[str] = [node["id"] for node in nodes]
+        self.node_index: Dict[str, int] = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        self.node_defs: Dict[str, Dict[str, Any]] = {node["id"]: node for node in nodes}
+
+        size = len(self.node_ids)
+        self.successors: List[List[int]] = [[] for _ in range(size)]
+        self.predecessors: List[List[int]] = [[] for _ in range(size)]
+        self.in_degree: List[int] = [0] * size
+
+        # 数据边：下标 -> [(上游下标, 上游输出键, 本节点输入键)]
+        self.input_bindings: List[List[Tuple[int, str, str]]] = [[] for _ in range(size)]
+
+        seen_edges = set()
+        for edge in edges:
+            src = self.node_index.get(edge["from"])
+            dst = self.node_index.get(edge["to"])
+            if src is None or dst is None:
+                continue
+            # 边上的 data 把上游输出的键映射为下游输入的键，"*" 表示整个输出
+            for output_key, input_key in (edge.get("data") or {}).items():
+                self.input_bindings[dst].append((src, output_key, input_key))
+            # 忽略重复边，重复边会让入度永远无法归零
+            if (src, dst) in seen_edges:
+                continue
+            seen_edges.add((src, dst))
+            self.successors[src].append(dst)
+            self.predecessors[dst].append(src)
+            self.in_degree[dst] += 1
+
+        self.start_indices: List[int] = [i for i in range(size) if self.in_degree[i] == 0]
+        self.is_cyclic: bool = len(self._topological_order()) != size
+
+    def _topological_order(self) -> List[int]:
+        """Kahn算法求拓扑序；若结果少于节点数则说明图中存在循环。"""
+        remaining = list(self.in_degree)
+        queue = deque(self.start_indices)
+        order = []
+        while queue:
+            index = queue.popleft()
+            order.append(index)
+            for succ in self.successors[index]:
+                remaining[succ] -= 1
+                if remaining[succ] == 0:
+                    queue.append(succ)
+        return order
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def downstream(self, node_id: str) -> List[str]:
+        """获取一个节点的所有直接下游节点ID。"""
+        index = self.node_index.get(node_id)
+        if index is None:
+            return []
+        return [self.node_ids[i] for i in self.successors[index]]
+
+    def upstream(self, node_id: str) -> List[str]:
+        """获取一个节点的所有直接上游（依赖）节点ID。"""
+        index = self.node_index.get(node_id)
+        if index is None:
+            return []
+        return [self.node_ids[i] for i in self.predecessors[index]]
+
+    def descendants(self, node_ids: Iterable[str]) -> Set[str]:
+        """给定节点及其所有直接或间接下游节点的ID集合（忽略未知节点）。"""
+        queue = deque(self.node_index[node_id] for node_id in node_ids if node_id in self.node_index)
+        seen = set(queue)
+        while queue:
+            for succ in self.successors[queue.popleft()]:
+                if succ not in seen:
+                    seen.add(succ)
+                    queue.append(succ)
+        return {self.node_ids[i] for i in seen}
+
+    def input_bindings_for(self, node_id: str) -> List[Tuple[str, str, str]]:
+        """一个节点的数据边：[(上游节点ID, 上游输出键, 输入键)]。"""
+        index = self.node_index.get(node_id)
+        if index is None:
+            return []
+        return [(self.node_ids[src], output_key, input_key) for src, output_key, input_key in self.input_bindings[index]]
+
+    def in_degrees(self) -> Dict[str, int]:
+        """节点ID -> 入度，用于初始化依赖计数。"""
+        return dict(zip(self.node_ids, self.in_degree))
+
+    def node_def(self, node_id: str) -> Optional[Dict[str, Any]]:
+        return self.node_defs.get(node_id)
+
+    def start_node_defs(self) -> List[Dict[str, Any]]:
+        """所有入度为0的起始节点定义。"""
+        return [self.node_defs[self.node_ids[i]] for i in self.start_indices]
+
+
+def bind_inputs(
+    input_params: Dict[str, Any], input_refs: List[Dict[str, Any]], outputs: Dict[int, Any]
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    按数据边引用把上游输出合并进节点的静态输入，outputs 为 上游task_instance_id -> outputs。
+    返回 (合并后的输入, 上游输出中找不到对应键的引用)；找不到的输入键取值为None。
+    Worker执行前和调度器计算结果缓存键时都用它，保证两边看到的输入完全一致。
+    """
+    bound = dict(input_params or {})
+    missing = []
+    for ref in input_refs:
+        output = outputs.get(ref["task_instance_id"])
+        if ref["output_key"] == "*":
+            value = output
+        elif isinstance(output, dict) and ref["output_key"] in output:
+            value = output[ref["output_key"]]
+        else:
+            missing.append(ref)
+            value = None
+        bound[ref["input_key"]] = value
+    return bound, missing
+
+
+class ExecutionPlanCache:
+    """
+    调度器Worker进程内的执行计划LRU缓存。
+    以 (template_id, updated_at) 作为键：模板被修改后 updated_at 变化，新启动的实例使用新计划。
+    模板修改前启动的实例仍固定使用旧版本，因此同一模板的多个版本可以同时在缓存中，旧版本按LRU淘汰。
+    """
+
+    def __init__(self, maxsize: int):
+        self._maxsize = maxsize
+        self._plans: "OrderedDict[Tuple[int, Optional[datetime]], ExecutionPlan]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, template_id: int, version: Optional[datetime]) -> Optional[ExecutionPlan]:
+        key = (template_id, version)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+            return plan
+
+    def put(self, plan: ExecutionPlan) -> None:
+        key = (plan.template_id, plan.version)
+        with self._lock:
+            self._plans[key] = plan
+            self._plans.move_to_end(key)
+            while len(self._plans) > self._maxsize:
+                self._plans.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._plans.clear()
+
+
+plan_cache = ExecutionPlanCache(maxsize=settings.DAG_PLAN_CACHE_SIZE)
+
+
+def get_execution_plan(db: Session, template_id: int) -> Optional[ExecutionPlan]:
+    """
+    获取模板当前版本的执行计划，用于校验新的运行请求。调度中的实例使用 get_instance_plan。
+    缓存命中时只需查询 updated_at 一列，不会重新读取和解析 dag_definition JSONB。
+    """
+    row = db.query(models.DAGTemplate.updated_at).filter(models.DAGTemplate.id == template_id).first()
+    if row is None:
+        return None
+    version = row[0]
+    plan = plan_cache.get(template_id, version)
+    if plan is not None:
+        return plan
+
+    dag_definition = db.query(models.DAGTemplate.dag_definition).filter(models.DAGTemplate.id == template_id).scalar()
+    if dag_definition is None:
+        return None
+
+    plan = ExecutionPlan(template_id, version, dag_definition)
+    plan_cache.put(plan)
+    logger.info(f"已为模板 {template_id} (版本 {version}) 编译执行计划，共 {len(plan)} 个节点。")
+    return plan
+
+
+def get_instance_plan(db: Session, instance: models.WorkflowInstance) -> Optional[ExecutionPlan]:
+    """
+    获取工作流实例固定使用的执行计划。
+    实例创建时记录了模板的版本（updated_at）和 dag_definition 快照，运行期间模板被修改不会影响它：
+    依赖计数始终按同一版本的DAG初始化和扣减，不会混用新旧两个版本的边。
+    缓存未命中时从快照编译（快照是延迟加载的列，只在这时读取）。
+    没有固定版本的旧实例在这里固定为模板的当前版本，随调用方的下一次提交持久化。
+    """
+    if instance.template_version is None:
+        template = db.query(models.DAGTemplate).filter(models.DAGTemplate.id == instance.template_id).first()
+        if template is None:
+            return None
+        instance.template_version = template.updated_at
+        instance.dag_definition = template.dag_definition
+
+    plan = plan_cache.get(instance.template_id, instance.template_version)
+    if plan is not None:
+        return plan
+
+    plan = ExecutionPlan(instance.template_id, instance.template_version, instance.dag_definition or {})
+    plan_cache.put(plan)
+    logger.info(
+        f"已为工作流实例 {instance.id} 编译模板 {instance.template_id} (版本 {instance.template_version}) 的执行计划，"
+        f"共 {len(plan)} 个节点。"
+    )
+    return plan
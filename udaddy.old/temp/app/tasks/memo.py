@@ -0,0 +1,129 @@
+# app/tasks/memo.py
+# 确定性Agent的结果缓存（memoization）：缓存键、模块内容哈希和命中率统计。
+# 缓存的读写由调度器完成，见 app/tasks/scheduler.py 与 app/crud/crud_task_result_cache.py。
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import redis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+METRIC_HITS_KEY = "netbase:memo:hits"
+METRIC_MISSES_KEY = "netbase:memo:misses"
+# 统计用的Redis连接超时（秒）：Redis故障时调度器和API最多等待这么久，而不是卡在网络调用上
+METRIC_REDIS_TIMEOUT = 1.0
+
+
+class SourceHasher:
+    """
+    Agent源文件（如WASM模块）的内容哈希。
+    先比较文件的 mtime_ns 和大小，未变化时直接返回上次的哈希，不会为每个任务重读整个文件。
+    """
+
+    def __init__(self):
+        self._hashes: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, source_reference: str) -> Optional[str]:
+        """返回文件内容的sha256；文件不存在或不可读（如Docker镜像名）时返回None，该Agent不参与缓存。"""
+        try:
+            stat = os.stat(source_reference)
+        except (OSError, TypeError, ValueError):
+            return None
+        with self._lock:
+            cached = self._hashes.get(source_reference)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        digest = hashlib.sha256()
+        try:
+            with open(source_reference, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+        except OSError:
+            return None
+        content_hash = digest.hexdigest()
+        with self._lock:
+            self._hashes[source_reference] = (stat.st_mtime_ns, stat.st_size, content_hash)
+        return content_hash
+
+
+source_hasher = SourceHasher()
+
+
+def canonical_hash(value: Any) -> str:
+    """与键顺序、空白无关的JSON哈希；大对象在输入中是 $blob 引用，其本身已包含内容哈希。"""
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def memo_key(source_hash: str, input_params: Dict[str, Any]) -> str:
+    return hashlib.sha256(f"{source_hash}:{canonical_hash(input_params)}".encode("ascii")).hexdigest()
+
+
+def is_deterministic(agent_config: Optional[Dict[str, Any]]) -> bool:
+    return settings.MEMO_CACHE_ENABLED and bool((agent_config or {}).get("deterministic"))
+
+
+# --- 淘汰节流 ---
+
+_last_eviction = 0.0
+_eviction_lock = threading.Lock()
+
+
+def eviction_due() -> bool:
+    """同一进程内每隔 MEMO_CACHE_EVICTION_INTERVAL 秒最多返回一次True。"""
+    global _last_eviction
+    now = time.monotonic()
+    with _eviction_lock:
+        if now - _last_eviction < settings.MEMO_CACHE_EVICTION_INTERVAL:
+            return False
+        _last_eviction = now
+        return True
+
+
+# --- 命中率统计（Redis计数器，所有调度器进程共享） ---
+
+_redis_client: Optional[redis.Redis] = None
+
+
+def _redis() -> redis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(
+            str(settings.REDIS_URL), socket_timeout=METRIC_REDIS_TIMEOUT, socket_connect_timeout=METRIC_REDIS_TIMEOUT
+        )
+    return _redis_client
+
+
+def record_lookups(hits: int, misses: int) -> None:
+    """累加命中/未命中次数。统计失败只记录日志，不影响调度。"""
+    if not hits and not misses:
+        return
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        pipe.incrby(METRIC_HITS_KEY, hits)
+        pipe.incrby(METRIC_MISSES_KEY, misses)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"无法记录结果缓存统计: {e}")
+
+
+def lookup_stats() -> Dict[str, Any]:
+    """累计的命中/未命中次数和命中率。Redis不可用时各项为None，不影响调用方返回其它统计。"""
+    try:
+        values = _redis().mget(METRIC_HITS_KEY, METRIC_MISSES_KEY)
+    except redis.RedisError as e:
+        logger.warning(f"无法读取结果缓存统计: {e}")
+        return {"hits": None, "misses": None, "hit_rate": None}
+    hits, misses = (int(value or 0) for value in values)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
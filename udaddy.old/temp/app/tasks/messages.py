@@ -0,0 +1,44 @@
+# app/tasks/messages.py
+# kombu写入Redis列表的Celery任务消息的解析。只依赖标准库，原生异步Worker和基准测试导入它时不会连带加载数据库引擎。
+
+import base64
+import binascii
+import json
+from typing import Any, Dict, Optional
+
+EXECUTE_GROUP_TASK = "netbase.worker.execute_group"
+
+
+class InvalidMessageError(ValueError):
+    """消息不是合法的JSON，或者信封、消息体的结构不符合Celery任务协议。"""
+
+
+def decode_execute_group_message(raw: bytes) -> Optional[Dict[str, Any]]:
+    """
+    解析kombu写入Redis列表的Celery消息，返回 execute_group 的载荷。
+    消息不是 execute_group 任务时返回None；消息本身无法解析时抛出 InvalidMessageError。
+    """
+    try:
+        message = json.loads(raw)
+        headers = message.get("headers") or {}
+        body = message.get("body")
+        if (message.get("properties") or {}).get("body_encoding") == "base64":
+            body = base64.b64decode(body)
+        decoded = json.loads(body)
+
+        if isinstance(decoded, dict):
+            # Celery任务协议v1: 任务名和参数都在消息体中
+            task_name, args, kwargs = decoded.get("task"), decoded.get("args", []), decoded.get("kwargs", {})
+        else:
+            # Celery任务协议v2: 消息体为 [args, kwargs, embed]，任务名在headers中
+            task_name, args, kwargs = headers.get("task"), decoded[0], decoded[1]
+
+        if task_name != EXECUTE_GROUP_TASK:
+            return None
+        payload = args[0] if args else kwargs.get("payload")
+    except (ValueError, TypeError, KeyError, IndexError, AttributeError, binascii.Error) as e:
+        raise InvalidMessageError(f"Malformed task message: {e}") from e
+
+    if not isinstance(payload, dict):
+        raise InvalidMessageError(f"execute_group payload must be an object, got {type(payload).__name__}.")
+    return payload
@@ -0,0 +1,177 @@
+# app/tasks/prewarm.py
+# Worker启动时的WASM模块预热：在开始消费 compute_queue 之前，
+# 按近期使用量挑选最常用的WASM Agent，把它们的模块载入执行WASM的进程的模块缓存（以及磁盘上的预编译产物缓存），
+# 避免每个Agent在每个Worker上的第一个任务承担完整的编译延迟。
+# Celery prefork Worker 分两步进行：主进程只在一个一次性的spawn子进程中把模块编译进磁盘缓存（主进程本身不调用wasmtime，
+# fork时不会有wasmtime的编译线程池被复制），每个fork出的子进程再在 worker_process_init 中从磁盘缓存加载。
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app import crud, models
+from app.core.config import settings
+from app.db.session import SessionLocal, engine
+from app.tasks.wasm_executor import WasmExecutor
+from app.tasks.wasm_manager import WasmManager
+from app.tasks.workspace import pid_alive
+
+logger = logging.getLogger(__name__)
+
+
+def select_prewarm_modules() -> List[str]:
+    """最近 WASM_PREWARM_WINDOW_HOURS 小时内最常用的 WASM_PREWARM_TOP_N 个WASM Agent的模块路径（已去重）。"""
+    since = datetime.utcnow() - timedelta(hours=settings.WASM_PREWARM_WINDOW_HOURS)
+    db = SessionLocal()
+    try:
+        agents = crud.agent.get_most_used(
+            db, agent_type=models.AgentType.WASM, since=since, limit=settings.WASM_PREWARM_TOP_N
+        )
+        # 多个Agent可能引用同一个模块文件
+        return list(dict.fromkeys(agent.source_reference for agent in agents))
+    finally:
+        db.close()
+        # Celery主进程在fork子进程之前查询，不能把连接池中的连接遗留给子进程共享
+        engine.dispose()
+
+
+def _preload(manager: WasmManager, module_path: str) -> float:
+    start = time.perf_counter()
+    asyncio.run(manager.preload(module_path))
+    return time.perf_counter() - start
+
+
+def preload_modules(manager: WasmManager, module_paths: List[str]) -> Dict[str, Any]:
+    """
+    并行地把模块载入 manager 的缓存（磁盘缓存中有预编译产物时直接加载，否则编译并写入磁盘缓存）。
+    单个模块失败只记录日志，不影响其它模块，也不阻止Worker启动。返回预热统计。
+    """
+    total = len(module_paths)
+    logger.info(f"开始预热 {total} 个WASM模块...")
+    started = time.perf_counter()
+    warmed, failed = 0, 0
+    workers = settings.WASM_PREWARM_CONCURRENCY or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, total or 1)), thread_name_prefix="netbase-prewarm") as pool:
+        futures = {pool.submit(_preload, manager, path): path for path in module_paths}
+        for done, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                elapsed = future.result()
+                warmed += 1
+                logger.info(f"[预热 {done}/{total}] {path} 就绪，用时 {elapsed * 1000:.0f} ms。")
+            except Exception as e:
+                failed += 1
+                logger.warning(f"[预热 {done}/{total}] {path} 失败: {e}")
+
+    stats = {
+        "modules": total,
+        "warmed": warmed,
+        "failed": failed,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"WASM模块预热完成: {stats}")
+    return stats
+
+
+def _build_artifacts_in_subprocess(module_paths: List[str]) -> Dict[str, Any]:
+    return preload_modules(WasmManager(), module_paths)
+
+
+def build_artifacts(module_paths: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    在一个一次性的spawn子进程中编译模块，只为了填充磁盘上的预编译产物缓存，调用方进程本身不加载任何模块。
+    未配置磁盘缓存（WASM_ARTIFACT_CACHE_DIR为空）时编译结果无处保存，直接返回None。
+    """
+    if not settings.WASM_ARTIFACT_CACHE_DIR or not module_paths:
+        return None
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_build_artifacts_in_subprocess, module_paths).result()
+
+
+def prewarm_process(manager: WasmManager, executor: WasmExecutor, module_paths: List[str]) -> Dict[str, Any]:
+    """
+    预热实际执行WASM的进程：inline/thread 模式下是 manager 所在的当前进程；
+    process 模式下WASM在执行器的子进程中运行，由执行器启动所有子进程并让它们各自加载模块。
+    """
+    if executor.mode == "process":
+        return executor.prewarm(module_paths)
+    return preload_modules(manager, module_paths)
+
+
+def ready_file() -> Optional[Path]:
+    """当前进程的就绪文件路径，WORKER_READY_FILE 中的 {pid} 被替换为进程号。"""
+    if not settings.WORKER_READY_FILE:
+        return None
+    return Path(settings.WORKER_READY_FILE.replace("{pid}", str(os.getpid())))
+
+
+def mark_ready(stats: Optional[Dict[str, Any]] = None) -> None:
+    """写入就绪文件，编排系统（如Kubernetes的readiness探针）可据此等待Worker预热完成。"""
+    path = ready_file()
+    if path is None:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_text(json.dumps({"pid": os.getpid(), "ready_at": datetime.utcnow().isoformat(), "prewarm": stats}))
+    os.replace(tmp_path, path)
+
+
+def clear_ready() -> None:
+    path = ready_file()
+    if path is not None:
+        path.unlink(missing_ok=True)
+
+
+def remove_stale_ready_files() -> int:
+    """
+    删除已退出进程留下的就绪文件。被SIGKILL或OOM killer杀死的进程来不及执行 clear_ready，
+    其就绪文件会一直留在原处，按通配符检查的探针会因此误判。返回删除的文件数。
+    """
+    template = settings.WORKER_READY_FILE
+    if not template or "{pid}" not in Path(template).name:
+        return 0
+    directory = Path(template).parent
+    prefix, suffix = Path(template).name.split("{pid}", 1)
+    removed = 0
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if not (entry.name.startswith(prefix) and entry.name.endswith(suffix)):
+            continue
+        pid = entry.name[len(prefix):len(entry.name) - len(suffix)]
+        if not pid.isdigit() or pid_alive(pid):
+            continue
+        Path(entry.path).unlink(missing_ok=True)
+        removed += 1
+    if removed:
+        logger.info(f"已删除 {removed} 个已退出Worker进程遗留的就绪文件。")
+    return removed
+
+
+def prewarm_and_mark_ready(
+    manager: WasmManager, executor: WasmExecutor, module_paths: Optional[List[str]] = None
+) -> None:
+    """
+    Worker进程启动钩子：预热（如已启用）后发出就绪信号。预热本身出错时Worker仍然就绪，只是冷启动。
+    module_paths 为None时自行查询要预热的模块。
+    """
+    clear_ready()
+    remove_stale_ready_files()
+    stats = None
+    if settings.WASM_PREWARM_ENABLED:
+        try:
+            if module_paths is None:
+                module_paths = select_prewarm_modules()
+            stats = prewarm_process(manager, executor, module_paths)
+        except Exception as e:
+            logger.error(f"WASM模块预热失败，Worker将以冷缓存启动: {e}", exc_info=True)
+    mark_ready(stats)
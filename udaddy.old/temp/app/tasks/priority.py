@@ -0,0 +1,64 @@
+# app/tasks/priority.py
+# 按 WorkflowInstance.priority 把任务组分到三档计算队列：<基础名>.high、<基础名>、<基础名>.low。
+# 调度器据此选择队列，原生异步Worker按加权公平轮询消费三档队列（见 app/tasks/async_worker.py）。
+# Celery prefork Worker 在队列之间只做简单轮询，需要按档位部署专用的Worker池（见 README）。
+
+from typing import Dict, List, Tuple
+
+from app.core.config import settings
+
+TIERS = ("high", "normal", "low")
+# 随消息一起发送的broker优先级（0-9，数值越大越优先），供支持消息优先级的broker（如RabbitMQ）在同一队列内排序
+BROKER_PRIORITIES = {"high": 9, "normal": 5, "low": 0}
+
+
+def tier_for_priority(priority: int | None) -> str:
+    priority = priority or 0
+    if priority >= settings.PRIORITY_HIGH_THRESHOLD:
+        return "high"
+    if priority < settings.PRIORITY_LOW_THRESHOLD:
+        return "low"
+    return "normal"
+
+
+def queue_name(tier: str, base: str | None = None) -> str:
+    base = base or settings.COMPUTE_QUEUE
+    return base if tier == "normal" else f"{base}.{tier}"
+
+
+def tier_queues(base: str | None = None) -> List[Tuple[str, int]]:
+    """三档队列及其消费权重，从高到低排列。"""
+    if len(settings.PRIORITY_QUEUE_WEIGHTS) != len(TIERS):
+        raise ValueError(
+            f"PRIORITY_QUEUE_WEIGHTS must have one weight per tier {TIERS}, got {settings.PRIORITY_QUEUE_WEIGHTS}."
+        )
+    return [(queue_name(tier, base), weight) for tier, weight in zip(TIERS, settings.PRIORITY_QUEUE_WEIGHTS)]
+
+
+def route_for_priority(priority: int | None) -> Dict[str, object]:
+    """send_task 的路由参数：目标队列和broker优先级。"""
+    tier = tier_for_priority(priority)
+    return {"queue": queue_name(tier), "priority": BROKER_PRIORITIES[tier]}
+
+
+class WeightedFairSelector:
+    """
+    平滑加权轮询（smooth weighted round-robin）：每次返回一个各队列的尝试顺序。
+    权重为 8:3:1 时，三档队列都有积压的情况下大约按 8:3:1 的比例被选为首选，且交错分布；
+    首选队列为空时依次尝试其它队列，Worker不会因为某一档为空而空闲。低优先级队列永远不会被饿死。
+    """
+
+    def __init__(self, weights: List[int]):
+        if not weights or any(weight <= 0 for weight in weights):
+            raise ValueError(f"Queue weights must be positive, got {weights}.")
+        self._weights = list(weights)
+        self._current = [0] * len(weights)
+        self._total = sum(weights)
+
+    def next_order(self) -> List[int]:
+        for i, weight in enumerate(self._weights):
+            self._current[i] += weight
+        preferred = max(range(len(self._weights)), key=lambda i: self._current[i])
+        self._current[preferred] -= self._total
+        # 首选之后按权重从高到低回退
+        return [preferred] + [i for i in sorted(range(len(self._weights)), key=lambda i: -self._weights[i]) if i != preferred]
@@ -1,209 +1,618 @@
 # app/tasks/scheduler.py
 
 import logging
-from typing import Dict, Any, List, Set
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
 
 from sqlalchemy.orm import Session
 from nanoid import generate as generate_nanoid
 
-from app import crud, models, schemas
+from app import crud, models
 from app.core.config import settings # 导入配置
 from app.tasks.celery_app import celery_app # 确保从正确的路径导入
 from app.db.session import SessionLocal
+from app.tasks.execution_plan import ExecutionPlan, bind_inputs, get_instance_plan
+from app.tasks.messages import EXECUTE_GROUP_TASK
+from app.tasks.priority import route_for_priority
+from app.tasks.memo import eviction_due, is_deterministic, memo_key, record_lookups, source_hasher
+from app.storage.blob_store import blob_store, externalize_large_values, uses_blob_refs
 
 # 配置日志记录器
 logging.basicConfig(level=settings.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
 
-# --- DAG 完整性检查 (未改变) ---
-# 这部分逻辑对于确保工作流的有效性至关重要，因此予以保留。
+# --- 依赖与节点辅助函数 ---
+# DAG结构（邻接表、入度、节点定义索引）由 ExecutionPlan 在每个模板版本上只编译一次，
+# 循环检测也在编译时完成，见 app/tasks/execution_plan.py。
+# 节点是否就绪不再通过 COUNT 查询上游任务判断，而是由 task_dependency_counters 表中
+# 每个 (工作流实例, 节点) 的剩余依赖计数决定，见 app/crud/crud_task_dependency.py。
 
-def _is_dag_cyclic_util(
-    node_id: str,
-    adjacency_list: Dict[str, List[str]],
-    visited: Set[str],
-    recursion_stack: Set[str],
-) -> bool:
+
+# --- 新核心：基于任务组的分发逻辑 ---
+
+def _resolve_resource_limits(agent: models.Agent, node_def: Dict) -> Dict[str, Any]:
     """
-    使用深度优先搜索（DFS）检测图中是否存在循环的辅助函数。
+    合并任务的资源限制（fuel、max_memory_bytes、max_table_elements、timeout_seconds）：
+    Agent配置中的 resource_limits 为该Agent的默认值，节点定义中的 resource_limits 可逐项覆盖。
+    未指定的项由Worker使用全局默认值。
     """
-    visited.add(node_id)
-    recursion_stack.add(node_id)
+    limits = dict((agent.config or {}).get("resource_limits") or {})
+    limits.update(node_def.get("data", {}).get("resource_limits") or {})
+    return limits
 
-    for neighbour in adjacency_list.get(node_id, []):
-        if neighbour not in visited:
-            if _is_dag_cyclic_util(
-                neighbour, adjacency_list, visited, recursion_stack
-            ):
-                return True
-        elif neighbour in recursion_stack:
-            return True
 
-    recursion_stack.remove(node_id)
-    return False
+def _externalize_inputs(agent: models.Agent, input_params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    对声明了 blob_refs 的Agent，超过 BLOB_INLINE_THRESHOLD_BYTES 的输入值只写入共享的大对象存储一次，
+    task_instances 表和Worker载荷中都只保存 $blob 引用。其它Agent的输入保持内联。
+    """
+    if blob_store is None or not input_params or not uses_blob_refs(agent.config):
+        return input_params
+    return externalize_large_values(blob_store, input_params, settings.BLOB_INLINE_THRESHOLD_BYTES)
 
 
-def is_dag_cyclic(nodes: List[Dict], edges: List[Dict]) -> bool:
+def _resolve_input_refs(
+    db: Session, workflow_instance: models.WorkflowInstance, plan: ExecutionPlan, nodes_to_dispatch: List[Dict]
+) -> Dict[str, List[Dict[str, Any]]]:
     """
-    检查给定的节点和边定义的DAG中是否存在循环。
+    把节点的数据边解析为上游任务实例的引用 (节点ID -> [{task_instance_id, output_key, input_key}])。
+    载荷中只携带这些引用，上游输出由Worker按任务组批量读取；整个任务组只需一次查询。
     """
-    adjacency_list = {node["id"]: [] for node in nodes}
-    for edge in edges:
-        if edge["from"] in adjacency_list and edge["to"] in adjacency_list:
-            adjacency_list[edge["from"]].append(edge["to"])
-
-    visited = set()
-    recursion_stack = set()
-    for node_id in adjacency_list:
-        if node_id not in visited:
-            if _is_dag_cyclic_util(
-                node_id, adjacency_list, visited, recursion_stack
-            ):
-                logger.error(f"在DAG中检测到循环，涉及节点: {node_id}")
-                return True
-    return False
-
-
-# --- 依赖与节点辅助函数 (逻辑优化) ---
-
-def _get_downstream_nodes(
-    completed_node_id: str, edges: List[Dict]
-) -> List[str]:
-    """获取一个节点的所有直接下游节点。"""
-    return [edge["to"] for edge in edges if edge["from"] == completed_node_id]
+    bindings = {node_def["id"]: plan.input_bindings_for(node_def["id"]) for node_def in nodes_to_dispatch}
+    upstream_node_ids = {upstream_id for node_bindings in bindings.values() for upstream_id, _, _ in node_bindings}
+    if not upstream_node_ids:
+        return {}
+    task_ids = crud.task_instance.get_latest_completed_ids(
+        db, workflow_instance_id=workflow_instance.id, node_ids=list(upstream_node_ids)
+    )
+    return {
+        node_id: [
+            {"task_instance_id": task_ids[upstream_id], "output_key": output_key, "input_key": input_key}
+            for upstream_id, output_key, input_key in node_bindings
+            if upstream_id in task_ids
+        ]
+        for node_id, node_bindings in bindings.items()
+        if node_bindings
+    }
 
 
-def _get_upstream_nodes(
-    target_node_id: str, edges: List[Dict]
-) -> List[str]:
-    """获取一个节点的所有直接上游（依赖）节点。"""
-    return [edge["from"] for edge in edges if edge["to"] == target_node_id]
+def _compute_memo_keys(
+    db: Session,
+    agents: Dict[int, models.Agent],
+    nodes_to_dispatch: List[Dict],
+    static_inputs: Dict[str, Dict[str, Any]],
+    input_refs: Dict[str, List[Dict[str, Any]]],
+) -> Dict[str, str]:
+    """
+    为声明了 deterministic 的Agent的节点计算结果缓存键 (节点ID -> memo_key)。
+    键由Agent源文件的内容哈希和规范化的输入哈希组成，输入中包含按数据边合并进来的上游输出，
+    与Worker实际看到的输入完全一致；上游输出只需一次查询。
+    """
+    eligible = [node_def for node_def in nodes_to_dispatch if is_deterministic(agents[node_def["data"]["agent_id"]].config)]
+    if not eligible:
+        return {}
+    upstream_ids = {ref["task_instance_id"] for node_def in eligible for ref in input_refs.get(node_def["id"], [])}
+    outputs = crud.task_instance.get_outputs(db, ids=list(upstream_ids))
+
+    keys = {}
+    for node_def in eligible:
+        agent = agents[node_def["data"]["agent_id"]]
+        source_hash = source_hasher.get(agent.source_reference)
+        if source_hash is None:
+            logger.debug(f"Agent {agent.id} 的源文件 '{agent.source_reference}' 无法读取，不使用结果缓存。")
+            continue
+        inputs, _ = bind_inputs(static_inputs[node_def["id"]], input_refs.get(node_def["id"], []), outputs)
+        keys[node_def["id"]] = memo_key(source_hash, inputs)
+    return keys
+
+
+def _worker_task(
+    task_instance_id: int, agent: models.Agent, node_def: Dict, inputs: Dict[str, Any], input_refs: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """构建任务组载荷中单个任务的描述。"""
+    return {
+        "task_instance_id": task_instance_id,
+        "type": agent.agent_type.value,
+        "source_reference": agent.source_reference, # 临时修复：直接传递路径
+        "agent_config": agent.config or {},
+        "resource_limits": _resolve_resource_limits(agent, node_def),
+        "params": {
+            "input_params": inputs,
+            "input_refs": input_refs,
+        }
+    }
 
 
-def _are_dependencies_met(
-    db: Session,
-    target_node_id: str,
-    workflow_instance_id: int,
-    edges: List[Dict],
-) -> bool:
-    """检查一个节点的所有依赖任务是否都已成功完成。"""
-    upstream_node_ids = _get_upstream_nodes(target_node_id, edges)
-    if not upstream_node_ids:
-        return True  # 没有依赖，条件满足
+def _prepare_task_group(
+    db: Session, workflow_instance: models.WorkflowInstance, plan: ExecutionPlan, nodes_to_dispatch: List[Dict]
+) -> Tuple[Optional[Dict[str, Any]], List[int]]:
+    """
+    为一组可执行的节点创建任务实例并构建Worker载荷，但不提交事务、不发送消息。
+    只需三次数据库往返：一次IN查询预取所有Agent，一次查询解析数据边引用的上游任务，
+    一条多行 INSERT ... RETURNING 创建所有任务实例；组内有确定性Agent时另需查询一次结果缓存。
+    命中结果缓存的节点直接以COMPLETED状态创建，不进入载荷。
+    返回 (Worker载荷, 命中缓存的任务实例ID)；没有需要分发的任务时载荷为None。
+    节点定义无效时将工作流标记为失败并返回 (None, [])。
+    """
+    if not nodes_to_dispatch:
+        return None, []
 
-    completed_upstream_tasks_count = db.query(models.TaskInstance).filter(
-        models.TaskInstance.workflow_instance_id == workflow_instance_id,
-        models.TaskInstance.node_id.in_(upstream_node_ids),
-        models.TaskInstance.status == "COMPLETED",
-    ).count()
+    group_id = generate_nanoid(size=12)
 
-    return completed_upstream_tasks_count == len(upstream_node_ids)
+    logger.info(f"为工作流 {workflow_instance.id} 创建任务组 '{group_id}'，包含 {len(nodes_to_dispatch)} 个节点。")
 
+    for node_def in nodes_to_dispatch:
+        if not node_def.get("data", {}).get("agent_id"):
+            logger.error(f"节点 '{node_def.get('id')}' 未定义 'agent_id'，工作流失败。")
+            workflow_instance.status = "FAILED"
+            return None, []
+
+    # 1. 一次性预取组内引用的所有Agent
+    agent_ids = {node_def["data"]["agent_id"] for node_def in nodes_to_dispatch}
+    agents = {agent.id: agent for agent in crud.agent.get_many(db, ids=list(agent_ids))}
+    for node_def in nodes_to_dispatch:
+        agent_id = node_def["data"]["agent_id"]
+        if agent_id not in agents:
+            logger.error(f"节点 '{node_def.get('id')}' 的Agent ID '{agent_id}' 未找到，工作流失败。")
+            workflow_instance.status = "FAILED"
+            return None, []
+
+    input_refs = _resolve_input_refs(db, workflow_instance, plan, nodes_to_dispatch)
+    static_inputs = {
+        node_def["id"]: _externalize_inputs(agents[node_def["data"]["agent_id"]], node_def["data"].get("input_params", {}))
+        for node_def in nodes_to_dispatch
+    }
+
+    # 2. 确定性Agent的节点先查结果缓存（查找的同时记录命中）
+    now = datetime.utcnow()
+    memo_keys = _compute_memo_keys(db, agents, nodes_to_dispatch, static_inputs, input_refs)
+    cached_outputs = crud.task_result_cache.lookup(db, memo_keys=list(set(memo_keys.values())), now=now)
+    hits = sum(1 for key in memo_keys.values() if key in cached_outputs)
+    record_lookups(hits, len(memo_keys) - hits)
+
+    # 3. 批量创建任务实例，随调用方的其它变更（依赖计数等）一起提交
+    task_instance_rows = []
+    for node_def in nodes_to_dispatch:
+        key = memo_keys.get(node_def["id"])
+        row = {
+            "workflow_instance_id": workflow_instance.id,
+            "node_id_in_dag": node_def["id"],
+            "agent_id": node_def["data"]["agent_id"],
+            "status": models.TaskStatus.PENDING,
+            "inputs": static_inputs[node_def["id"]],
+            "memo_key": key,
+            "dispatched_at": now,
+        }
+        if key in cached_outputs:
+            row.update(
+                status=models.TaskStatus.COMPLETED,
+                outputs=cached_outputs[key],
+                from_cache=True,
+                started_at=now,
+                completed_at=now,
+            )
+        task_instance_rows.append(row)
+    task_instances = crud.task_instance.create_many(db, objs_in=task_instance_rows, commit=False, refresh=False)
+
+    # 4. 为Worker准备任务载荷
+    cached_ids = []
+    worker_payload_tasks = []
+    for task_instance, row, node_def in zip(task_instances, task_instance_rows, nodes_to_dispatch):
+        if row.get("from_cache"):
+            cached_ids.append(task_instance.id)
+            continue
+        worker_payload_tasks.append(_worker_task(
+            task_instance.id, agents[row["agent_id"]], node_def, row["inputs"], input_refs.get(node_def["id"], [])
+        ))
+
+    if cached_ids:
+        logger.info(f"任务组 '{group_id}' 中 {len(cached_ids)} 个任务命中结果缓存，不再分发: {cached_ids}")
+    if not worker_payload_tasks:
+        return None, cached_ids
+
+    # 准备发送给Worker的最终载荷
+    return {
+        "group_id": group_id,
+        "priority": workflow_instance.priority or 0,
+        "tasks": worker_payload_tasks,
+    }, cached_ids
+
+
+def _send_task_group(payload: Dict[str, Any]):
+    """
+    将整个任务组分发到Worker入口点。必须在任务实例提交之后调用。
+    按工作流的优先级选择三档计算队列之一，交互式的高优先级运行不会排在批量回填的积压之后。
+    """
+    route = route_for_priority(payload.get("priority"))
+    celery_app.send_task(EXECUTE_GROUP_TASK, args=[payload], **route)
+    task_instance_ids = [t["task_instance_id"] for t in payload["tasks"]]
+    logger.info(f"任务组 '{payload['group_id']}' (任务实例: {task_instance_ids}) 已分发至 {route['queue']}。")
+
+
+# --- 任务组发件箱 ---
+# 任务组载荷与任务实例、依赖计数、完成事件的认领在同一事务中写入 task_group_outbox，
+# 提交之后才发送并删除发件箱行。发送失败（如broker不可用）时行保留在发件箱中，
+# 由重试的调度事件或定时中继任务 relay_task_group_outbox 重新发送，任务组不会因提交与发送之间的失败而丢失。
+# 投递语义为“至少一次”：极端情况下同一任务组可能被发送两次，重复的结束事件由 claim_completions 丢弃。
+
+def _publish_task_groups(db: Session, rows: List[models.TaskGroupOutbox]) -> int:
+    """发送已锁定的发件箱行并删除已发送的行，然后提交。发送失败时先提交已发送部分的删除，再抛出异常。"""
+    sent_ids = []
+    try:
+        for row in rows:
+            _send_task_group(row.payload)
+            sent_ids.append(row.id)
+    finally:
+        crud.task_group_outbox.delete_many(db, ids=sent_ids)
+        db.commit()
+    return len(sent_ids)
+
+
+def _publish_outbox(db: Session, outbox_ids: List[int]):
+    """发送本事务刚提交的发件箱行。"""
+    if outbox_ids:
+        _publish_task_groups(db, crud.task_group_outbox.lock_many(db, ids=outbox_ids))
+
+
+def relay_task_group_outbox(db: Session) -> int:
+    """
+    重新发送在发件箱中滞留超过 SCHEDULER_OUTBOX_RELAY_AFTER_SECONDS 的任务组，返回发送的数量。
+    刚提交、正由其它调度器进程发送的行还没有达到这个时长，或已被其锁定，不会被重复发送。
+    """
+    created_before = datetime.utcnow() - timedelta(seconds=settings.SCHEDULER_OUTBOX_RELAY_AFTER_SECONDS)
+    relayed = 0
+    while True:
+        rows = crud.task_group_outbox.lock_stale(
+            db, created_before=created_before, limit=crud.task_group_outbox.bulk_chunk_size
+        )
+        if not rows:
+            db.commit()
+            break
+        relayed += _publish_task_groups(db, rows)
+    if relayed:
+        logger.warning(f"从发件箱重新发送了 {relayed} 个此前发送失败的任务组。")
+    return relayed
 
-# --- 新核心：基于任务组的分发逻辑 ---
 
 def dispatch_task_group(
-    db: Session, workflow_instance: models.WorkflowInstance, nodes_to_dispatch: List[Dict]
+    db: Session, workflow_instance: models.WorkflowInstance, plan: ExecutionPlan, nodes_to_dispatch: List[Dict]
 ):
     """
     将一组可执行的节点打包成一个任务组，创建它们的数据库实例，
     并作为一个统一的载荷分发给异步Worker。
+    任务实例、发件箱中的载荷与调用方此前的未提交变更在同一次提交中落库，提交之后再发送。
+    命中结果缓存的任务随后立即按已完成处理，其下游节点在本次调用中继续分发。
     """
-    if not nodes_to_dispatch:
-        return
+    payload, cached_ids = _prepare_task_group(db, workflow_instance, plan, nodes_to_dispatch)
+    outbox_ids = crud.task_group_outbox.add(db, payloads=[payload] if payload else [])
+    db.commit()
+    _publish_outbox(db, outbox_ids)
+    if cached_ids:
+        _process_task_outcomes(db, {task_id: True for task_id in cached_ids})
 
-    group_id = generate_nanoid(size=12)
-    worker_payload_tasks = []
-    task_instance_ids = []
 
-    logger.info(f"为工作流 {workflow_instance.id} 创建任务组 '{group_id}'，包含 {len(nodes_to_dispatch)} 个节点。")
+# --- 任务结束事件的批量处理 ---
 
-    for node_def in nodes_to_dispatch:
-        node_id = node_def.get("id")
-        agent_id = node_def.get("data", {}).get("agent_id")
-        
-        if not agent_id:
-            logger.error(f"节点 '{node_id}' 未定义 'agent_id'，工作流失败。")
-            workflow_instance.status = "FAILED"
-            db.commit()
-            return
+def _process_task_outcomes(db: Session, outcomes: Dict[int, bool]):
+    """
+    处理一批任务结束事件 (task_instance_id -> 是否成功)。
+    新分发的节点中命中结果缓存的任务在这里继续按已完成处理，
+    因此一整条可缓存的链路在一次调度事件中就能走完，无需经过Worker。
+    """
+    while outcomes:
+        outcomes = _apply_task_outcomes(db, outcomes)
+
+
+def _store_memoized_results(db: Session, tasks: List[models.TaskInstance]):
+    """把确定性Agent成功执行的结果写入结果缓存，与计数变更在同一事务中提交。"""
+    entries = [
+        {"memo_key": task.memo_key, "agent_id": task.agent_id, "outputs": task.outputs}
+        for task in tasks
+        if task.memo_key and not task.from_cache and task.status == models.TaskStatus.COMPLETED
+    ]
+    if entries:
+        now = datetime.utcnow()
+        crud.task_result_cache.store(db, entries=entries, now=now, ttl_seconds=settings.MEMO_CACHE_TTL_SECONDS)
+        if eviction_due():
+            removed = crud.task_result_cache.evict(db, now=now, max_entries=settings.MEMO_CACHE_MAX_ENTRIES)
+            if removed:
+                logger.info(f"结果缓存淘汰了 {removed} 个过期或超出容量的条目。")
+
+
+def _apply_task_outcomes(db: Session, outcomes: Dict[int, bool]) -> Dict[int, bool]:
+    """
+    在一个会话、一个事务中处理一批任务结束事件。
+    对同一工作流实例中的所有完成任务，合并计算下游节点的依赖扣减量，只执行一次扣减，
+    因此被多个完成任务同时解锁的汇合节点只会进入一个任务组。
+    返回新分发的节点中命中结果缓存、已直接完成的任务 (task_instance_id -> True)。
+    """
+    outcome_tasks = crud.task_instance.get_many(db, ids=list(outcomes))
+    # 先锁定涉及的工作流实例，与对账（reconcile_workflow_instance）互斥，再认领事件
+    workflow_instances = {
+        instance.id: instance
+        for instance in crud.workflow_instance.lock_many(db, ids=sorted({task.workflow_instance_id for task in outcome_tasks}))
+    }
 
-        agent = crud.agent.get(db, id=agent_id)
-        if not agent:
-            logger.error(f"节点 '{node_id}' 的Agent ID '{agent_id}' 未找到，工作流失败。")
-            workflow_instance.status = "FAILED"
-            db.commit()
-            return
-
-        # 在数据库中创建任务实例
-        task_instance_in = schemas.TaskInstanceCreate(
-            node_id=node_id,
-            status="PENDING",
-            workflow_instance_id=workflow_instance.id,
-            agent_id=agent_id,
-            input_params=node_def.get("data", {}).get("input_params", {}),
+    # 丢弃重复投递的事件，防止依赖计数和完成计数被重复累加
+    claimed_ids = set(crud.task_instance.claim_completions(db, task_instance_ids=list(outcomes)))
+    duplicate_ids = set(outcomes) - claimed_ids
+    if duplicate_ids:
+        logger.warning(f"任务实例 {sorted(duplicate_ids)} 的结束事件已被处理过或不存在，忽略。")
+    if not claimed_ids:
+        db.commit()
+        return {}
+
+    tasks_by_workflow: Dict[int, List[models.TaskInstance]] = defaultdict(list)
+    for task in outcome_tasks:
+        if task.id in claimed_ids:
+            tasks_by_workflow[task.workflow_instance_id].append(task)
+
+    payloads = []
+    cached_ids = []
+    for workflow_instance_id, tasks in tasks_by_workflow.items():
+        workflow_instance = workflow_instances[workflow_instance_id]
+        plan = get_instance_plan(db, workflow_instance)
+        if plan is None:
+            logger.error(f"工作流实例 {workflow_instance.id} 的模板 {workflow_instance.template_id} 未找到。")
+            continue
+
+        succeeded = [task for task in tasks if outcomes[task.id]]
+        failed = [task for task in tasks if not outcomes[task.id]]
+        _store_memoized_results(db, succeeded)
+
+        # 原子地扣减所有下游节点的依赖计数，只有恰好归零的节点才会被分发。
+        # 计数扣减与行锁保证了并发完成的多个上游中只有一个会分发汇合节点。
+        decrements: Dict[str, int] = Counter(
+            node_id for task in succeeded for node_id in plan.downstream(task.node_id_in_dag)
+        )
+        ready_node_ids = crud.task_dependency.decrement(
+            db, workflow_instance_id=workflow_instance.id, decrements=decrements
         )
-        task_instance = crud.task_instance.create(db, obj_in=task_instance_in)
-        task_instance_ids.append(task_instance.id)
-
-        # 为Worker准备任务载荷
-        worker_payload_tasks.append({
-            "task_instance_id": task_instance.id,
-            "type": agent.agent_type.value,
-            "source_reference": agent.source_reference, # 临时修复：直接传递路径
-            "params": {
-                "input_params": task_instance.input_params,
-            }
-        })
 
-    # 准备发送给Worker的最终载荷
-    payload = {
+        # 增量累加结束计数，以O(1)检查整个工作流是否已完成
+        completed_count, _ = crud.workflow_instance.record_task_outcomes(
+            db, workflow_instance_id=workflow_instance.id, completed=len(succeeded), failed=len(failed)
+        )
+
+        if failed:
+            if workflow_instance.status != "FAILED":
+                workflow_instance.status = "FAILED"
+                workflow_instance.completed_at = datetime.utcnow()
+                logger.error(f"任务 {[task.id for task in failed]} 失败，工作流实例 {workflow_instance.id} 已被标记为失败。")
+            continue
+        if workflow_instance.status == "FAILED":
+            # 已失败的工作流不再分发新的节点
+            continue
+
+        if completed_count == len(plan):
+            workflow_instance.status = "COMPLETED"
+            workflow_instance.completed_at = datetime.utcnow()
+            logger.info(f"工作流实例 {workflow_instance.id} 已成功完成。")
+
+        # 将所有新就绪的节点作为一个任务组
+        payload, group_cached_ids = _prepare_task_group(
+            db, workflow_instance, plan, [plan.node_def(node_id) for node_id in ready_node_ids]
+        )
+        if payload:
+            payloads.append(payload)
+        cached_ids.extend(group_cached_ids)
+
+    # 计数变更、结果缓存、所有新任务实例及其发件箱载荷在同一次提交中落库，之后再发送任务组
+    outbox_ids = crud.task_group_outbox.add(db, payloads=payloads)
+    db.commit()
+    _publish_outbox(db, outbox_ids)
+    return {task_id: True for task_id in cached_ids}
+
+
+# --- 崩溃恢复：计数对账 ---
+
+def _prepare_resend(
+    db: Session, workflow_instance: models.WorkflowInstance, plan: ExecutionPlan
+) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    为疑似丢失的任务（长时间PENDING或RUNNING，见 SCHEDULER_RESEND_AFTER_SECONDS）重新构建一个任务组载荷，
+    沿用原来的任务实例及其输入，并刷新它们的分发时间。不提交事务、不发送消息。
+    返回 (Worker载荷, 重新分发的节点ID)；没有这样的任务时载荷为None。
+    """
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=settings.SCHEDULER_RESEND_AFTER_SECONDS)
+    stale_tasks = [
+        task for task in crud.task_instance.get_stale(
+            db, workflow_instance_id=workflow_instance.id, dispatched_before=cutoff, started_before=cutoff
+        )
+        if plan.node_def(task.node_id_in_dag) is not None
+    ]
+    if not stale_tasks:
+        return None, []
+
+    node_defs = {task.node_id_in_dag: plan.node_def(task.node_id_in_dag) for task in stale_tasks}
+    agents = {agent.id: agent for agent in crud.agent.get_many(db, ids=list({task.agent_id for task in stale_tasks}))}
+    input_refs = _resolve_input_refs(db, workflow_instance, plan, list(node_defs.values()))
+    tasks = [task for task in stale_tasks if task.agent_id in agents]
+    if not tasks:
+        return None, []
+
+    crud.task_instance.mark_redispatched(db, task_instance_ids=[task.id for task in tasks], now=now)
+    group_id = generate_nanoid(size=12)
+    logger.warning(
+        f"工作流实例 {workflow_instance.id} 的任务 {[task.id for task in tasks]} 长时间未开始或未结束，"
+        f"作为任务组 '{group_id}' 重新分发。"
+    )
+    return {
         "group_id": group_id,
-        "tasks": worker_payload_tasks,
+        "priority": workflow_instance.priority or 0,
+        "tasks": [
+            _worker_task(
+                task.id, agents[task.agent_id], node_defs[task.node_id_in_dag], task.inputs or {},
+                input_refs.get(task.node_id_in_dag, []),
+            )
+            for task in tasks
+        ],
+    }, [task.node_id_in_dag for task in tasks]
+
+
+def reconcile_workflow_instance(db: Session, instance: models.WorkflowInstance) -> List[str]:
+    """
+    根据 task_instances 的实际状态重新计算一个工作流实例的所有增量计数：
+    完成/失败计数、每个节点的剩余依赖数，并把已结束的任务标记为“调度器已处理”。
+    之后分发那些依赖已满足、却因事件丢失而从未被创建的节点，
+    并重新分发长时间PENDING（消息丢失）或长时间RUNNING（Worker崩溃）的任务。
+    返回被重新分发的节点ID列表。
+    """
+    # 锁定工作流实例直到提交：对账期间该实例的完成事件会等待，计数不会在删除与重建之间被并发修改
+    instance = crud.workflow_instance.lock(db, id=instance.id)
+    if instance is None:
+        db.rollback()
+        return []
+    plan = get_instance_plan(db, instance)
+    if plan is None:
+        logger.error(f"工作流实例 {instance.id} 的模板 {instance.template_id} 未找到，跳过对账。")
+        db.rollback()
+        return []
+
+    node_statuses = crud.task_instance.get_node_statuses(db, workflow_instance_id=instance.id)
+    completed_nodes = {node_id for node_id, status in node_statuses.items() if status == models.TaskStatus.COMPLETED}
+
+    remaining = {
+        node_id: sum(1 for upstream_id in plan.upstream(node_id) if upstream_id not in completed_nodes)
+        for node_id in plan.node_ids
     }
+    crud.task_dependency.reset_for_workflow(db, workflow_instance_id=instance.id, remaining=remaining)
+    crud.task_instance.mark_finished_processed(db, workflow_instance_id=instance.id)
+    completed_count, failed_count = crud.workflow_instance.recompute_task_counts(db, workflow_instance_id=instance.id)
+    logger.info(f"工作流实例 {instance.id} 对账完成: completed={completed_count}, failed={failed_count}。")
+
+    if failed_count > 0:
+        instance.status = "FAILED"
+        db.commit()
+        return []
+    if completed_count == len(plan):
+        instance.status = "COMPLETED"
+        instance.completed_at = instance.completed_at or datetime.utcnow()
+        db.commit()
+        return []
+
+    # 重新分发的任务组与计数一起写入发件箱，随下面的提交落库
+    resend_payload, resent_node_ids = _prepare_resend(db, instance, plan)
+    resend_outbox_ids = crud.task_group_outbox.add(db, payloads=[resend_payload] if resend_payload else [])
+
+    ready_nodes_defs = [
+        plan.node_def(node_id) for node_id, count in remaining.items()
+        if count == 0 and node_id not in node_statuses
+    ]
+    if ready_nodes_defs:
+        dispatch_task_group(db, instance, plan, ready_nodes_defs)
+    else:
+        db.commit()
+    _publish_outbox(db, resend_outbox_ids)
+    return resent_node_ids + [node_def["id"] for node_def in ready_nodes_defs]
+
+
+# --- 增量重跑 ---
+
+def start_rerun(
+    db: Session, instance: models.WorkflowInstance, plan: ExecutionPlan, source_instance_id: int, changed_nodes: List[str]
+) -> List[str]:
+    """
+    以增量方式启动一个重跑实例：changed_nodes 以及来源实例中没有成功结果的节点是“脏”的，
+    它们的所有下游节点也是脏的；其余节点的已完成任务直接复制到新实例中。
+    只为脏节点初始化依赖计数（只计脏的上游），然后分发上游全部干净的脏节点。
+    返回需要重新执行的节点ID列表。
+    """
+    reusable = crud.task_instance.get_latest_completed_ids(
+        db, workflow_instance_id=source_instance_id, node_ids=plan.node_ids
+    )
+    dirty = plan.descendants(set(changed_nodes) | {node_id for node_id in plan.node_ids if node_id not in reusable})
+    clean = [node_id for node_id in plan.node_ids if node_id not in dirty]
+
+    crud.task_instance.copy_completed(
+        db, task_instance_ids=[reusable[node_id] for node_id in clean], workflow_instance_id=instance.id
+    )
+    crud.workflow_instance.record_task_outcomes(db, workflow_instance_id=instance.id, completed=len(clean))
+    remaining = {
+        node_id: sum(1 for upstream_id in plan.upstream(node_id) if upstream_id in dirty)
+        for node_id in plan.node_ids if node_id in dirty
+    }
+    crud.task_dependency.init_for_workflow(db, workflow_instance_id=instance.id, in_degree=remaining)
+    logger.info(
+        f"工作流实例 {instance.id} 增量重跑实例 {source_instance_id}: 复用 {len(clean)} 个节点，重新执行 {len(dirty)} 个节点。"
+    )
+
+    if not dirty:
+        instance.status = "COMPLETED"
+        instance.completed_at = datetime.utcnow()
+        db.commit()
+        return []
 
-    # 将整个任务组分发到新的Worker入口点
-    celery_app.send_task("netbase.worker.execute_group", args=[payload], queue="compute_queue")
-    logger.info(f"任务组 '{group_id}' (任务实例: {task_instance_ids}) 已分发至 compute_queue。")
+    instance.status = "RUNNING"
+    dispatch_task_group(db, instance, plan, [plan.node_def(node_id) for node_id, count in remaining.items() if count == 0])
+    return sorted(dirty)
 
 
 # --- 重构后的核心事件处理器 ---
 
-@celery_app.task(name="handle_scheduler_event", max_retries=3, default_retry_delay=5)
-def handle_scheduler_event(event: dict):
+@celery_app.task(name="relay_task_group_outbox")
+def relay_task_group_outbox_task():
+    """定时中继任务（由celery beat触发）：在调度事件的重试用尽后，兜底重新发送发件箱中滞留的任务组。"""
+    db: Session = SessionLocal()
+    try:
+        return relay_task_group_outbox(db)
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, name="handle_scheduler_event", max_retries=3, default_retry_delay=5)
+def handle_scheduler_event(self, event: dict):
     """
     处理调度事件的核心Celery任务。
-    事件类型: START_WORKFLOW, TASK_COMPLETED, TASK_FAILED
+    事件类型: START_WORKFLOW, RERUN_WORKFLOW, TASKS_COMPLETED, 以及兼容旧版的 TASK_COMPLETED, TASK_FAILED
+    处理失败时回滚未提交的变更并以指数退避重试。已经提交的部分（工作流状态、已认领的完成事件、
+    已创建的任务实例）在重试时不会被重做，其中尚未发送的任务组保存在发件箱中，由重试开始时的中继重新发送。
     """
     db: Session = SessionLocal()
     try:
+        if self.request.retries:
+            relay_task_group_outbox(db)
+
         event_type = event.get("event_type")
-        logger.info(f"接收到调度事件: {event_type}, 数据: {event}")
+        if event_type == "TASKS_COMPLETED":
+            logger.info(f"接收到调度事件: {event_type}, 包含 {len(event.get('results', []))} 个任务结果")
+        else:
+            logger.info(f"接收到调度事件: {event_type}, 数据: {event}")
 
-        if event_type == "START_WORKFLOW":
+        if event_type in ("START_WORKFLOW", "RERUN_WORKFLOW"):
             instance_id = event.get("instance_id")
-            instance = crud.workflow_instance.get(db, id=instance_id)
+            instance = crud.workflow_instance.lock(db, id=instance_id)
             if not instance:
                 logger.error(f"未找到工作流实例: {instance_id}")
                 return
+            if instance.status != models.WorkflowStatus.QUEUED:
+                # 重复投递，或上一次处理已提交之后才失败而被重试
+                logger.warning(f"工作流实例 {instance.id} 已处于 {instance.status} 状态，忽略 {event_type} 事件。")
+                db.rollback()
+                return
 
-            dag_def = instance.dag_definition
-            nodes = dag_def.get("nodes", [])
-            edges = dag_def.get("edges", [])
+            plan = get_instance_plan(db, instance)
+            if plan is None:
+                logger.error(f"工作流实例 {instance.id} 的模板 {instance.template_id} 未找到。")
+                instance.status = "FAILED"
+                db.commit()
+                return
 
-            if is_dag_cyclic(nodes, edges):
+            if plan.is_cyclic:
+                logger.error(f"模板 {plan.template_id} 的DAG中检测到循环，工作流实例 {instance.id} 失败。")
                 instance.status = "FAILED"
                 db.commit()
                 return
 
-            # 找到所有入度为0的起始节点
-            in_degree = {node["id"]: 0 for node in nodes}
-            for edge in edges:
-                if edge["to"] in in_degree:
-                    in_degree[edge["to"]] += 1
-            
-            start_nodes_defs = [node for node in nodes if in_degree.get(node["id"]) == 0]
+            if event_type == "RERUN_WORKFLOW":
+                start_rerun(db, instance, plan, event.get("source_instance_id"), event.get("changed_nodes") or [])
+                return
+
+            # 入度为0的起始节点已在执行计划中预先计算
+            start_nodes_defs = plan.start_node_defs()
 
             if not start_nodes_defs:
                 logger.error(f"工作流实例 {instance.id} 没有任何起始节点。")
@@ -212,63 +621,26 @@ def handle_scheduler_event(event: dict):
                 return
 
             instance.status = "RUNNING"
-            db.commit()
-            
-            # 将所有起始节点作为一个任务组进行分发
-            dispatch_task_group(db, instance, start_nodes_defs)
-
-        elif event_type == "TASK_COMPLETED":
-            task_instance_id = event.get("task_instance_id")
-            task = crud.task_instance.get(db, id=task_instance_id)
-            if not task:
-                logger.error(f"未找到任务实例: {task_instance_id}")
-                return
+            # 为所有存在上游依赖的节点初始化剩余依赖计数
+            crud.task_dependency.init_for_workflow(db, workflow_instance_id=instance.id, in_degree=plan.in_degrees())
 
-            workflow_instance = task.workflow_instance
-            dag_def = workflow_instance.dag_definition
-            nodes = dag_def.get("nodes", [])
-            edges = dag_def.get("edges", [])
-
-            # 寻找所有下游节点，检查它们的依赖是否已全部满足
-            downstream_node_ids = _get_downstream_nodes(task.node_id, edges)
-            newly_ready_nodes_defs = []
-            for node_id in downstream_node_ids:
-                # 检查此节点是否已被分发，防止竞争条件
-                existing_task = db.query(models.TaskInstance).filter_by(
-                    workflow_instance_id=workflow_instance.id, node_id=node_id
-                ).first()
-                if not existing_task and _are_dependencies_met(db, node_id, workflow_instance.id, edges):
-                    node_def = next((n for n in nodes if n["id"] == node_id), None)
-                    if node_def:
-                        newly_ready_nodes_defs.append(node_def)
-
-            # 将所有新就绪的节点作为一个任务组进行分发
-            if newly_ready_nodes_defs:
-                dispatch_task_group(db, workflow_instance, newly_ready_nodes_defs)
-
-            # 检查整个工作流是否已完成
-            all_tasks_count = len(nodes)
-            completed_tasks_count = db.query(models.TaskInstance).filter(
-                models.TaskInstance.workflow_instance_id == workflow_instance.id,
-                models.TaskInstance.status == "COMPLETED"
-            ).count()
-
-            if all_tasks_count == completed_tasks_count:
-                workflow_instance.status = "COMPLETED"
-                db.commit()
-                logger.info(f"工作流实例 {workflow_instance.id} 已成功完成。")
+            # 将所有起始节点作为一个任务组进行分发（与上面的状态和计数一同提交）
+            dispatch_task_group(db, instance, plan, start_nodes_defs)
 
-        elif event_type == "TASK_FAILED":
-            task_instance_id = event.get("task_instance_id")
-            task = crud.task_instance.get(db, id=task_instance_id)
-            if task and task.workflow_instance.status != "FAILED":
-                task.workflow_instance.status = "FAILED"
-                db.commit()
-                logger.error(f"任务 {task.id} 失败，工作流实例 {task.workflow_instance.id} 已被标记为失败。")
+        elif event_type == "TASKS_COMPLETED":
+            # 批量事件: 一个Worker微批次内所有结束的任务
+            _process_task_outcomes(db, {
+                result["task_instance_id"]: result["status"] == "SUCCESS"
+                for result in event.get("results", [])
+            })
+
+        elif event_type in ("TASK_COMPLETED", "TASK_FAILED"):
+            # 单任务事件，保留以兼容旧版Worker
+            _process_task_outcomes(db, {event.get("task_instance_id"): event_type == "TASK_COMPLETED"})
 
     except Exception as e:
         logger.critical(f"处理调度事件时发生严重错误: {e}", exc_info=True)
-        # 可以选择让Celery根据配置进行重试
-        # raise self.retry(exc=e)
+        db.rollback()
+        raise self.retry(exc=e, countdown=self.default_retry_delay * 2 ** self.request.retries)
     finally:
         db.close()
\ No newline at end of file
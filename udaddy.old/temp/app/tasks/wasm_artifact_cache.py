@@ -0,0 +1,128 @@
+# app/tasks/wasm_artifact_cache.py
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from wasmtime import Engine, Module
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_SUFFIX = ".cwasm"
+TMP_SUFFIX = ".tmp"
+# 写入中途被杀死的进程留下的临时文件，超过这个时间（秒）后在淘汰时一并删除
+STALE_TMP_SECONDS = 3600
+
+
+class ModuleArtifactCache:
+    """
+    已编译WASM模块的持久化磁盘缓存。
+    编译产物通过 Module.serialize() 写入磁盘，键为 “模块内容哈希 + 引擎配置指纹”，
+    任何一项变化都会得到新的键，因此无需显式失效。
+    读取时使用 Module.deserialize_file()，由wasmtime直接mmap产物文件，避免重新编译。
+    磁盘占用超过上限时按最近使用时间（文件mtime）淘汰最旧的产物。
+    同一台机器上的所有Worker进程共享同一个目录，新fork的子进程和重新部署后的Worker都能直接热启动。
+    """
+
+    def __init__(self, engine: Engine, cache_dir: Path, max_bytes: int, engine_fingerprint: str):
+        self._engine = engine
+        self._cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        self._engine_fingerprint = engine_fingerprint
+        self._lock = threading.Lock()
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def artifact_key(self, content_hash: str) -> str:
+        return hashlib.sha256(f"{content_hash}:{self._engine_fingerprint}".encode("utf-8")).hexdigest()
+
+    def _artifact_path(self, content_hash: str) -> Path:
+        return self._cache_dir / f"{self.artifact_key(content_hash)}{ARTIFACT_SUFFIX}"
+
+    def load(self, content_hash: str) -> Optional[Module]:
+        """加载已缓存的编译产物；未命中或产物与当前引擎不兼容时返回None。"""
+        path = self._artifact_path(content_hash)
+        # wasmtime打开不存在的文件时抛出的是 WasmtimeError 而不是 FileNotFoundError，先检查以区分未命中与损坏
+        if not path.is_file():
+            return None
+        try:
+            module = Module.deserialize_file(self._engine, str(path))
+        except FileNotFoundError:
+            return None  # 检查之后被其它进程淘汰
+        except Exception as e:
+            # 产物损坏或由不兼容的wasmtime版本生成，删除后按未命中处理
+            logger.warning(f"Discarding unusable WASM artifact {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+
+        try:
+            os.utime(path)  # 刷新mtime，作为LRU淘汰的依据
+        except OSError:
+            pass
+        return module
+
+    def store(self, content_hash: str, module: Module) -> None:
+        """序列化编译产物并原子地写入缓存目录，然后按需淘汰。写入失败只记录日志。"""
+        path = self._artifact_path(content_hash)
+        tmp_path = None
+        try:
+            data = module.serialize()
+            # 先写临时文件再rename，避免其它进程读到写了一半的产物
+            fd, tmp_path = tempfile.mkstemp(dir=self._cache_dir, suffix=TMP_SUFFIX)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            logger.info(f"Stored compiled WASM artifact {path.name} ({len(data)} bytes).")
+        except Exception as e:
+            logger.warning(f"Failed to store WASM artifact {path}: {e}")
+            # 写入或rename失败（如磁盘已满）时不能把临时文件留在缓存目录中
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = []
+            total = 0
+            stale_before = time.time() - STALE_TMP_SECONDS
+            for entry in os.scandir(self._cache_dir):
+                if entry.name.endswith(TMP_SUFFIX):
+                    self._remove_stale_tmp(entry, stale_before)
+                    continue
+                if not entry.name.endswith(ARTIFACT_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            if total <= self._max_bytes:
+                return
+            for _mtime, size, path in sorted(entries):
+                if total <= self._max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                    total -= size
+                    logger.info(f"Evicted WASM artifact {os.path.basename(path)} ({size} bytes).")
+                except FileNotFoundError:
+                    total -= size
+
+    @staticmethod
+    def _remove_stale_tmp(entry: os.DirEntry, stale_before: float) -> None:
+        try:
+            if entry.stat().st_mtime < stale_before:
+                os.unlink(entry.path)
+                logger.info(f"Removed stale temporary WASM artifact {entry.name}.")
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,153 @@
+# app/tasks/wasm_executor.py
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+from app.tasks.wasm_manager import WasmManager
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_MODES = ("inline", "thread", "process")
+
+# --- 线程模式：每个线程一个私有事件循环，共享调用方进程的WasmManager ---
+_thread_state = threading.local()
+
+
+def _execute_in_thread(manager: WasmManager, method: str, kwargs: Dict[str, Any]) -> Any:
+    loop = getattr(_thread_state, "loop", None)
+    if loop is None:
+        loop = _thread_state.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(getattr(manager, method)(**kwargs))
+
+
+# --- 进程模式：每个子进程一个WasmManager单例（模块缓存和实例池都是进程私有的） ---
+_process_manager: Optional[WasmManager] = None
+
+
+def _init_process(preload_paths: List[str]):
+    """子进程初始化：创建WasmManager并载入预热模块（通常直接来自磁盘缓存）。失败只记录日志，子进程照常可用。"""
+    global _process_manager
+    _process_manager = WasmManager()
+    for module_path in preload_paths:
+        try:
+            asyncio.run(_process_manager.preload(module_path))
+        except Exception as e:
+            logger.warning(f"WASM worker process {os.getpid()} failed to prewarm {module_path}: {e}")
+
+
+def _execute_in_process(method: str, kwargs: Dict[str, Any]) -> Any:
+    return asyncio.run(getattr(_process_manager, method)(**kwargs))
+
+
+class WasmExecutor:
+    """
+    决定WASM任务在哪里执行，使CPU密集的WASM计算不阻塞任务组的事件循环。
+    - inline:  直接在事件循环中执行（旧行为），适合极短的计算。
+    - thread:  在线程池中执行。wasmtime通过ctypes调用原生代码时会释放GIL，多个WASM任务可以真正并行。
+    - process: 在进程池中执行，每个子进程持有自己的WasmManager，完全不受GIL影响。
+    Docker、Python等以I/O等待为主的Agent仍作为协程留在事件循环中，只有WASM任务进入执行器。
+    执行器在第一次使用时才创建，避免未执行WASM任务的进程（如只导入本模块的调度器）启动多余的线程或进程。
+    """
+
+    def __init__(self, manager: WasmManager, mode: str, max_workers: Optional[int] = None):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown WASM executor mode '{mode}', expected one of {EXECUTOR_MODES}.")
+        self._manager = manager
+        self._mode = mode
+        self._max_workers = max_workers or os.cpu_count() or 1
+        self._executor: Optional[Executor] = None
+        self._preload_paths: List[str] = []
+        self._lock = threading.Lock()
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    @property
+    def parallelism(self) -> int:
+        """可同时执行的WASM调用数，用于决定批量执行时把同一模块的任务切成几份。"""
+        return 1 if self._mode == "inline" else self._max_workers
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self._mode == "thread":
+                    self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="netbase-wasm")
+                else:
+                    # 使用spawn：Celery子进程和原生异步Worker都运行着后台线程，fork可能复制到被持有的锁
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self._max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_process,
+                        initargs=(self._preload_paths,),
+                    )
+                logger.info(f"WASM {self._mode} executor started with {self._max_workers} workers.")
+            return self._executor
+
+    def prewarm(self, module_paths: List[str]) -> Dict[str, Any]:
+        """
+        进程模式的预热：记录预热模块（之后新建的子进程也会在初始化时载入它们），并立即启动全部子进程，
+        等待它们完成初始化。进程池按需创建子进程，同时提交 max_workers 个任务即可让每个槽位都启动一个子进程。
+        """
+        self._preload_paths = list(module_paths)
+        executor = self._get_executor()
+        pids = {future.result() for future in [executor.submit(os.getpid) for _ in range(self._max_workers)]}
+        stats = {"modules": len(self._preload_paths), "processes": len(pids)}
+        logger.info(f"WASM process executor prewarmed: {stats}")
+        return stats
+
+    async def supports_batch(self, module_path: str) -> bool:
+        """参数与 WasmManager.supports_batch 相同。进程模式下在子进程中检查，模块同时被载入该子进程的缓存。"""
+        try:
+            return await self._dispatch("supports_batch", {"module_path": module_path})
+        except BrokenProcessPool:
+            return False
+
+    async def execute(self, **kwargs: Any) -> Dict[str, Any]:
+        """参数与 WasmManager.execute 相同。"""
+        try:
+            return await self._dispatch("execute", kwargs)
+        except BrokenProcessPool as e:
+            return {"status": "FAILED", "error": f"WASM worker process died: {e}"}
+
+    async def execute_batch(self, **kwargs: Any) -> Dict[int, Dict[str, Any]]:
+        """参数与 WasmManager.execute_batch 相同。"""
+        try:
+            return await self._dispatch("execute_batch", kwargs)
+        except BrokenProcessPool as e:
+            return {
+                task_instance_id: {"status": "FAILED", "error": f"WASM worker process died: {e}"}
+                for task_instance_id, _ in kwargs["items"]
+            }
+
+    async def _dispatch(self, method: str, kwargs: Dict[str, Any]) -> Any:
+        if self._mode == "inline":
+            return await getattr(self._manager, method)(**kwargs)
+
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        if self._mode == "thread":
+            return await loop.run_in_executor(executor, _execute_in_thread, self._manager, method, kwargs)
+
+        try:
+            return await loop.run_in_executor(executor, _execute_in_process, method, kwargs)
+        except BrokenProcessPool as e:
+            # 某个子进程异常退出（如被OOM killer杀死）会使整个进程池不可用，丢弃它以便下次重建
+            logger.error(f"WASM process pool is broken, it will be recreated: {e}")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,160 @@
+# app/tasks/wasm_instance_pool.py
+
+import logging
+import shutil
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, Optional
+
+from wasmtime import Engine, Instance, InstancePre, Linker, Module, Store, WasiConfig
+
+from app.storage.blob_store import INPUTS_GUEST_DIR
+from app.tasks.workspace import WorkspaceManager
+
+logger = logging.getLogger(__name__)
+
+
+def build_wasi_config(workspace_dir: Path, inputs_dir: Optional[Path] = None) -> WasiConfig:
+    """
+    WASM沙箱的WASI配置：继承标准输出，并把宿主的工作区目录映射为WASM内部的根目录'/'。
+    inputs_dir 为大对象输入的暂存目录，以只读方式挂载到 /inputs。
+    """
+    wasi_config = WasiConfig()
+    wasi_config.inherit_stdout()  # 允许WASM的日志输出到Worker的stdout
+    wasi_config.inherit_stderr()
+    wasi_config.preopen_dir(str(workspace_dir), "/")
+    if inputs_dir is not None:
+        wasi_config.preopen_dir(str(inputs_dir), INPUTS_GUEST_DIR, fs_mutable=False)
+    return wasi_config
+
+
+class PooledInstance:
+    """
+    一个可复用的 Store + Instance。
+    每个实例在整个生命周期内占用一个从工作区目录池租借的独立工作区，每次使用后清空；
+    达到最大复用次数后退役，释放其线性内存并归还工作区。
+    """
+
+    def __init__(self, store: Store, instance: Instance, workspace_dir: Path, workspaces: WorkspaceManager):
+        self.store = store
+        self.instance = instance
+        self.workspace_dir = workspace_dir
+        self.uses = 0
+        self._workspaces = workspaces
+
+    def reset_workspace(self) -> None:
+        for child in self.workspace_dir.iterdir():
+            if child.is_dir() and not child.is_symlink():
+                shutil.rmtree(child)
+            else:
+                child.unlink()
+
+    def close(self) -> None:
+        self._workspaces.release(self.workspace_dir)
+
+
+class InstancePool:
+    """
+    单个WASM模块的实例池。
+    - 导入解析只在创建池时通过 Linker.instantiate_pre() 做一次，之后每次实例化都跳过链接步骤。
+    - 声明为无状态（stateless）的Agent可以复用整个 Store + Instance，省去实例化和内存初始化的开销；
+      其它Agent每次仍使用全新的Store，只复用预链接结果，隔离性与不使用池时相同。
+    - 空闲实例最多保留 pool_size 个，每个实例最多被复用 max_reuse 次。
+    """
+
+    def __init__(self, engine: Engine, module: Module, workspaces: WorkspaceManager, *, pool_size: int, max_reuse: int):
+        self.module = module
+        self._engine = engine
+        self._workspaces = workspaces
+        self._pool_size = pool_size
+        self._max_reuse = max_reuse
+        linker = Linker(engine)
+        linker.define_wasi()
+        self._instance_pre: InstancePre = linker.instantiate_pre(module)
+        self._idle: Deque[PooledInstance] = deque()
+        self._lock = threading.Lock()
+
+    def instantiate(self, store: Store) -> Instance:
+        """在调用方提供的Store中实例化预链接的模块。"""
+        return self._instance_pre.instantiate(store)
+
+    def acquire(self, configure_store: Callable[[Store], None]) -> PooledInstance:
+        """取出一个空闲的可复用实例；没有空闲实例时新建一个。configure_store 用于设置新Store的资源限制。"""
+        with self._lock:
+            if self._idle:
+                return self._idle.popleft()
+
+        workspace_dir = self._workspaces.acquire()
+        try:
+            store = Store(self._engine)
+            configure_store(store)
+            store.set_wasi(build_wasi_config(workspace_dir))
+            instance = self._instance_pre.instantiate(store)
+        except BaseException:
+            self._workspaces.release(workspace_dir)
+            raise
+        return PooledInstance(store, instance, workspace_dir, self._workspaces)
+
+    def release(self, pooled: PooledInstance, *, healthy: bool) -> None:
+        """
+        归还实例。执行出错（trap、协议错误等）的实例状态不可信，直接丢弃；
+        达到复用上限或池已满时也会丢弃。
+        """
+        pooled.uses += 1
+        if healthy and pooled.uses < self._max_reuse:
+            try:
+                pooled.reset_workspace()
+            except OSError as e:
+                logger.warning(f"Failed to reset pooled WASM workspace {pooled.workspace_dir}: {e}")
+                healthy = False
+            if healthy:
+                with self._lock:
+                    if len(self._idle) < self._pool_size:
+                        self._idle.append(pooled)
+                        return
+        pooled.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for pooled in idle:
+            pooled.close()
+
+
+class InstancePoolRegistry:
+    """
+    按模块路径管理实例池；模块文件被替换（编译结果变化）后旧池会被关闭并重建。
+    模块被淘汰出模块缓存时由 discard 关闭对应的池，因此池的数量不会超过模块缓存的容量。
+    """
+
+    def __init__(self, engine: Engine, workspaces: WorkspaceManager, *, pool_size: int, max_reuse: int):
+        self._engine = engine
+        self._workspaces = workspaces
+        self._pool_size = pool_size
+        self._max_reuse = max_reuse
+        self._pools: dict[str, InstancePool] = {}
+        self._lock = threading.Lock()
+
+    def get(self, module_path: str, module: Module) -> InstancePool:
+        stale: Optional[InstancePool] = None
+        with self._lock:
+            pool = self._pools.get(module_path)
+            if pool is not None and pool.module is module:
+                return pool
+            stale = pool
+            pool = InstancePool(
+                self._engine, module, self._workspaces, pool_size=self._pool_size, max_reuse=self._max_reuse
+            )
+            self._pools[module_path] = pool
+        if stale is not None:
+            stale.close()
+        return pool
+
+    def discard(self, module: Module) -> None:
+        """关闭并移除为 module 创建的实例池（模块已被淘汰出模块缓存）。"""
+        with self._lock:
+            discarded = [path for path, pool in self._pools.items() if pool.module is module]
+            pools = [self._pools.pop(path) for path in discarded]
+        for pool in pools:
+            pool.close()
@@ -1,54 +1,206 @@
 # app/tasks/wasm_manager.py (新文件)
 
-import asyncio
+import ctypes
 import json
 import logging
+import math
+import os
+import platform
+import shutil
+import struct
+import threading
+import time
+from importlib import metadata
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
 from wasmtime import (Config, Engine, Instance, Linker, Memory, Module, Store,
-                      Trap, WasiConfig)
+                      Trap, TrapCode)
+
+try:
+    import msgpack
+except ImportError:  # 只有声明二进制协议的模块才需要msgpack
+    msgpack = None
 
 # 从app的核心配置中获取日志级别和其它设置
 from app.core.config import settings
+from app.storage.blob_store import BlobStore, blob_store, collect_outputs, stage_inputs, uses_blob_refs
+from app.tasks.wasm_artifact_cache import ModuleArtifactCache
+from app.tasks.wasm_instance_pool import InstancePoolRegistry, build_wasi_config
+from app.tasks.wasm_module_cache import ModuleCache
+from app.tasks.workspace import WorkspaceManager, create_workspace_manager, empty_dir
 
 logger = logging.getLogger(__name__)
 
-# 为WASM执行定义合理的资源限制
-# 这个值需要根据实际任务进行调整和测试
-DEFAULT_WASM_FUEL = 100_000_000  # 约等于几百毫秒的纯计算时间
+# 二进制数据交换协议：模块导出该函数并返回 ABI_MSGPACK 时，输入输出使用MessagePack编码，
+# run 返回一个指向16字节描述符 (u64 ptr, u64 len, 小端) 的指针，而不是打包后的 u64
+ABI_MARKER_EXPORT = "netbase_abi_version"
+ABI_MSGPACK = 1
+# 批量入口：输入为输入对象的数组，输出为等长的输出数组，使用与 run 相同的数据交换协议
+BATCH_EXPORT = "run_batch"
+_OUTPUT_DESCRIPTOR = struct.Struct("<QQ")
+
+# 引擎配置项。它们同时决定编译产物的格式，因此也参与磁盘缓存键的计算
+ENGINE_OPTIONS = {
+    "consume_fuel": True,  # 开启Fuel机制，防止无限循环
+    "epoch_interruption": True,  # 按epoch截止时间中断执行，实现超时
+}
+# 不限制执行时间时使用的epoch截止值
+_NO_EPOCH_DEADLINE = 2 ** 62
+
+
+def _engine_fingerprint() -> str:
+    """wasmtime版本 + 引擎配置 + CPU架构，任何一项不同的编译产物都不能互相复用。"""
+    try:
+        wasmtime_version = metadata.version("wasmtime")
+    except metadata.PackageNotFoundError:
+        wasmtime_version = "unknown"
+    options = ",".join(f"{k}={v}" for k, v in sorted(ENGINE_OPTIONS.items()))
+    return f"wasmtime-{wasmtime_version};{options};{platform.machine()}"
+
+
+class _EpochTicker:
+    """
+    后台线程按固定间隔推进引擎的epoch，Store的epoch截止值由超时时间换算而来，到期后WASM执行被中断（trap）。
+    线程在第一次配置Store时才启动；fork出的子进程不会继承线程，会在自己第一次使用时重新启动。
+    """
+
+    def __init__(self, engine: Engine, interval: float):
+        self._engine = engine
+        self._interval = interval
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name="netbase-wasm-epoch", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self._interval)
+            self._engine.increment_epoch()
+
+    def deadline(self, timeout_seconds: float) -> int:
+        """超时时间对应的epoch增量；非正数表示不限制。"""
+        if timeout_seconds <= 0:
+            return _NO_EPOCH_DEADLINE
+        return max(1, math.ceil(timeout_seconds / self._interval))
+
 
 class WasmManager:
     """
     一个封装了Wasmtime运行时复杂性的生产级管理器。
     负责模块缓存、实例创建、资源限制和安全执行。
     设计为在每个Worker进程中作为单例存在。
+    所有Wasmtime调用（编译、实例化、调用导出函数）都是同步的；需要与事件循环并发时由 WasmExecutor 放到线程或进程中执行。
+    workspace_manager 为实例池中可复用实例提供工作区，未指定时按全局配置创建一个。
     """
     _engine: Engine
-    _module_cache: Dict[str, Module]
+    _epoch_ticker: _EpochTicker
+    _module_cache: ModuleCache
+    _artifact_cache: Optional[ModuleArtifactCache]
+    _pools: Optional[InstancePoolRegistry]
+    _blob_store: Optional[BlobStore]
 
-    def __init__(self):
+    def __init__(self, workspace_manager: Optional[WorkspaceManager] = None):
         logger.info("Initializing WasmManager for production...")
         config = Config()
-        config.async_support = True
-        config.consume_fuel = True  # 开启Fuel机制，防止无限循环
+        for option, value in ENGINE_OPTIONS.items():
+            setattr(config, option, value)
         self._engine = Engine(config)
-        self._module_cache = {}
-        logger.info("Wasmtime Engine created with async support and fuel consumption enabled.")
+        self._epoch_ticker = _EpochTicker(self._engine, settings.WASM_EPOCH_TICK_SECONDS)
+        self._pools = None
+        if settings.WASM_INSTANCE_POOL_ENABLED:
+            self._pools = InstancePoolRegistry(
+                self._engine,
+                workspace_manager or create_workspace_manager(),
+                pool_size=settings.WASM_INSTANCE_POOL_SIZE,
+                max_reuse=settings.WASM_INSTANCE_MAX_REUSE,
+            )
+        # 模块被淘汰出缓存时一并关闭它的实例池，实例池占用的内存也受模块缓存容量的约束
+        self._module_cache = ModuleCache(
+            max_entries=settings.WASM_MODULE_CACHE_MAX_ENTRIES,
+            max_bytes=settings.WASM_MODULE_CACHE_MAX_BYTES,
+            on_evict=self._pools.discard if self._pools is not None else None,
+        )
+        self._blob_store = blob_store
+        self._artifact_cache = None
+        if settings.WASM_ARTIFACT_CACHE_DIR:
+            try:
+                self._artifact_cache = ModuleArtifactCache(
+                    self._engine,
+                    Path(settings.WASM_ARTIFACT_CACHE_DIR),
+                    settings.WASM_ARTIFACT_CACHE_MAX_BYTES,
+                    _engine_fingerprint(),
+                )
+            except OSError as e:
+                logger.warning(f"WASM artifact cache disabled, cannot use {settings.WASM_ARTIFACT_CACHE_DIR}: {e}")
+        logger.info("Wasmtime Engine created with fuel consumption and epoch interruption enabled.")
 
     async def _get_module(self, module_path: str) -> Module:
         """
         从缓存中异步获取已编译的模块，或在首次加载时进行编译。
         这避免了每次执行任务时重复编译WASM字节码的开销。
+        缓存以模块内容哈希为键，文件被替换后会自动加载新版本。
         """
-        if module_path not in self._module_cache:
-            logger.info(f"Compiling and caching WASM module for the first time: {module_path}")
-            try:
-                self._module_cache[module_path] = await Module.from_file_async(self._engine, module_path)
-            except Exception as e:
-                logger.error(f"Failed to compile WASM module {module_path}: {e}")
-                raise
-        return self._module_cache[module_path]
+        try:
+            return await self._module_cache.get(module_path, self._load_or_compile)
+        except Exception as e:
+            logger.error(f"Failed to compile WASM module {module_path}: {e}")
+            raise
+
+    async def preload(self, module_path: str) -> None:
+        """提前把模块加载进缓存（Worker启动时预热用），不执行任何代码。"""
+        await self._get_module(module_path)
+
+    def cache_stats(self) -> Dict[str, int]:
+        """进程内模块缓存的命中/未命中/淘汰计数。"""
+        return self._module_cache.stats()
+
+    async def _load_or_compile(self, module_path: str, content_hash: str) -> Module:
+        """进程内缓存未命中时，先尝试从磁盘上的预编译产物加载，最后才真正编译。"""
+        if self._artifact_cache is not None:
+            module = self._artifact_cache.load(content_hash)
+            if module is not None:
+                logger.info(f"Loaded precompiled WASM module from artifact cache: {module_path}")
+                return module
+
+        logger.info(f"Compiling and caching WASM module for the first time: {module_path}")
+        module = Module.from_file(self._engine, module_path)
+        if self._artifact_cache is not None:
+            self._artifact_cache.store(content_hash, module)
+        return module
+
+    def _configure_store(self, store: Store, limits: Dict[str, Any]) -> None:
+        """
+        为一次执行设置资源限制。使用 set_fuel 而不是累加，复用的Store每次执行都从满额燃料开始；
+        epoch截止值同样相对于当前epoch重新设置。
+        """
+        store.set_fuel(limits["fuel"])
+        # 限制线性内存和表的大小，失控的分配器只会让 memory.grow 失败，而不会耗尽Worker进程的内存
+        store.set_limits(memory_size=limits["max_memory_bytes"], table_elements=limits["max_table_elements"])
+        self._epoch_ticker.ensure_started()
+        store.set_epoch_deadline(self._epoch_ticker.deadline(limits["timeout_seconds"]))
+
+    def _new_store(self, workspace_dir: Path, limits: Dict[str, Any], inputs_dir: Optional[Path] = None) -> Store:
+        store = Store(self._engine)
+        self._configure_store(store, limits)
+        # 将宿主的安全工作区目录映射为WASM内部的根目录'/'，这是实现文件系统隔离的关键
+        store.set_wasi(build_wasi_config(workspace_dir, inputs_dir))
+        return store
+
+    def _instantiate(self, module_path: str, module: Module, store: Store) -> Instance:
+        """在新Store中实例化模块：启用实例池时复用模块的预链接结果，否则现场链接。"""
+        if self._pools is not None:
+            return self._pools.get(module_path, module).instantiate(store)
+        linker = Linker(self._engine)
+        linker.define_wasi()
+        return linker.instantiate(store, module)
 
     async def execute(
         self,
@@ -56,93 +208,283 @@ class WasmManager:
         task_instance_id: int,
         module_path: str,
         input_data: Dict[str, Any],
-        workspace_dir: Path
+        workspace_dir: Path,
+        agent_config: Optional[Dict[str, Any]] = None,
+        resource_limits: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         """
         安全地执行WASM模块。
         此方法实现了资源限制、权限隔离和标准化的数据交换协议。
+        启用实例池时复用模块的预链接结果；Agent配置声明 stateless 时还会复用整个Store和实例，
+        此时WASM看到的是实例自己的临时工作区，而不是 workspace_dir。
+        workspace_dir 必须已经存在，由调用方（工作区管理器）负责创建和回收。
+        resource_limits 中未指定的项使用全局默认值；结果中附带本次实际消耗的燃料 fuel_consumed。
+        对声明了 blob_refs 的Agent，输入中的 $blob 大对象以只读文件的形式出现在沙箱的 /inputs 下，
+        输出中的 $file 文件被存入大对象存储；其它Agent的输入输出原样传递。
         """
         log_prefix = f"[{group_id}/{task_instance_id}/WASM]"
-        
-        # 确保安全的工作区目录存在
-        workspace_dir.mkdir(parents=True, exist_ok=True)
+        agent_config = agent_config or {}
+        blob_refs = self._blob_store is not None and uses_blob_refs(agent_config)
+        limits = _resolve_limits(resource_limits)
 
+        pool = None
+        pooled = None
+        store = None
+        staging_dir = None
+        healthy = False
         try:
-            # 1. 配置Store，为本次执行设置资源限制
-            store = Store(self._engine)
-            store.add_fuel(DEFAULT_WASM_FUEL)
-            store.set_time_limit(5.0) # 设置5秒的墙钟超时
-
-            # 2. 配置Linker和WASI，构建沙箱环境
-            linker = Linker(self._engine)
-            
-            wasi_config = WasiConfig()
-            wasi_config.inherit_stdout() # 允许WASM的日志输出到Worker的stdout
-            wasi_config.inherit_stderr()
-            # 将宿主的安全工作区目录映射为WASM内部的根目录'/'
-            # 这是实现文件系统隔离的关键
-            wasi_config.preopen_dir(str(workspace_dir), "/")
-            store.set_wasi(wasi_config)
-            linker.define_wasi()
-
-            # 3. 获取模块并实例化
+            # 1. 大对象输入放入只读暂存目录，输入中只留下沙箱内的文件路径
+            if blob_refs:
+                staging_dir, input_data = stage_inputs(self._blob_store, input_data)
+
+            # 2. 获取模块，并在沙箱Store中实例化
             module = await self._get_module(module_path)
-            instance = await linker.instantiate_async(store, module)
-
-            # 4. 实现自定义的内存投递协议
-            memory = instance.exports(store).get("memory")
-            if not isinstance(memory, Memory):
-                raise TypeError("WASM module must export a 'memory' object.")
-
-            allocate_func = instance.exports(store).get("allocate_memory")
-            free_func = instance.exports(store).get("free_memory")
-            run_func = instance.exports(store).get("run")
-
-            if not all([allocate_func, free_func, run_func]):
-                raise TypeError("WASM module must export 'allocate_memory', 'free_memory', and 'run' functions for custom data passing.")
-
-            # 4a. 写入输入数据
-            input_bytes = json.dumps(input_data).encode('utf-8')
-            input_size = len(input_bytes)
-            input_ptr = await allocate_func(store, input_size)
-            if not isinstance(input_ptr, int): raise TypeError("allocate_memory must return an integer pointer.")
-            
-            memory.write(store, input_bytes, input_ptr)
-            logger.debug(f"{log_prefix} - Wrote {input_size} input bytes to WASM memory at ptr {input_ptr}.")
-
-            # 4b. 执行核心逻辑
-            logger.info(f"{log_prefix} - Starting WASM execution...")
-            packed_result = await run_func(store, input_ptr, input_size)
-            if not isinstance(packed_result, int): raise TypeError("run function must return a packed integer (u64).")
-            logger.info(f"{log_prefix} - WASM execution finished.")
-
-            # 4c. 读回输出数据
-            output_ptr = packed_result >> 32
-            output_size = packed_result & 0xFFFFFFFF
-            
-            if output_size == 0:
-                 # 正常情况，可能没有输出
-                output_str = "{}"
+            # 带大对象输入的执行需要额外的只读挂载，不能复用已配置好WASI的Store
+            if self._pools is not None and agent_config.get("stateless") and staging_dir is None:
+                pool = self._pools.get(module_path, module)
+                pooled = pool.acquire(lambda new_store: self._configure_store(new_store, limits))
+                store, instance = pooled.store, pooled.instance
+                self._configure_store(store, limits)
             else:
-                output_bytes = memory.read(store, output_ptr, output_ptr + output_size)
-                output_str = output_bytes.decode('utf-8').rstrip('\x00')
-
-            logger.debug(f"{log_prefix} - Read {output_size} output bytes from WASM memory at ptr {output_ptr}.")
-            
-            # 4d. 清理WASM内存
-            await free_func(store, input_ptr, input_size)
-            if output_size > 0:
-                await free_func(store, output_ptr, output_size)
-            
-            # 5. 成功返回
-            return {"status": "SUCCESS", "output": json.loads(output_str)}
+                store = self._new_store(workspace_dir, limits, staging_dir)
+                instance = self._instantiate(module_path, module, store)
+
+            # 3. 按模块声明的内存投递协议交换数据并执行
+            output = self._invoke(store, instance, input_data, log_prefix)
+            if blob_refs:
+                output = collect_outputs(self._blob_store, output, pooled.workspace_dir if pooled else workspace_dir)
+            healthy = True
+            return {"status": "SUCCESS", "output": output, "fuel_consumed": _fuel_consumed(store, limits)}
 
         except Trap as trap:
             # 捕获特定的Wasmtime异常，如燃料耗尽、超时、内存越界等
             error_message = f"WASM execution trapped: {trap}"
             logger.error(f"{log_prefix} - {error_message}")
-            return {"status": "FAILED", "error": error_message}
+            return {"status": "FAILED", "error": error_message, "fuel_consumed": _fuel_consumed(store, limits, trap)}
         except Exception as e:
             # 捕获其它所有异常，如文件未找到、函数未导出等
             logger.error(f"{log_prefix} - An unexpected error occurred: {e}", exc_info=True)
-            return {"status": "FAILED", "error": str(e)}
\ No newline at end of file
+            return {"status": "FAILED", "error": str(e)}
+        finally:
+            if pooled is not None:
+                pool.release(pooled, healthy=healthy)
+            if staging_dir is not None:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+
+    async def supports_batch(self, module_path: str) -> bool:
+        """模块是否导出批量入口 run_batch。模块会被载入缓存，之后的执行直接复用。"""
+        module = await self._get_module(module_path)
+        return BATCH_EXPORT in {export.name for export in module.exports}
+
+    async def execute_batch(
+        self,
+        group_id: str,
+        module_path: str,
+        items: List[Tuple[int, Dict[str, Any]]],
+        workspace_dir: Path,
+        agent_config: Optional[Dict[str, Any]] = None,
+        resource_limits: Optional[Dict[str, Any]] = None,
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        用同一个模块执行一批 (task_instance_id, input_data)，返回 task_instance_id -> 结果。
+        - 模块导出 run_batch 时：只实例化一次，一次调用处理全部输入。燃料预算和超时时间都是单任务的值乘以批大小，
+          fuel_consumed 按批内任务平均分摊。trap、输出数量不匹配等整批失败的情况下，
+          逐个重新执行批内的任务，只有真正出错的任务失败。
+        - 否则逐个调用 execute。Worker只会把导出 run_batch 的模块合并成批（见 supports_batch）。
+        """
+        log_prefix = f"[{group_id}/batch({len(items)})/WASM]"
+        try:
+            module = await self._get_module(module_path)
+        except Exception as e:
+            return {task_instance_id: {"status": "FAILED", "error": str(e)} for task_instance_id, _ in items}
+
+        if BATCH_EXPORT not in {export.name for export in module.exports}:
+            return await self._execute_each(group_id, module_path, items, workspace_dir, agent_config, resource_limits)
+
+        blob_refs = self._blob_store is not None and uses_blob_refs(agent_config)
+        limits = _resolve_limits(resource_limits)
+        limits["fuel"] *= len(items)
+        if limits["timeout_seconds"] > 0:
+            limits["timeout_seconds"] *= len(items)
+        store = None
+        staging_dir = None
+        try:
+            inputs = [input_data for _, input_data in items]
+            if blob_refs:
+                staging_dir, inputs = stage_inputs(self._blob_store, inputs)
+            store = self._new_store(workspace_dir, limits, staging_dir)
+            instance = self._instantiate(module_path, module, store)
+
+            outputs = self._invoke(store, instance, inputs, log_prefix, run_export=BATCH_EXPORT)
+            if not isinstance(outputs, list) or len(outputs) != len(items):
+                raise ValueError(f"run_batch must return a list of {len(items)} outputs.")
+            if blob_refs:
+                outputs = collect_outputs(self._blob_store, outputs, workspace_dir)
+            consumed = _fuel_consumed(store, limits)
+            fuel_per_task = consumed // len(items) if consumed is not None else None
+            return {
+                task_instance_id: {"status": "SUCCESS", "output": output, "fuel_consumed": fuel_per_task}
+                for (task_instance_id, _), output in zip(items, outputs)
+            }
+        except Trap as trap:
+            logger.warning(f"{log_prefix} - WASM batch execution trapped, retrying tasks one by one: {trap}")
+        except Exception as e:
+            logger.warning(f"{log_prefix} - WASM batch execution failed, retrying tasks one by one: {e}", exc_info=True)
+        finally:
+            if staging_dir is not None:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+
+        empty_dir(workspace_dir)
+        return await self._execute_each(group_id, module_path, items, workspace_dir, agent_config, resource_limits)
+
+    async def _execute_each(
+        self,
+        group_id: str,
+        module_path: str,
+        items: List[Tuple[int, Dict[str, Any]]],
+        workspace_dir: Path,
+        agent_config: Optional[Dict[str, Any]],
+        resource_limits: Optional[Dict[str, Any]],
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        逐个调用 execute：声明 stateless 的Agent会在同一个实例上反复调用 run，
+        其它Agent每次从预链接结果实例化新的Store。两次调用之间清空工作区，任务之间互不可见。
+        """
+        results = {}
+        for index, (task_instance_id, input_data) in enumerate(items):
+            if index:
+                empty_dir(workspace_dir)
+            results[task_instance_id] = await self.execute(
+                group_id, task_instance_id, module_path, input_data, workspace_dir, agent_config, resource_limits
+            )
+        return results
+
+    def _invoke(
+        self, store: Store, instance: Instance, input_data: Any, log_prefix: str, run_export: str = "run"
+    ) -> Any:
+        """实现自定义的内存投递协议：写入输入、调用run（或 run_export 指定的入口）、读回输出并释放WASM内存。"""
+        exports = instance.exports(store)
+        memory = exports.get("memory")
+        if not isinstance(memory, Memory):
+            raise TypeError("WASM module must export a 'memory' object.")
+
+        allocate_func = exports.get("allocate_memory")
+        free_func = exports.get("free_memory")
+        run_func = exports.get(run_export)
+
+        if not all([allocate_func, free_func, run_func]):
+            raise TypeError(f"WASM module must export 'allocate_memory', 'free_memory', and '{run_export}' functions for custom data passing.")
+
+        abi_func = exports.get(ABI_MARKER_EXPORT)
+        abi_version = abi_func(store) if abi_func is not None else None
+        if abi_version is None:
+            return self._invoke_json(store, memory, allocate_func, free_func, run_func, input_data, log_prefix)
+        if abi_version == ABI_MSGPACK:
+            return self._invoke_msgpack(store, memory, allocate_func, free_func, run_func, input_data, log_prefix)
+        raise TypeError(f"Unsupported WASM data exchange ABI version: {abi_version}")
+
+    def _invoke_json(self, store, memory, allocate_func, free_func, run_func, input_data, log_prefix) -> Any:
+        """JSON协议：输入输出均为UTF-8 JSON，run 返回 (ptr << 32 | len) 打包的u64。"""
+        # a. 写入输入数据
+        input_bytes = json.dumps(input_data).encode('utf-8')
+        input_size = len(input_bytes)
+        input_ptr = allocate_func(store, input_size)
+        if not isinstance(input_ptr, int): raise TypeError("allocate_memory must return an integer pointer.")
+
+        memory.write(store, input_bytes, input_ptr)
+        logger.debug(f"{log_prefix} - Wrote {input_size} input bytes to WASM memory at ptr {input_ptr}.")
+
+        # b. 执行核心逻辑
+        logger.info(f"{log_prefix} - Starting WASM execution...")
+        packed_result = run_func(store, input_ptr, input_size)
+        if not isinstance(packed_result, int): raise TypeError("run function must return a packed integer (u64).")
+        logger.info(f"{log_prefix} - WASM execution finished.")
+
+        # c. 读回输出数据
+        output_ptr = packed_result >> 32
+        output_size = packed_result & 0xFFFFFFFF
+
+        if output_size == 0:
+             # 正常情况，可能没有输出
+            output_str = "{}"
+        else:
+            output_bytes = memory.read(store, output_ptr, output_ptr + output_size)
+            output_str = output_bytes.decode('utf-8').rstrip('\x00')
+
+        logger.debug(f"{log_prefix} - Read {output_size} output bytes from WASM memory at ptr {output_ptr}.")
+
+        # d. 清理WASM内存
+        free_func(store, input_ptr, input_size)
+        if output_size > 0:
+            free_func(store, output_ptr, output_size)
+
+        return json.loads(output_str)
+
+    def _invoke_msgpack(self, store, memory, allocate_func, free_func, run_func, input_data, log_prefix) -> Any:
+        """
+        二进制协议：输入输出均为MessagePack，bytes 值原样作为二进制类型传递，无需base64或文本编码。
+        run 返回描述符指针，描述符中的长度为u64，因此输出不受打包u64返回值的4 GiB限制。
+        输出直接在线性内存的memoryview上解码，不经过中间的bytes拷贝。
+        """
+        if msgpack is None:
+            raise RuntimeError("This WASM module uses the MessagePack protocol, but the 'msgpack' package is not installed.")
+
+        input_bytes = msgpack.packb(input_data, use_bin_type=True)
+        input_size = len(input_bytes)
+        input_ptr = allocate_func(store, input_size)
+        if not isinstance(input_ptr, int): raise TypeError("allocate_memory must return an integer pointer.")
+        memory.write(store, input_bytes, input_ptr)
+        logger.debug(f"{log_prefix} - Wrote {input_size} msgpack input bytes to WASM memory at ptr {input_ptr}.")
+
+        logger.info(f"{log_prefix} - Starting WASM execution (msgpack ABI)...")
+        descriptor_ptr = run_func(store, input_ptr, input_size)
+        if not isinstance(descriptor_ptr, int): raise TypeError("run function must return a pointer to the output descriptor.")
+        logger.info(f"{log_prefix} - WASM execution finished.")
+
+        # 执行结束后线性内存可能已增长并被移动，必须在run返回之后再取视图，且在下一次调用WASM之前用完
+        view = _linear_memory_view(store, memory)
+        output_ptr, output_size = _OUTPUT_DESCRIPTOR.unpack_from(view, descriptor_ptr)
+        if output_ptr + output_size > len(view):
+            raise ValueError(f"Output descriptor points outside linear memory: ptr={output_ptr}, len={output_size}.")
+        output = msgpack.unpackb(view[output_ptr:output_ptr + output_size], raw=False) if output_size else {}
+        view.release()
+        logger.debug(f"{log_prefix} - Decoded {output_size} msgpack output bytes from WASM memory at ptr {output_ptr}.")
+
+        free_func(store, input_ptr, input_size)
+        if output_size > 0:
+            free_func(store, output_ptr, output_size)
+        return output
+
+
+def _resolve_limits(resource_limits: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """用全局默认值补全任务的资源限制。-1 表示不限制。"""
+    limits = resource_limits or {}
+    return {
+        "fuel": int(limits.get("fuel", settings.WASM_DEFAULT_FUEL)),
+        "max_memory_bytes": int(limits.get("max_memory_bytes", settings.WASM_DEFAULT_MAX_MEMORY_BYTES)),
+        "max_table_elements": int(limits.get("max_table_elements", settings.WASM_DEFAULT_MAX_TABLE_ELEMENTS)),
+        "timeout_seconds": float(limits.get("timeout_seconds", settings.WASM_DEFAULT_TIMEOUT)),
+    }
+
+
+def _fuel_consumed(store: Optional[Store], limits: Dict[str, Any], trap: Optional[Trap] = None) -> Optional[int]:
+    """
+    本次执行实际消耗的燃料；燃料耗尽而trap时等于全部预算。
+    epoch中断（墙钟超时）时wasmtime不会把生成代码中累计的燃料写回Store，读到的剩余燃料接近初始预算，
+    此时无法得知真实消耗，返回None而不是一个接近0的错误值。
+    """
+    if store is None:
+        return None
+    if trap is not None and trap.trap_code == TrapCode.INTERRUPT:
+        return None
+    try:
+        return limits["fuel"] - store.get_fuel()
+    except Exception:
+        return None
+
+
+def _linear_memory_view(store: Store, memory: Memory) -> memoryview:
+    """不拷贝地把WASM线性内存包装为只读memoryview。视图在下一次调用WASM（可能触发memory.grow）后失效。"""
+    size = memory.data_len(store)
+    buffer = (ctypes.c_ubyte * size).from_address(ctypes.addressof(memory.data_ptr(store).contents))
+    return memoryview(buffer).cast("B").toreadonly()
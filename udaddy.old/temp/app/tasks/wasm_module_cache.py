@@ -0,0 +1,125 @@
+# app/tasks/wasm_module_cache.py
+
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from wasmtime import Module
+
+logger = logging.getLogger(__name__)
+
+
+class _PathStamp(NamedTuple):
+    mtime_ns: int
+    size: int
+    content_hash: str
+
+
+class ModuleCache:
+    """
+    进程内的已编译模块缓存，以模块内容的SHA-256为键。
+    - 每次查找先 stat 模块文件，mtime和大小都未变化时直接复用上次的哈希，只有文件变化后才重新读取并计算哈希，
+      因此重新部署到同一路径的Agent会立即使用新代码。
+    - 按条目数和字节数（以WASM字节码大小近似）双重限制容量，超出时淘汰最久未使用的模块。
+    - 同一模块的并发首次请求只会触发一次编译，其余请求等待同一个结果。
+      使用线程安全的 concurrent.futures.Future，可在多个线程/事件循环之间共享。
+    - on_evict 在模块被淘汰后（锁外）以该模块为参数调用，用于释放依附于模块的资源（如实例池）。
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, on_evict: Optional[Callable[[Module], None]] = None):
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._on_evict = on_evict
+        self._modules: "OrderedDict[str, Tuple[Module, int]]" = OrderedDict()
+        self._stamps: Dict[str, _PathStamp] = {}
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _content_hash(self, module_path: str) -> Tuple[str, int]:
+        stat = os.stat(module_path)
+        stamp = self._stamps.get(module_path)
+        if stamp is not None and stamp.mtime_ns == stat.st_mtime_ns and stamp.size == stat.st_size:
+            return stamp.content_hash, stat.st_size
+
+        with open(module_path, "rb") as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+        if stamp is not None and stamp.content_hash != content_hash:
+            logger.info(f"WASM module {module_path} changed on disk, switching to the new version.")
+        self._stamps[module_path] = _PathStamp(stat.st_mtime_ns, stat.st_size, content_hash)
+        return content_hash, stat.st_size
+
+    async def get(self, module_path: str, loader: Callable[[str, str], Awaitable[Module]]) -> Module:
+        """
+        获取模块；未命中时调用 loader(module_path, content_hash) 加载或编译。
+        loader失败时异常会传给所有等待者，且不会被缓存，下次请求会重试。
+        """
+        content_hash, size = self._content_hash(module_path)
+
+        with self._lock:
+            cached = self._modules.get(content_hash)
+            if cached is not None:
+                self._modules.move_to_end(content_hash)
+                self.hits += 1
+                return cached[0]
+            future = self._inflight.get(content_hash)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = concurrent.futures.Future()
+                self._inflight[content_hash] = future
+
+        if not owner:
+            return await asyncio.wrap_future(future)
+
+        try:
+            module = await loader(module_path, content_hash)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[content_hash]
+            future.set_exception(e)
+            # 没有其它等待者时避免 “Future exception was never retrieved” 警告
+            future.exception()
+            raise
+
+        with self._lock:
+            del self._inflight[content_hash]
+            self._modules[content_hash] = (module, size)
+            self._total_bytes += size
+            evicted = self._evict_locked()
+        future.set_result(module)
+        if self._on_evict is not None:
+            for evicted_module in evicted:
+                self._on_evict(evicted_module)
+        return module
+
+    def _evict_locked(self) -> List[Module]:
+        evicted = []
+        # 至少保留刚放入的一个模块，即使它本身就超过了字节上限
+        while len(self._modules) > 1 and (
+            len(self._modules) > self._max_entries or self._total_bytes > self._max_bytes
+        ):
+            content_hash, (module, size) = self._modules.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            evicted.append(module)
+            logger.info(f"Evicted WASM module {content_hash[:12]} from memory cache ({size} bytes).")
+        return evicted
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._modules),
+                "bytes": self._total_bytes,
+            }
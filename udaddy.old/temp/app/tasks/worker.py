@@ -1,25 +1,44 @@
-import shutil
-from pathlib import Path
 from app.tasks.wasm_manager import WasmManager
+from app.tasks.wasm_executor import WasmExecutor
+from app.tasks.workspace import create_workspace_manager
+from app.core.config import settings
 
+# WASM任务的工作区目录池，实例池中的可复用实例也从这里租借工作区
+workspace_manager = create_workspace_manager()
 # 在Worker进程启动时创建WasmManager单例
 # 这允许跨任务复用编译好的模块缓存和Wasmtime引擎
-wasm_manager = WasmManager()
+wasm_manager = WasmManager(workspace_manager)
+# CPU密集的WASM任务交给执行器，避免阻塞任务组的事件循环（见 WASM_EXECUTOR 配置）
+wasm_executor = WasmExecutor(wasm_manager, settings.WASM_EXECUTOR, settings.WASM_EXECUTOR_WORKERS)
 # app/tasks/worker.py
 
 import asyncio
+import json
 import logging
-from datetime import datetime
-from typing import Dict, Any, List
+import math
+from collections import defaultdict
+from typing import Dict, Any, List, Coroutine, Optional
 
 from sqlalchemy.orm import Session
 from celery.exceptions import SoftTimeLimitExceeded
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
 
 from app.tasks.celery_app import celery_app
+from app.tasks.event_loop import BackgroundEventLoop
 from app.db.session import SessionLocal
 from app import crud, models
 from app.core.config import settings
 from app.managers.workflow_manager import submit_to_scheduler
+from app.tasks.prewarm import build_artifacts, clear_ready, prewarm_and_mark_ready, select_prewarm_modules
+from app.tasks.execution_plan import bind_inputs
+from app.storage.blob_store import (
+    LazyInputs,
+    blob_store,
+    contains_blob_refs,
+    externalize_output,
+    resolve_blob_refs,
+    uses_blob_refs,
+)
 
 # --- WASM运行时和异步库的准备 ---
 # 在实际部署时，请确保这些库已安装: pip install wasmtime aiohttp aiofiles
@@ -30,32 +49,73 @@ from app.managers.workflow_manager import submit_to_scheduler
 logging.basicConfig(level=settings.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+# 每个Worker进程一个长生命周期的事件循环，在子进程初始化时启动。
+# 所有任务组都提交到这个循环上运行，异步资源得以在任务组之间保持预热。
+worker_loop = BackgroundEventLoop(name="netbase-worker-loop")
+
+
+# 主进程在 worker_init 中选出的预热模块，fork出的子进程继承该列表，不必各自再查询数据库
+_prewarm_module_paths: Optional[List[str]] = None
+
+
+@worker_init.connect
+def _build_wasm_artifacts(**kwargs):
+    # 主进程只在一次性的spawn子进程中把预热模块编译进磁盘缓存，自身不调用wasmtime：
+    # 跨fork继承wasmtime的线程池可能导致子进程挂起（执行器的进程模式使用spawn也是同样的原因）
+    global _prewarm_module_paths
+    if not settings.WASM_PREWARM_ENABLED:
+        return
+    try:
+        _prewarm_module_paths = select_prewarm_modules()
+        build_artifacts(_prewarm_module_paths)
+    except Exception as e:
+        logger.error(f"WASM预编译产物构建失败，子进程将自行编译: {e}", exc_info=True)
+
+
+@worker_process_init.connect
+def _start_worker_loop(**kwargs):
+    if settings.WORKER_PERSISTENT_LOOP:
+        worker_loop.start()
+    workspace_manager.start()
+    # 每个子进程从磁盘缓存把模块载入自己的模块缓存（进程模式下载入执行器的子进程），然后写入自己的就绪文件
+    prewarm_and_mark_ready(wasm_manager, wasm_executor, _prewarm_module_paths)
+
+
+@worker_process_shutdown.connect
+def _stop_worker_loop(**kwargs):
+    clear_ready()
+    worker_loop.stop()
+    wasm_executor.shutdown()
+    workspace_manager.stop()
+    logger.info(f"WASM模块缓存统计: {wasm_manager.cache_stats()}")
+
 
 # --- 异步Agent执行逻辑 ---
 # 每个函数代表一种Agent类型的具体实现，它们是并发执行的核心。
 
-async def run_wasm_calculation(group_id: str, task_instance_id: int, source_reference: str, params: dict) -> dict:
+async def run_wasm_calculation(
+    group_id: str, task_instance_id: int, source_reference: str, params: dict, agent_config: dict, resource_limits: dict
+) -> dict:
     """
     通过WasmManager安全地执行一个WASM模块。
     """
     log_prefix = f"[{group_id}/{task_instance_id}/WASM]"
     logger.info(f"{log_prefix} - 开始执行。模块路径: '{source_reference}', 参数: {params}")
 
-    # 为此任务创建一个唯一的、临时的安全工作区
-    workspace_dir = Path(settings.SHARED_FS_ROOT) / "wasm_workspaces" / group_id / str(task_instance_id)
-    
     try:
-        # 确保工作区存在
-        workspace_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 调用WasmManager的生产级执行器
-        result = await wasm_manager.execute(
-            group_id=group_id,
-            task_instance_id=task_instance_id,
-            module_path=source_reference,
-            input_data=params.get("input_params", {}),
-            workspace_dir=workspace_dir,
-        )
+        # 租借一个已存在的空工作区：默认来自本地tmpfs目录池，Agent声明 shared_fs 时才使用共享文件系统。
+        # 归还后的清理在后台进行，不占用任务的执行时间
+        with workspace_manager.lease(group_id, task_instance_id, shared=bool(agent_config.get("shared_fs"))) as workspace_dir:
+            # 调用WasmManager的生产级执行器（按配置在事件循环、线程池或进程池中运行）
+            result = await wasm_executor.execute(
+                group_id=group_id,
+                task_instance_id=task_instance_id,
+                module_path=source_reference,
+                input_data=params.get("input_params", {}),
+                workspace_dir=workspace_dir,
+                agent_config=agent_config,
+                resource_limits=resource_limits,
+            )
         logger.info(f"{log_prefix} - WasmManager执行完毕，状态: {result['status']}.")
         return result
 
@@ -67,14 +127,41 @@ async def run_wasm_calculation(group_id: str, task_instance_id: int, source_refe
         error_msg = f"执行WASM时发生未预料的错误: {e}"
         logger.critical(f"{log_prefix} - {error_msg}", exc_info=True)
         return {"status": "FAILED", "error": error_msg}
-    finally:
-        # 无论成功与否，都彻底清理工作区
-        if workspace_dir.exists():
-            try:
-                shutil.rmtree(workspace_dir)
-                logger.info(f"{log_prefix} - 临时工作区 '{workspace_dir}' 已被清理。")
-            except OSError as e:
-                logger.error(f"{log_prefix} - 清理工作区 '{workspace_dir}' 失败: {e}")
+
+
+async def run_wasm_batch(group_id: str, task_defs: List[Dict]) -> Dict[int, dict]:
+    """
+    用一次批量调用执行同一模块、同一配置的多个WASM任务，返回 task_instance_id -> 结果。
+    整批共用一个工作区和一次执行器调度，WasmManager负责把结果映射回各自的任务。
+    """
+    first = task_defs[0]
+    source_reference = first.get("source_reference")
+    agent_config = first.get("agent_config") or {}
+    items = [(t["task_instance_id"], t.get("params", {}).get("input_params", {})) for t in task_defs]
+    log_prefix = f"[{group_id}/batch({len(items)})/WASM]"
+    logger.info(f"{log_prefix} - 开始批量执行。模块路径: '{source_reference}'")
+
+    try:
+        with workspace_manager.lease(group_id, items[0][0], shared=bool(agent_config.get("shared_fs"))) as workspace_dir:
+            results = await wasm_executor.execute_batch(
+                group_id=group_id,
+                module_path=source_reference,
+                items=items,
+                workspace_dir=workspace_dir,
+                agent_config=agent_config,
+                resource_limits=first.get("resource_limits") or {},
+            )
+        succeeded = sum(1 for result in results.values() if result["status"] == "SUCCESS")
+        logger.info(f"{log_prefix} - 批量执行完毕，成功 {succeeded}/{len(items)}。")
+        return results
+
+    except FileNotFoundError:
+        error_msg = f"WASM模块文件未找到: {source_reference}"
+        logger.error(f"{log_prefix} - {error_msg}")
+    except Exception as e:
+        error_msg = f"批量执行WASM时发生未预料的错误: {e}"
+        logger.critical(f"{log_prefix} - {error_msg}", exc_info=True)
+    return {task_id: {"status": "FAILED", "error": error_msg} for task_id, _ in items}
 
 
 async def run_docker_container(group_id: str, task_instance_id: int, params: dict) -> dict:
@@ -131,10 +218,220 @@ async def run_python_function(group_id: str, task_instance_id: int, params: dict
 
 # --- 异步任务组执行器 ---
 
+def _build_task_coro(group_id: str, task_def: Dict):
+    """根据任务的Agent类型选择对应的异步执行函数。"""
+    task_id = task_def["task_instance_id"]
+    task_type = task_def.get("type")
+    params = task_def.get("params", {})
+
+    if task_type == models.AgentType.WASM.value:
+        return run_wasm_calculation(
+            group_id,
+            task_id,
+            task_def.get("source_reference"),
+            params,
+            task_def.get("agent_config") or {},
+            task_def.get("resource_limits") or {},
+        )
+    # 其它类型的Agent在进程内读取输入，大对象引用在第一次被读取时才从存储中取回
+    params = {**params, "input_params": LazyInputs(blob_store, params.get("input_params") or {})}
+    if task_type == models.AgentType.DOCKER.value:
+        return run_docker_container(group_id, task_id, params)
+    if task_type == models.AgentType.PYTHON_FUNCTION.value:
+        return run_python_function(group_id, task_id, params)
+
+    logger.warning(f"[{group_id}/{task_id}] - 未知的Agent类型: {task_type}。将任务标记为失败。")
+    return asyncio.sleep(0, result={"status": "FAILED", "error": f"Unsupported agent type: {task_type}"})
+
+
+async def _run_single(group_id: str, task_def: Dict) -> Dict[int, dict]:
+    return {task_def["task_instance_id"]: await _build_task_coro(group_id, task_def)}
+
+
+def _batch_key(task_def: Dict) -> Optional[tuple]:
+    """可以合并批量执行的WASM任务的分组键：同一模块、同一Agent配置、同一资源限制。"""
+    if not settings.WASM_BATCH_ENABLED or task_def.get("type") != models.AgentType.WASM.value:
+        return None
+    agent_config = task_def.get("agent_config") or {}
+    if agent_config.get("batch") is False:
+        return None
+    return (
+        task_def.get("source_reference"),
+        json.dumps(agent_config, sort_keys=True),
+        json.dumps(task_def.get("resource_limits") or {}, sort_keys=True),
+    )
+
+
+def _split_batch(task_defs: List[Dict]) -> List[List[Dict]]:
+    """
+    把同一分组的任务切成若干批：批数至少等于WASM执行器的并行度，
+    保证批量执行不会让本可以占满多个CPU核的任务挤在一个线程/进程里串行执行；单批不超过 WASM_BATCH_MAX_SIZE。
+    """
+    count = max(min(len(task_defs), wasm_executor.parallelism), math.ceil(len(task_defs) / settings.WASM_BATCH_MAX_SIZE))
+    size = math.ceil(len(task_defs) / count)
+    return [task_defs[i:i + size] for i in range(0, len(task_defs), size)]
+
+
+def _externalize_results(results: Dict[int, dict]) -> Dict[int, dict]:
+    for task_id, result in results.items():
+        if result.get("status") != "SUCCESS" or result.get("output") is None:
+            continue
+        try:
+            result["output"] = externalize_output(blob_store, result["output"], settings.BLOB_INLINE_THRESHOLD_BYTES)
+        except Exception as e:
+            # 存储不可用时退回到内联保存，不让已经成功的计算因此失败
+            logger.warning(f"任务 {task_id} 的输出无法写入大对象存储，将内联保存: {e}")
+    return results
+
+
+async def _with_externalized_outputs(unit: Coroutine[Any, Any, Dict[int, dict]]) -> Dict[int, dict]:
+    """
+    超过 BLOB_INLINE_THRESHOLD_BYTES 的输出值在写回之前按内容哈希存入大对象存储（相同内容只保存一份），
+    task_instances.outputs 中只保存 $blob 引用。写入在线程中进行，不阻塞事件循环。
+    """
+    results = await unit
+    return await asyncio.to_thread(_externalize_results, results)
+
+
+def _externalizes_outputs(task_def: Dict) -> bool:
+    """只有声明了 blob_refs 的Agent的输出才写入大对象存储，其它Agent的下游始终收到内联的值。"""
+    return blob_store is not None and uses_blob_refs(task_def.get("agent_config"))
+
+
+async def _supports_batch(module_path: str) -> bool:
+    try:
+        return await wasm_executor.supports_batch(module_path)
+    except Exception as e:
+        # 模块无法加载时按单任务执行，每个任务各自报告错误
+        logger.warning(f"无法检查WASM模块 {module_path} 是否支持批量执行: {e}")
+        return False
+
+
+async def _build_work_units(group_id: str, tasks_to_run: List[Dict]) -> List[Coroutine[Any, Any, Dict[int, dict]]]:
+    """
+    把任务组拆成可并发执行的工作单元，每个单元返回 task_instance_id -> 结果。
+    导出 run_batch 的模块的WASM任务自动合并为批量执行（Agent配置 batch: false 可关闭），其它任务各自成为一个单元。
+    不支持 run_batch 的模块不合并：逐个串行执行的批次要等全部结束才能上报，会拖慢流式写回。
+    """
+    # (工作单元, 单元内任意一个任务)：同一批次的任务Agent配置相同，取第一个即可判断是否外置输出
+    units = []
+    batches: Dict[tuple, List[Dict]] = defaultdict(list)
+    for task_def in tasks_to_run:
+        key = _batch_key(task_def)
+        if key is None:
+            units.append((_run_single(group_id, task_def), task_def))
+        else:
+            batches[key].append(task_def)
+
+    for task_defs in batches.values():
+        if len(task_defs) > 1 and await _supports_batch(task_defs[0].get("source_reference")):
+            chunks = _split_batch(task_defs)
+        else:
+            chunks = [[task_def] for task_def in task_defs]
+        for chunk in chunks:
+            unit = _run_single(group_id, chunk[0]) if len(chunk) == 1 else run_wasm_batch(group_id, chunk)
+            units.append((unit, chunk[0]))
+    return [
+        _with_externalized_outputs(unit) if _externalizes_outputs(task_def) else unit for unit, task_def in units
+    ]
+
+
+def _submit_outcomes(outcomes: Dict[int, str]):
+    """把一批任务的结束状态 (task_instance_id -> "SUCCESS"/"FAILED") 作为一条批量事件提交给调度器。"""
+    if not outcomes:
+        return
+    submit_to_scheduler({
+        "event_type": "TASKS_COMPLETED",
+        "results": [
+            {"task_instance_id": task_id, "status": status}
+            for task_id, status in outcomes.items()
+        ],
+    })
+
+
+def _flush_results(db: Session, results: Dict[int, Dict]):
+    """通过一次批量UPDATE写回一批结果（无需逐个读取任务行），然后用一条批量事件通知调度器。"""
+    if not results:
+        return
+    crud.task_instance.bulk_write_results(db, results=results)
+    _submit_outcomes({task_id: result["status"] for task_id, result in results.items()})
+
+
+async def _run_and_report(unit, result_queue: asyncio.Queue):
+    """执行一个工作单元（单个任务或一批任务），并在完成的瞬间把结果放入结果队列。"""
+    for task_id, result in (await unit).items():
+        result_queue.put_nowait((task_id, result))
+
+
+async def _stream_results(db: Session, group_id: str, result_queue: asyncio.Queue, expected: int):
+    """
+    流式结果写回：任务一完成就进入微批次，批次达到 WORKER_RESULT_FLUSH_SIZE 个结果
+    或自第一个结果起经过 WORKER_RESULT_FLUSH_INTERVAL 秒即写回并通知调度器。
+    这样关键路径上的下游任务不必等待组内最慢的任务。
+    """
+    loop = asyncio.get_running_loop()
+    received = 0
+    while received < expected:
+        task_id, result = await result_queue.get()
+        batch = {task_id: result}
+        received += 1
+
+        deadline = loop.time() + settings.WORKER_RESULT_FLUSH_INTERVAL
+        while received < expected and len(batch) < settings.WORKER_RESULT_FLUSH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                task_id, result = await asyncio.wait_for(result_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch[task_id] = result
+            received += 1
+
+        await asyncio.to_thread(_flush_results, db, batch)
+        logger.info(f"[Group: {group_id}] 已写回 {len(batch)} 个任务结果 ({received}/{expected})。")
+
+
+def _bind_upstream_outputs(db: Session, group_id: str, tasks_to_run: List[Dict]):
+    """
+    把数据边引用的上游输出合并进各任务的 input_params。
+    整个任务组只执行一次查询，且只读取 outputs 列；被多个任务引用的上游输出只读取一次、在组内共享同一个对象。
+    超过阈值的输出值在数据库中本就是 $blob 引用：声明了 blob_refs 的WASM Agent和进程内的Agent原样接收，
+    直到真正读取时才取回；其它WASM Agent在这里取回内容，收到内联的值。
+    """
+    upstream_ids = {
+        ref["task_instance_id"] for task_def in tasks_to_run for ref in task_def.get("params", {}).get("input_refs") or []
+    }
+    if not upstream_ids:
+        return
+    outputs = crud.task_instance.get_outputs(db, ids=list(upstream_ids))
+
+    for task_def in tasks_to_run:
+        params = task_def.get("params", {})
+        input_refs = params.get("input_refs")
+        if not input_refs:
+            continue
+        params["input_params"], missing = bind_inputs(params.get("input_params"), input_refs, outputs)
+        for ref in missing:
+            logger.warning(
+                f"[{group_id}/{task_def['task_instance_id']}] - 上游任务 {ref['task_instance_id']} "
+                f"的输出中没有 '{ref['output_key']}'，输入 '{ref['input_key']}' 将为空。"
+            )
+        if (
+            task_def.get("type") == models.AgentType.WASM.value
+            and not uses_blob_refs(task_def.get("agent_config"))
+            and contains_blob_refs(params["input_params"])
+        ):
+            params["input_params"] = resolve_blob_refs(blob_store, params["input_params"])
+
+
 async def run_async_task_group(group_id: str, tasks_to_run: List[Dict]):
     """
     使用 TaskGroup 并发执行任务组内的所有子任务。
     这是异步Worker的核心调度逻辑。
+    默认以流式模式运行：每个任务完成后按微批次写回结果并立即通知调度器；
+    关闭 WORKER_STREAM_RESULTS 时等待整个任务组结束后再统一写回。
+    数据库读写和向调度器发送事件都是阻塞调用，放到线程中执行，不阻塞同一事件循环上的其它任务组。
     """
     db: Session = SessionLocal()
     try:
@@ -142,56 +439,52 @@ async def run_async_task_group(group_id: str, tasks_to_run: List[Dict]):
         
         # 1. 批量更新任务状态为 RUNNING
         task_instance_ids = [t["task_instance_id"] for t in tasks_to_run]
-        crud.task_instance.bulk_update_status(db, task_instance_ids=task_instance_ids, status=models.TaskStatus.RUNNING)
-
-        # 2. 创建并并发执行所有协程任务
-        async with asyncio.TaskGroup() as tg:
-            async_tasks = {}
-            for task_def in tasks_to_run:
-                task_id = task_def["task_instance_id"]
-                task_type = task_def.get("type")
-                params = task_def.get("params", {})
-                
-                coro = None
-                if task_type == models.AgentType.WASM.value:
-                    coro = run_wasm_calculation(group_id, task_id, task_def.get("source_reference"), params)
-                elif task_type == models.AgentType.DOCKER.value:
-                    coro = run_docker_container(group_id, task_id, params)
-                elif task_type == models.AgentType.PYTHON_FUNCTION.value:
-                    coro = run_python_function(group_id, task_id, params)
-                else:
-                    logger.warning(f"[{group_id}/{task_id}] - 未知的Agent类型: {task_type}。将任务标记为失败。")
-                    coro = asyncio.sleep(0, result={"status": "FAILED", "error": f"Unsupported agent type: {task_type}"})
-
-                async_tasks[task_id] = tg.create_task(coro)
-
-        # 3. 收集结果并批量更新数据库
-        for task_id, task in async_tasks.items():
-            result = task.result()
-            task_instance = crud.task_instance.get(db, id=task_id)
-            if task_instance:
-                task_instance.status = models.TaskStatus.COMPLETED if result["status"] == "SUCCESS" else models.TaskStatus.FAILED
-                task_instance.outputs = result.get("output")
-                task_instance.logs = result.get("error")
-                task_instance.completed_at = datetime.utcnow()
-                db.add(task_instance)
-        db.commit()
-
-        # 4. 为每个完成或失败的任务提交调度事件
-        for task_id, task in async_tasks.items():
-            result = task.result()
-            event_type = "TASK_COMPLETED" if result["status"] == "SUCCESS" else "TASK_FAILED"
-            submit_to_scheduler({"event_type": event_type, "task_instance_id": task_id})
+        await asyncio.to_thread(
+            crud.task_instance.bulk_update_status, db, task_instance_ids=task_instance_ids, status=models.TaskStatus.RUNNING
+        )
+        # 一次批量查询取回组内所有数据边引用的上游输出
+        await asyncio.to_thread(_bind_upstream_outputs, db, group_id, tasks_to_run)
+
+        if settings.WORKER_STREAM_RESULTS:
+            # 2. 并发执行所有协程任务，同时由一个消费者按微批次写回已完成的结果
+            result_queue: asyncio.Queue = asyncio.Queue()
+            async with asyncio.TaskGroup() as tg:
+                for unit in await _build_work_units(group_id, tasks_to_run):
+                    tg.create_task(_run_and_report(unit, result_queue))
+                tg.create_task(_stream_results(db, group_id, result_queue, len(tasks_to_run)))
+        else:
+            # 2. 创建并并发执行所有协程任务
+            async with asyncio.TaskGroup() as tg:
+                async_tasks = [tg.create_task(unit) for unit in await _build_work_units(group_id, tasks_to_run)]
+
+            # 3. 收集结果，批量写回并提交调度事件
+            results = {}
+            for task in async_tasks:
+                results.update(task.result())
+            await asyncio.to_thread(_flush_results, db, results)
 
         logger.info(f"--- [Group: {group_id}] 任务组执行完毕 ---")
 
     except Exception as e:
         logger.critical(f"--- [Group: {group_id}] 任务组执行期间发生严重错误: {e} ---", exc_info=True)
         # 发生未知严重错误，将组内所有未完成的任务标记为失败
-        task_instance_ids = [t["task_instance_id"] for t in tasks_to_run]
-        crud.task_instance.bulk_fail_tasks(db, task_instance_ids=task_instance_ids, error_message=str(e))
-        for task_id in task_instance_ids:
-             submit_to_scheduler({"event_type": "TASK_FAILED", "task_instance_id": task_id})
+        await asyncio.to_thread(_fail_tasks, db, [t["task_instance_id"] for t in tasks_to_run], str(e))
+    finally:
+        db.close()
+
+
+def _fail_tasks(db: Session, task_instance_ids: List[int], error_message: str):
+    """将一批任务中尚未结束的任务标记为失败，并通知调度器。"""
+    failed_ids = crud.task_instance.bulk_fail_tasks(db, task_instance_ids=task_instance_ids, error_message=error_message)
+    _submit_outcomes({task_id: "FAILED" for task_id in failed_ids})
+
+
+def fail_task_group(payload: dict, error_message: str):
+    """将载荷中所有尚未结束的任务标记为失败，并通知调度器。用于任务组超时等无法正常收尾的情况。"""
+    db: Session = SessionLocal()
+    try:
+        task_ids = [t.get("task_instance_id") for t in payload.get("tasks", []) if t.get("task_instance_id")]
+        _fail_tasks(db, task_ids, error_message)
     finally:
         db.close()
 
@@ -210,7 +503,8 @@ async def run_async_task_group(group_id: str, tasks_to_run: List[Dict]):
 def execute_group(self, payload: dict):
     """
     这是调度器实际调用的Celery任务。
-    它接收一个包含 group_id 和 tasks 列表的载荷，并启动asyncio事件循环。
+    它接收一个包含 group_id 和 tasks 列表的载荷，并将任务组提交给本进程常驻的事件循环；
+    常驻循环未启用时退回到为每个任务组调用一次 asyncio.run。
     """
     try:
         group_id = payload.get("group_id", "unknown_group")
@@ -220,19 +514,15 @@ def execute_group(self, payload: dict):
             logger.warning(f"接收到空的任务组: {group_id}")
             return
 
-        asyncio.run(run_async_task_group(group_id, tasks))
+        if worker_loop.running:
+            worker_loop.run(run_async_task_group(group_id, tasks))
+        else:
+            asyncio.run(run_async_task_group(group_id, tasks))
 
     except SoftTimeLimitExceeded:
         logger.error(f"任务组 {payload.get('group_id')} 因超时而失败。")
         # 超时也需要将任务标记为失败
-        db: Session = SessionLocal()
-        try:
-            task_ids = [t.get("task_instance_id") for t in payload.get("tasks", []) if t.get("task_instance_id")]
-            crud.task_instance.bulk_fail_tasks(db, task_instance_ids=task_ids, error_message="Task group timed out.")
-            for task_id in task_ids:
-                submit_to_scheduler({"event_type": "TASK_FAILED", "task_instance_id": task_id})
-        finally:
-            db.close()
+        fail_task_group(payload, error_message="Task group timed out.")
     except Exception as e:
         logger.critical(f"执行任务组 {payload.get('group_id')} 时发生顶层异常: {e}", exc_info=True)
         # 确保重试机制能被触发
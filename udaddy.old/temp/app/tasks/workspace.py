@@ -0,0 +1,229 @@
+# app/tasks/workspace.py
+
+import logging
+import os
+import queue
+import shutil
+import threading
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Deque, Iterator, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class WorkspaceManager:
+    """
+    WASM任务工作区的租借与回收。
+    - 默认从本地（tmpfs）目录池中租借一个预先创建好的空目录，用完后归还：
+      目录为空时直接放回池中，否则交给后台线程清空后再放回，任务本身不承担清理开销。
+    - 只有声明了 shared_fs 的Agent才会在共享文件系统上创建工作区，用完后同样在后台删除。
+    - 清理失败的目录会被移入隔离区（quarantine）而不是被遗忘，每次启动时会重试删除隔离区。
+    每个进程使用自己的 pool-<pid> 子目录，prefork的多个子进程互不干扰；已退出进程留下的目录池在启动时被回收。
+    """
+
+    def __init__(self, local_root: Path, shared_root: Optional[Path], pool_size: int):
+        self._local_root = local_root
+        self._shared_root = shared_root
+        self._pool_size = pool_size
+        self._free: Deque[Path] = deque()
+        self._lock = threading.Lock()
+        self._cleanup_queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._cleaner: Optional[threading.Thread] = None
+        self._pool_dir: Optional[Path] = None
+        self._started_pid: Optional[int] = None
+
+    # --- 生命周期 ---
+
+    def start(self) -> None:
+        """创建本进程的目录池并启动后台清理线程。重复调用是安全的；fork出的子进程会重新初始化。"""
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            # 从父进程继承来的状态（目录池、清理线程）在子进程中不可用
+            self._free.clear()
+            self._cleanup_queue = queue.Queue()
+            self._started_pid = os.getpid()
+            self._pool_dir = self._local_root / f"pool-{self._started_pid}"
+            self._cleaner = threading.Thread(target=self._cleanup_loop, name="netbase-workspace-cleaner", daemon=True)
+            self._cleaner.start()
+
+        self._purge_quarantine(self._local_root / "quarantine")
+        if self._shared_root is not None:
+            self._purge_quarantine(self._shared_root / "wasm_workspaces" / ".quarantine")
+
+        self._local_root.mkdir(parents=True, exist_ok=True)
+        for entry in os.scandir(self._local_root):
+            if entry.name.startswith("pool-") and entry.path != str(self._pool_dir) and not pid_alive(entry.name[5:]):
+                self._cleanup_queue.put(("remove", Path(entry.path)))
+
+        self._pool_dir.mkdir(exist_ok=True)
+        # PID被复用时目录池中可能残留上一个进程的内容，统一交给后台重置后再使用
+        for entry in os.scandir(self._pool_dir):
+            if entry.is_dir(follow_symlinks=False):
+                self._cleanup_queue.put(("reset", Path(entry.path)))
+        with self._lock:
+            missing = self._pool_size - len(self._free)
+        for _ in range(max(0, missing)):
+            self._free.append(self._new_local_dir())
+        logger.info(f"Workspace pool ready under {self._pool_dir} ({self._pool_size} directories).")
+
+    def stop(self) -> None:
+        with self._lock:
+            cleaner, self._cleaner = self._cleaner, None
+            self._started_pid = None
+        if cleaner is not None and cleaner.is_alive():
+            self._cleanup_queue.put(None)
+            cleaner.join()
+
+    # --- 租借 ---
+
+    @contextmanager
+    def lease(self, group_id: str, task_instance_id: int, shared: bool = False) -> Iterator[Path]:
+        """租借一个已存在的空工作区目录；退出上下文时目录被归还，调用方无需再创建或删除它。"""
+        if self._started_pid != os.getpid():
+            self.start()
+        if shared:
+            if self._shared_root is None:
+                raise RuntimeError("Agent requires a shared-filesystem workspace, but SHARED_FS_ROOT is not configured.")
+            path = self._shared_root / "wasm_workspaces" / group_id / str(task_instance_id)
+            path.mkdir(parents=True, exist_ok=True)
+            try:
+                yield path
+            finally:
+                self._cleanup_queue.put(("remove", path))
+            return
+
+        path = self._acquire_local()
+        try:
+            yield path
+        finally:
+            self._release_local(path)
+
+    def acquire(self) -> Path:
+        """
+        租借一个本地工作区目录，供需要跨多次执行持有同一目录的调用方（如实例池中的可复用实例）使用。
+        用完后必须调用 release 归还。
+        """
+        if self._started_pid != os.getpid():
+            self.start()
+        return self._acquire_local()
+
+    def release(self, path: Path) -> None:
+        """归还 acquire 租借的目录，非空目录由后台线程清空后再放回池中。"""
+        self._release_local(path)
+
+    def _new_local_dir(self) -> Path:
+        path = self._pool_dir / uuid.uuid4().hex
+        path.mkdir()
+        return path
+
+    def _acquire_local(self) -> Path:
+        with self._lock:
+            if self._free:
+                return self._free.popleft()
+        # 池暂时耗尽（并发超过池大小或仍在后台重置），临时新建一个目录
+        return self._new_local_dir()
+
+    def _release_local(self, path: Path) -> None:
+        try:
+            with os.scandir(path) as entries:
+                is_empty = next(entries, None) is None
+        except FileNotFoundError:
+            return
+        if is_empty:
+            self._return_to_pool(path)
+        else:
+            self._cleanup_queue.put(("reset", path))
+
+    def _return_to_pool(self, path: Path) -> None:
+        with self._lock:
+            if len(self._free) < self._pool_size:
+                self._free.append(path)
+                return
+        self._cleanup_queue.put(("remove", path))
+
+    # --- 后台清理 ---
+
+    def _cleanup_loop(self) -> None:
+        while True:
+            job = self._cleanup_queue.get()
+            if job is None:
+                return
+            action, path = job
+            try:
+                if action == "reset":
+                    empty_dir(path)
+                    self._return_to_pool(path)
+                else:
+                    shutil.rmtree(path)
+                    _remove_empty_parent(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self._quarantine(path, e)
+
+    def _quarantine_root(self, path: Path) -> Path:
+        if self._shared_root is not None and path.is_relative_to(self._shared_root):
+            return self._shared_root / "wasm_workspaces" / ".quarantine"
+        return self._local_root / "quarantine"
+
+    def _quarantine(self, path: Path, error: OSError) -> None:
+        """清理失败的目录不再被复用，移入隔离区等待下次启动时重试删除。"""
+        target = self._quarantine_root(path) / uuid.uuid4().hex
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.rename(path, target)
+            logger.error(f"Failed to clean workspace {path} ({error}), moved to quarantine {target}.")
+        except OSError as e:
+            logger.critical(f"Failed to clean workspace {path} ({error}) and could not quarantine it: {e}")
+
+    def _purge_quarantine(self, quarantine_dir: Path) -> None:
+        if not quarantine_dir.is_dir():
+            return
+        for entry in os.scandir(quarantine_dir):
+            try:
+                shutil.rmtree(entry.path)
+            except OSError as e:
+                logger.error(f"Quarantined workspace {entry.path} still cannot be removed: {e}")
+
+
+def create_workspace_manager() -> WorkspaceManager:
+    """按全局配置创建工作区管理器。"""
+    return WorkspaceManager(
+        Path(settings.WASM_WORKSPACE_ROOT),
+        Path(settings.SHARED_FS_ROOT) if settings.SHARED_FS_ROOT else None,
+        settings.WASM_WORKSPACE_POOL_SIZE,
+    )
+
+
+def pid_alive(pid: str) -> bool:
+    """进程是否仍然存在；无法解析为进程号时视为已退出。"""
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def empty_dir(path: Path) -> None:
+    """删除目录中的所有内容，保留目录本身。"""
+    for entry in os.scandir(path):
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path)
+        else:
+            os.unlink(entry.path)
+
+
+def _remove_empty_parent(path: Path) -> None:
+    """共享工作区按任务组分目录，组内最后一个任务清理后顺带删除空的组目录。"""
+    try:
+        path.parent.rmdir()
+    except OSError:
+        pass
@@ -0,0 +1,82 @@
+# benchmarks/bench_dispatch.py
+# 微基准：测量 dispatch_task_group 的分发延迟随任务组大小的变化。
+# 需要一个可用的 PostgreSQL（读取 .env 中的 DATABASE_URL），不需要运行中的 Celery/Redis。
+# 用法: python -m benchmarks.bench_dispatch [--sizes 1 10 100 500 1000] [--repeat 5]
+
+import argparse
+import statistics
+import time
+
+from app.db import base as models
+from app.db.session import SessionLocal
+from app.tasks import scheduler
+from app.tasks.execution_plan import ExecutionPlan
+
+
+def _create_fixture(db):
+    """创建基准测试用的用户、Agent和工作流实例。"""
+    suffix = str(time.time_ns())
+    user = models.User(username=f"bench_{suffix}", hashed_password="x")
+    db.add(user)
+    db.flush()
+    agent = models.Agent(
+        name=f"bench_agent_{suffix}",
+        agent_type=models.AgentType.PYTHON_FUNCTION,
+        source_reference="bench",
+        owner_id=user.id,
+    )
+    template = models.DAGTemplate(name=f"bench_{suffix}", dag_definition={"nodes": [], "edges": []}, owner_id=user.id)
+    db.add_all([agent, template])
+    db.flush()
+    instance = models.WorkflowInstance(template_id=template.id, owner_id=user.id, status=models.WorkflowStatus.RUNNING)
+    db.add(instance)
+    db.commit()
+    return user, agent, template, instance
+
+
+def _cleanup(db, user, agent, template, instance):
+    db.query(models.TaskInstance).filter(models.TaskInstance.workflow_instance_id == instance.id).delete()
+    db.delete(instance)
+    db.delete(template)
+    db.delete(agent)
+    db.delete(user)
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dispatch_task_group 延迟 vs 任务组大小")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50, 100, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # 只测量数据库侧的开销：把消息发送替换为空操作
+    scheduler.celery_app.send_task = lambda *a, **kw: None
+
+    db = SessionLocal()
+    fixture = _create_fixture(db)
+    _, agent, template, instance = fixture
+    try:
+        print(f"{'group_size':>10} {'median_ms':>10} {'p_min_ms':>10} {'per_node_us':>12}")
+        for size in args.sizes:
+            nodes = [
+                {"id": f"n{i}", "data": {"agent_id": agent.id, "input_params": {"i": i}}}
+                for i in range(size)
+            ]
+            # 调度器在事件处理中使用缓存的执行计划，这里同样在计时之外预先构建
+            plan = ExecutionPlan(template.id, template.updated_at, {"nodes": nodes, "edges": []})
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                scheduler.dispatch_task_group(db, instance, plan, nodes)
+                samples.append(time.perf_counter() - start)
+                db.query(models.TaskInstance).filter(models.TaskInstance.workflow_instance_id == instance.id).delete()
+                db.commit()
+            median = statistics.median(samples)
+            print(f"{size:>10} {median * 1e3:>10.2f} {min(samples) * 1e3:>10.2f} {median / size * 1e6:>12.1f}")
+    finally:
+        _cleanup(db, *fixture)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
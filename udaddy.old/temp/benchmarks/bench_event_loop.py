@@ -0,0 +1,70 @@
+# benchmarks/bench_event_loop.py
+# 基准：比较每个任务组调用一次 asyncio.run 与提交到常驻后台事件循环的单组开销。
+# 模拟的“异步资源”（如连接池、HTTP会话）绑定在事件循环上，初始化一次需要 --setup-ms 毫秒：
+# asyncio.run 模式下每个任务组都要重新初始化，常驻循环模式下只初始化一次。
+# 用法: python -m benchmarks.bench_event_loop [--groups 200] [--group-size 10] [--setup-ms 5]
+
+import argparse
+import asyncio
+import statistics
+import time
+import weakref
+
+from app.tasks.event_loop import BackgroundEventLoop
+
+_resources: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = weakref.WeakKeyDictionary()
+
+
+async def _get_loop_resource(setup_seconds: float) -> object:
+    loop = asyncio.get_running_loop()
+    resource = _resources.get(loop)
+    if resource is None:
+        await asyncio.sleep(setup_seconds)  # 模拟建立连接池等一次性开销
+        resource = object()
+        _resources[loop] = resource
+    return resource
+
+
+async def _group(group_size: int, setup_seconds: float):
+    await _get_loop_resource(setup_seconds)
+    async with asyncio.TaskGroup() as tg:
+        for _ in range(group_size):
+            tg.create_task(asyncio.sleep(0))
+
+
+def _measure(run, groups: int, group_size: int, setup_seconds: float):
+    samples = []
+    for _ in range(groups):
+        start = time.perf_counter()
+        run(_group(group_size, setup_seconds))
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _report(name: str, samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{name:>16} {statistics.median(samples) * 1e6:>12.1f} {statistics.mean(samples) * 1e6:>12.1f} {p99 * 1e6:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="asyncio.run vs 常驻事件循环的单任务组开销")
+    parser.add_argument("--groups", type=int, default=200)
+    parser.add_argument("--group-size", type=int, default=10)
+    parser.add_argument("--setup-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    setup_seconds = args.setup_ms / 1000
+
+    print(f"{'mode':>16} {'median_us':>12} {'mean_us':>12} {'p99_us':>12}")
+    _report("asyncio.run", _measure(asyncio.run, args.groups, args.group_size, setup_seconds))
+
+    loop = BackgroundEventLoop(name="bench-loop")
+    loop.start()
+    try:
+        _report("persistent loop", _measure(loop.run, args.groups, args.group_size, setup_seconds))
+    finally:
+        loop.stop()
+
+
+if __name__ == "__main__":
+    main()
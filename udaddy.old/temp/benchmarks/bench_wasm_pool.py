@@ -0,0 +1,83 @@
+# benchmarks/bench_wasm_pool.py
+# 基准：比较 WasmManager.execute 在三种实例化模式下的单次调用开销。
+#   fresh     - 不使用实例池，每次新建 Linker 并实例化（旧行为）
+#   pre       - 复用预链接的 InstancePre，每次仍新建Store
+#   stateless - Agent声明 stateless，复用整个 Store + Instance
+# 使用一个只返回固定输出的极小模块，测得的时间几乎全部是宿主侧的准备开销。
+# 用法: python -m benchmarks.bench_wasm_pool [--calls 2000]
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from wasmtime import wat2wasm
+
+from app.tasks.wasm_manager import WasmManager
+from app.tasks.workspace import WorkspaceManager
+
+# 实现 allocate_memory / free_memory / run 协议的最小模块，run 固定返回 {"ok":true}
+TINY_AGENT_WAT = r"""
+(module
+  (memory (export "memory") 1)
+  (global $bump (mut i32) (i32.const 1024))
+  (data (i32.const 16) "{\"ok\":true}")
+  (func (export "allocate_memory") (param $size i32) (result i32)
+    (local $ptr i32)
+    (local.set $ptr (global.get $bump))
+    (global.set $bump (i32.add (global.get $bump) (local.get $size)))
+    (local.get $ptr))
+  (func (export "free_memory") (param i32 i32)
+    (global.set $bump (i32.const 1024)))
+  (func (export "run") (param i32 i32) (result i64)
+    (i64.or (i64.shl (i64.const 16) (i64.const 32)) (i64.const 11))))
+"""
+
+
+async def _measure(manager: WasmManager, module_path: str, workspace: Path, calls: int, agent_config: dict):
+    # 预热：编译模块并创建池
+    await manager.execute("bench", 0, module_path, {"x": 1}, workspace, agent_config)
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        result = await manager.execute("bench", i, module_path, {"x": i}, workspace, agent_config)
+        samples.append(time.perf_counter() - start)
+        assert result["status"] == "SUCCESS", result
+    return samples
+
+
+def _report(name: str, samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{name:>10} {statistics.median(samples) * 1e6:>12.1f} {statistics.mean(samples) * 1e6:>12.1f} {p99 * 1e6:>12.1f}")
+
+
+async def _run(calls: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        module_path = str(Path(tmp) / "tiny_agent.wasm")
+        Path(module_path).write_bytes(wat2wasm(TINY_AGENT_WAT))
+        workspace = Path(tmp) / "workspace"
+        workspace.mkdir()
+
+        manager = WasmManager(WorkspaceManager(Path(tmp) / "pool", None, pool_size=8))
+        pools = manager._pools
+
+        print(f"{'mode':>10} {'median_us':>12} {'mean_us':>12} {'p99_us':>12}")
+        manager._pools = None
+        _report("fresh", await _measure(manager, module_path, workspace, calls, {}))
+        manager._pools = pools
+        _report("pre", await _measure(manager, module_path, workspace, calls, {}))
+        _report("stateless", await _measure(manager, module_path, workspace, calls, {"stateless": True}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WASM实例池的单次调用开销")
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(_run(args.calls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# benchmarks/load_priority.py
+# 负载测试：在大量批量任务积压的情况下，测量高优先级任务组从入队到开始执行的延迟（p50/p95/p99）。
+# 对比两种模式：
+#   fifo   - 所有任务组进入同一个队列（引入优先级队列之前的行为）
+#   tiered - 按优先级进入三档队列，由 AsyncGroupWorker 加权公平消费
+# 任务组本身不执行，只 sleep --service-ms 毫秒，因此只需要一个可用的Redis（读取 .env 中的 REDIS_URL），不需要数据库。
+# 用法: python -m benchmarks.load_priority [--backlog 5000] [--high 200] [--high-interval-ms 20] [--service-ms 5] [--max-groups 8]
+
+import argparse
+import asyncio
+import base64
+import json
+import statistics
+import time
+from typing import Dict, List
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+from app.tasks.async_worker import AsyncGroupWorker
+from app.tasks.messages import EXECUTE_GROUP_TASK
+from app.tasks.priority import tier_queues
+
+
+def _encode_message(payload: Dict) -> bytes:
+    """构造与kombu写入Redis时相同结构的Celery任务协议v2消息。"""
+    body = base64.b64encode(json.dumps([[payload], {}, {}]).encode()).decode()
+    return json.dumps({
+        "body": body,
+        "headers": {"task": EXECUTE_GROUP_TASK},
+        "properties": {"body_encoding": "base64"},
+    }).encode()
+
+
+def _payload(index: int, high: bool) -> Dict:
+    return {
+        "group_id": f"bench-{'high' if high else 'bulk'}-{index}",
+        "tasks": [{"task_instance_id": index, "high": high, "enqueued_at": time.perf_counter()}],
+    }
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[max(0, int(len(sorted_values) * fraction + 0.5) - 1)]
+
+
+class _BenchWorker(AsyncGroupWorker):
+    """不执行任务组，只模拟固定的服务时间并记录排队延迟。"""
+
+    def __init__(self, *args, service_seconds: float, expected_high: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._service_seconds = service_seconds
+        self._expected_high = expected_high
+        self.high_latencies: List[float] = []
+        self.bulk_done = 0
+
+    async def _run_group(self, group_id: str, tasks: List[Dict]):
+        task = tasks[0]
+        if task["high"]:
+            self.high_latencies.append(time.perf_counter() - task["enqueued_at"])
+            if len(self.high_latencies) >= self._expected_high:
+                self.request_shutdown()
+        else:
+            self.bulk_done += 1
+        await asyncio.sleep(self._service_seconds)
+
+
+async def _run(client: aioredis.Redis, mode: str, args) -> Dict:
+    base = f"bench_priority_{time.time_ns()}"
+    queues = tier_queues(base) if mode == "tiered" else [(base, 1)]
+    high_queue = queues[0][0]
+    bulk_queue = queues[-1][0]  # 批量回填使用低优先级（fifo模式下就是唯一的队列）
+
+    # 1. 先堆积批量任务
+    pipe = client.pipeline(transaction=False)
+    for i in range(args.backlog):
+        pipe.lpush(bulk_queue, _encode_message(_payload(i, high=False)))
+    await pipe.execute()
+
+    worker = _BenchWorker(
+        client,
+        queues=queues,
+        max_groups=args.max_groups,
+        group_timeout=60,
+        name="bench",
+        idle_wait=0.05,
+        service_seconds=args.service_ms / 1000,
+        expected_high=args.high,
+    )
+
+    # 2. Worker开始消费积压的同时，持续注入高优先级任务组
+    async def inject():
+        for i in range(args.high):
+            await client.lpush(high_queue, _encode_message(_payload(i, high=True)))
+            await asyncio.sleep(args.high_interval_ms / 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(worker.run(), inject())
+    elapsed = time.perf_counter() - started
+
+    keys = [queue for queue, _ in queues] + [f"{queue}:processing:bench" for queue, _ in queues]
+    await client.delete(*keys, f"{queues[0][0]}:unhandled")
+    latencies_ms = sorted(latency * 1000 for latency in worker.high_latencies)
+    return {
+        "mode": mode,
+        "p50": statistics.median(latencies_ms),
+        "p95": _percentile(latencies_ms, 0.95),
+        "p99": _percentile(latencies_ms, 0.99),
+        "bulk_done": worker.bulk_done,
+        "seconds": elapsed,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Priority queue load test")
+    parser.add_argument("--backlog", type=int, default=5000, help="预先积压的批量任务组数")
+    parser.add_argument("--high", type=int, default=200, help="注入的高优先级任务组数")
+    parser.add_argument("--high-interval-ms", type=float, default=20, help="高优先级任务组的注入间隔")
+    parser.add_argument("--service-ms", type=float, default=5, help="每个任务组的模拟执行时间")
+    parser.add_argument("--max-groups", type=int, default=8, help="Worker并发执行的任务组上限")
+    args = parser.parse_args()
+
+    client = aioredis.from_url(str(settings.REDIS_URL))
+    try:
+        print(f"{'mode':>8} {'high p50 ms':>12} {'high p95 ms':>12} {'high p99 ms':>12} {'bulk done':>10} {'seconds':>8}")
+        for mode in ("fifo", "tiered"):
+            r = await _run(client, mode, args)
+            print(f"{r['mode']:>8} {r['p50']:>12.1f} {r['p95']:>12.1f} {r['p99']:>12.1f} {r['bulk_done']:>10} {r['seconds']:>8.2f}")
+    finally:
+        await client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+# tests/test_bind_inputs.py
+
+from app.storage.backends import LocalFSBackend
+from app.storage.blob_store import BLOB_KEY, BlobStore, LazyInputs
+from app.tasks.execution_plan import bind_inputs
+
+
+def test_bind_inputs_whole_output():
+    outputs = {7: {"rows": [1, 2], "count": 2}}
+    refs = [{"task_instance_id": 7, "output_key": "*", "input_key": "upstream"}]
+
+    bound, missing = bind_inputs({"static": 1}, refs, outputs)
+
+    assert bound == {"static": 1, "upstream": {"rows": [1, 2], "count": 2}}
+    assert missing == []
+
+
+def test_bind_inputs_single_key_overrides_static_input():
+    refs = [{"task_instance_id": 7, "output_key": "count", "input_key": "n"}]
+
+    bound, missing = bind_inputs({"n": 0}, refs, {7: {"count": 2}})
+
+    assert bound == {"n": 2}
+    assert missing == []
+
+
+def test_bind_inputs_missing_key_binds_none():
+    refs = [
+        {"task_instance_id": 7, "output_key": "absent", "input_key": "a"},
+        {"task_instance_id": 8, "output_key": "value", "input_key": "b"},
+    ]
+
+    bound, missing = bind_inputs(None, refs, {7: {"count": 2}, 8: "not a dict"})
+
+    assert bound == {"a": None, "b": None}
+    assert missing == refs
+
+
+def test_bind_inputs_does_not_modify_static_inputs():
+    static = {"x": 1}
+
+    bind_inputs(static, [{"task_instance_id": 1, "output_key": "*", "input_key": "y"}], {1: 2})
+
+    assert static == {"x": 1}
+
+
+def test_lazy_inputs_read_on_access(tmp_path):
+    store = BlobStore(LocalFSBackend(tmp_path))
+    ref = store.put_bytes(b"big")
+    inputs = LazyInputs(store, {"big": ref, "small": 1})
+
+    assert repr(inputs) == repr({"big": ref, "small": 1})
+    assert inputs["big"] == "big"
+    assert dict(inputs) == {"big": "big", "small": 1}
+
+
+def test_lazy_inputs_skip_unread_blobs(tmp_path):
+    store = BlobStore(LocalFSBackend(tmp_path))
+    ref = store.put_bytes(b"unused")
+    store.backend.path(ref[BLOB_KEY]).unlink()
+    inputs = LazyInputs(store, {"unused": ref, "n": 1})
+
+    # 未被读取的大对象不会被取回，即使它已经不在存储中
+    assert inputs["n"] == 1
+    assert len(inputs) == 2
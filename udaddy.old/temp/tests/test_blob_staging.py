@@ -0,0 +1,67 @@
+# tests/test_blob_staging.py
+
+import json
+
+import pytest
+
+from app.storage.backends import LocalFSBackend
+from app.storage.blob_store import (
+    BLOB_KEY,
+    FILE_KEY,
+    BlobStore,
+    collect_outputs,
+    resolve_blob_refs,
+    stage_inputs,
+    uses_blob_refs,
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(LocalFSBackend(tmp_path / "blobs"))
+
+
+def test_stage_inputs_and_collect_outputs_round_trip(store, tmp_path):
+    ref = store.put_bytes(b"input data")
+    staging_dir, staged = stage_inputs(store, {"data": ref, "n": 1})
+
+    digest = ref[BLOB_KEY]
+    assert staged == {"data": {FILE_KEY: f"/inputs/{digest}", "size": ref["size"]}, "n": 1}
+    assert (staging_dir / digest).read_bytes() == b"input data"
+
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    (workspace / "result.bin").write_bytes(b"output data")
+    collected = collect_outputs(store, {"result": {FILE_KEY: "/result.bin"}}, workspace)
+
+    assert store.read(collected["result"]) == b"output data"
+
+
+def test_stage_inputs_without_refs_is_a_no_op(store):
+    assert stage_inputs(store, {"n": 1}) == (None, {"n": 1})
+
+
+def test_collect_outputs_rejects_paths_outside_workspace(store, tmp_path):
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    (tmp_path / "secret").write_bytes(b"x")
+
+    with pytest.raises(ValueError):
+        collect_outputs(store, {FILE_KEY: "/../secret"}, workspace)
+
+
+def test_resolve_nested_refs(store):
+    ref = store.put_bytes(json.dumps({"k": 1}).encode(), encoding="json")
+
+    assert resolve_blob_refs(store, {"a": [ref, 2], "b": ref}) == {"a": [{"k": 1}, 2], "b": {"k": 1}}
+
+
+def test_resolve_without_store_fails():
+    with pytest.raises(RuntimeError):
+        resolve_blob_refs(None, {"a": {BLOB_KEY: "0" * 64, "size": 1}})
+
+
+def test_blob_refs_are_opt_in():
+    assert not uses_blob_refs(None)
+    assert not uses_blob_refs({"stateless": True})
+    assert uses_blob_refs({"blob_refs": True})
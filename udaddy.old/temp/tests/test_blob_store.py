@@ -0,0 +1,113 @@
+# tests/test_blob_store.py
+
+import os
+import time
+
+import pytest
+
+from app.storage.backends import BlobBackend, LocalFSBackend
+from app.storage.blob_store import (
+    BLOB_KEY,
+    BlobStore,
+    LazyInputs,
+    externalize_large_values,
+    externalize_output,
+    is_blob_ref,
+    resolve_blob_refs,
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(LocalFSBackend(tmp_path / "blobs"))
+
+
+def _age(store, ref, seconds):
+    path = store.backend.path(ref[BLOB_KEY])
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        BlobBackend()
+
+
+@pytest.mark.parametrize("value, encoding", [("文本" * 10, None), (b"\x00\x01", "binary")])
+def test_put_and_read_round_trip(store, value, encoding):
+    data = value.encode("utf-8") if isinstance(value, str) else value
+    ref = store.put_bytes(data, encoding=encoding) if encoding else store.put_bytes(data)
+
+    assert ref["size"] == len(data)
+    assert store.read(ref) == value
+
+
+def test_identical_content_is_stored_once(store):
+    first = store.put_bytes(b"same")
+    second = store.put_bytes(b"same")
+
+    assert first == second
+    assert store.exists(first[BLOB_KEY])
+
+
+def test_put_file_moves_source(store, tmp_path):
+    source = tmp_path / "out.bin"
+    source.write_bytes(b"payload")
+
+    ref = store.put_file(source, move=True)
+
+    assert not source.exists()
+    assert store.read(ref) == b"payload"
+
+
+def test_externalize_only_values_over_threshold(store):
+    data = {"small": "x", "text": "y" * 100, "rows": list(range(50)), "n": 5}
+
+    result = externalize_large_values(store, data, threshold=64)
+
+    assert result["small"] == "x" and result["n"] == 5
+    assert is_blob_ref(result["text"]) and store.read(result["text"]) == "y" * 100
+    assert is_blob_ref(result["rows"]) and store.read(result["rows"]) == list(range(50))
+    assert resolve_blob_refs(store, result) == data
+
+
+def test_externalize_output_handles_non_dict_output(store):
+    ref = externalize_output(store, list(range(100)), threshold=16)
+
+    assert is_blob_ref(ref)
+    assert externalize_output(store, ref, threshold=16) == ref
+    assert store.read(ref) == list(range(100))
+
+
+def test_lazy_inputs_read_on_access(store):
+    ref = store.put_bytes(b"big")
+    inputs = LazyInputs(store, {"big": ref, "small": 1})
+
+    assert repr(inputs) == repr({"big": ref, "small": 1})
+    assert inputs["big"] == "big"
+    assert dict(inputs) == {"big": "big", "small": 1}
+
+
+def test_sweep_removes_only_old_unreferenced_blobs(store):
+    kept = store.put_bytes(b"referenced")
+    orphan = store.put_bytes(b"orphan")
+    fresh = store.put_bytes(b"just written")
+    _age(store, kept, 3600)
+    _age(store, orphan, 3600)
+    store.new_staging_dir()
+
+    removed = store.sweep({kept[BLOB_KEY]}, ttl_seconds=60)
+
+    assert removed == 1
+    assert not store.exists(orphan[BLOB_KEY])
+    assert store.exists(kept[BLOB_KEY]) and store.exists(fresh[BLOB_KEY])
+
+
+def test_storing_existing_content_again_protects_it_from_sweep(store):
+    ref = store.put_bytes(b"reused")
+    _age(store, ref, 3600)
+
+    store.put_bytes(b"reused")
+
+    assert store.sweep(set(), ttl_seconds=60) == 0
+    assert store.read(ref) == "reused"
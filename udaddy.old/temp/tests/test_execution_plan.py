@@ -0,0 +1,84 @@
+# tests/test_execution_plan.py
+
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.tasks.execution_plan import ExecutionPlan, ExecutionPlanCache, get_instance_plan, plan_cache
+
+
+def _plan(node_ids, edges):
+    return ExecutionPlan(1, None, {"nodes": [{"id": node_id, "data": {}} for node_id in node_ids], "edges": edges})
+
+
+def test_duplicate_edges_count_once():
+    plan = _plan(["a", "b"], [{"from": "a", "to": "b"}, {"from": "a", "to": "b"}])
+
+    assert plan.in_degrees() == {"a": 0, "b": 1}
+    assert plan.downstream("a") == ["b"]
+    assert plan.upstream("b") == ["a"]
+    assert not plan.is_cyclic
+
+
+def test_duplicate_edges_keep_all_data_bindings():
+    plan = _plan(["a", "b"], [
+        {"from": "a", "to": "b", "data": {"x": "in_x"}},
+        {"from": "a", "to": "b", "data": {"y": "in_y"}},
+    ])
+
+    assert plan.input_bindings_for("b") == [("a", "x", "in_x"), ("a", "y", "in_y")]
+    assert plan.in_degrees()["b"] == 1
+
+
+def test_edges_to_unknown_nodes_are_ignored():
+    plan = _plan(["a"], [{"from": "a", "to": "missing"}, {"from": "missing", "to": "a"}])
+
+    assert plan.in_degrees() == {"a": 0}
+    assert [node["id"] for node in plan.start_node_defs()] == ["a"]
+
+
+def test_cycle_is_detected():
+    plan = _plan(["a", "b", "c"], [{"from": "a", "to": "b"}, {"from": "b", "to": "c"}, {"from": "c", "to": "b"}])
+
+    assert plan.is_cyclic
+    assert [node["id"] for node in plan.start_node_defs()] == ["a"]
+
+
+def test_self_loop_is_a_cycle():
+    assert _plan(["a"], [{"from": "a", "to": "a"}]).is_cyclic
+
+
+def test_acyclic_plan_descendants():
+    plan = _plan(["a", "b", "c", "d"], [{"from": "a", "to": "b"}, {"from": "b", "to": "c"}, {"from": "a", "to": "d"}])
+
+    assert not plan.is_cyclic
+    assert plan.descendants(["b"]) == {"b", "c"}
+    assert plan.descendants(["a", "unknown"]) == {"a", "b", "c", "d"}
+
+
+def test_plan_cache_keeps_versions_of_the_same_template():
+    cache = ExecutionPlanCache(maxsize=4)
+    old = ExecutionPlan(1, datetime(2024, 1, 1), {"nodes": [{"id": "a"}]})
+    new = ExecutionPlan(1, datetime(2024, 2, 1), {"nodes": [{"id": "a"}, {"id": "b"}]})
+    cache.put(old)
+    cache.put(new)
+
+    assert cache.get(1, datetime(2024, 1, 1)) is old
+    assert cache.get(1, datetime(2024, 2, 1)) is new
+
+
+def test_instance_plan_is_compiled_from_its_pinned_snapshot():
+    plan_cache.clear()
+    instance = SimpleNamespace(
+        id=7,
+        template_id=99,
+        template_version=datetime(2024, 1, 1),
+        dag_definition={"nodes": [{"id": "a"}, {"id": "b"}], "edges": [{"from": "a", "to": "b"}]},
+    )
+
+    # 固定了版本的实例不查询模板表
+    plan = get_instance_plan(None, instance)
+
+    assert plan.version == datetime(2024, 1, 1)
+    assert plan.downstream("a") == ["b"]
+    assert get_instance_plan(None, instance) is plan
+    plan_cache.clear()
@@ -0,0 +1,62 @@
+# tests/test_memo.py
+
+import pytest
+import redis
+
+from app.core.config import settings
+from app.tasks import memo
+
+
+class _DownRedis:
+    """每个命令都因连接失败而抛出异常的Redis客户端。"""
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def incrby(self, key, amount):
+        pass
+
+    def execute(self):
+        raise redis.ConnectionError("Connection refused")
+
+    def mget(self, *keys):
+        raise redis.ConnectionError("Connection refused")
+
+
+def test_memo_key_ignores_key_order_and_whitespace():
+    assert memo.memo_key("h", {"a": 1, "b": [1, 2]}) == memo.memo_key("h", {"b": [1, 2], "a": 1})
+    assert memo.memo_key("h", {"a": 1}) != memo.memo_key("other", {"a": 1})
+
+
+def test_only_deterministic_agents_are_memoized(monkeypatch):
+    monkeypatch.setattr(settings, "MEMO_CACHE_ENABLED", True)
+    assert memo.is_deterministic({"deterministic": True})
+    assert not memo.is_deterministic({})
+
+    monkeypatch.setattr(settings, "MEMO_CACHE_ENABLED", False)
+    assert not memo.is_deterministic({"deterministic": True})
+
+
+def test_source_hasher_follows_file_changes(tmp_path):
+    path = tmp_path / "agent.wasm"
+    path.write_bytes(b"v1")
+    hasher = memo.SourceHasher()
+
+    first = hasher.get(str(path))
+    path.write_bytes(b"v2-longer")
+
+    assert hasher.get(str(path)) != first
+    assert hasher.get("registry/image:latest") is None
+
+
+@pytest.fixture
+def redis_down(monkeypatch):
+    monkeypatch.setattr(memo, "_redis_client", _DownRedis())
+
+
+def test_record_lookups_survives_redis_outage(redis_down):
+    memo.record_lookups(3, 1)
+
+
+def test_lookup_stats_without_redis(redis_down):
+    assert memo.lookup_stats() == {"hits": None, "misses": None, "hit_rate": None}
@@ -0,0 +1,60 @@
+# tests/test_messages.py
+
+import base64
+import json
+
+import pytest
+
+from app.tasks.messages import EXECUTE_GROUP_TASK, InvalidMessageError, decode_execute_group_message
+
+PAYLOAD = {"group_id": "g1", "tasks": [{"task_instance_id": 1}]}
+
+
+def _v2_message(task_name, args, kwargs, *, base64_body=True):
+    body = json.dumps([args, kwargs, {}])
+    properties = {}
+    if base64_body:
+        body = base64.b64encode(body.encode()).decode()
+        properties["body_encoding"] = "base64"
+    return json.dumps({"body": body, "headers": {"task": task_name}, "properties": properties}).encode()
+
+
+def test_protocol_v2_positional_payload():
+    assert decode_execute_group_message(_v2_message(EXECUTE_GROUP_TASK, [PAYLOAD], {})) == PAYLOAD
+
+
+def test_protocol_v2_keyword_payload():
+    assert decode_execute_group_message(_v2_message(EXECUTE_GROUP_TASK, [], {"payload": PAYLOAD})) == PAYLOAD
+
+
+def test_protocol_v2_plain_body():
+    raw = _v2_message(EXECUTE_GROUP_TASK, [PAYLOAD], {}, base64_body=False)
+
+    assert decode_execute_group_message(raw) == PAYLOAD
+
+
+def test_protocol_v1_body():
+    body = base64.b64encode(json.dumps({"task": EXECUTE_GROUP_TASK, "args": [PAYLOAD], "kwargs": {}}).encode())
+    raw = json.dumps({"body": body.decode(), "headers": {}, "properties": {"body_encoding": "base64"}}).encode()
+
+    assert decode_execute_group_message(raw) == PAYLOAD
+
+
+def test_other_tasks_are_ignored():
+    assert decode_execute_group_message(_v2_message("handle_scheduler_event", [{"event_type": "START"}], {})) is None
+
+
+@pytest.mark.parametrize("raw", [
+    b"not json",
+    json.dumps({"body": "%%%", "headers": {}, "properties": {"body_encoding": "base64"}}).encode(),
+    json.dumps({"body": json.dumps([]), "headers": {"task": EXECUTE_GROUP_TASK}}).encode(),
+    json.dumps(["not", "an", "envelope"]).encode(),
+])
+def test_malformed_messages_raise(raw):
+    with pytest.raises(InvalidMessageError):
+        decode_execute_group_message(raw)
+
+
+def test_non_object_payload_raises():
+    with pytest.raises(InvalidMessageError):
+        decode_execute_group_message(_v2_message(EXECUTE_GROUP_TASK, ["group"], {}))
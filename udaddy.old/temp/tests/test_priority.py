@@ -0,0 +1,72 @@
+# tests/test_priority.py
+
+from collections import Counter
+
+import pytest
+
+from app.core.config import settings
+from app.tasks.priority import WeightedFairSelector, queue_name, tier_for_priority, tier_queues
+
+
+def test_tier_thresholds():
+    assert tier_for_priority(None) == "normal"
+    assert tier_for_priority(settings.PRIORITY_HIGH_THRESHOLD) == "high"
+    assert tier_for_priority(settings.PRIORITY_LOW_THRESHOLD - 1) == "low"
+    assert queue_name("normal", "q") == "q"
+    assert queue_name("low", "q") == "q.low"
+
+
+def test_tier_queues_requires_one_weight_per_tier(monkeypatch):
+    monkeypatch.setattr(settings, "PRIORITY_QUEUE_WEIGHTS", [8, 3])
+
+    with pytest.raises(ValueError):
+        tier_queues("q")
+
+
+def test_tier_queues_order(monkeypatch):
+    monkeypatch.setattr(settings, "PRIORITY_QUEUE_WEIGHTS", [8, 3, 1])
+
+    assert tier_queues("q") == [("q.high", 8), ("q", 3), ("q.low", 1)]
+
+
+@pytest.mark.parametrize("weights", [[], [1, 0], [-1, 2]])
+def test_selector_rejects_invalid_weights(weights):
+    with pytest.raises(ValueError):
+        WeightedFairSelector(weights)
+
+
+def test_selector_follows_weights_exactly_per_round():
+    selector = WeightedFairSelector([8, 3, 1])
+
+    for _ in range(10):
+        preferred = Counter(selector.next_order()[0] for _ in range(12))
+        assert preferred == {0: 8, 1: 3, 2: 1}
+
+
+def test_selector_never_starves_a_queue():
+    weights = [8, 3, 1]
+    selector = WeightedFairSelector(weights)
+    last_seen = {i: -1 for i in range(len(weights))}
+
+    for step in range(1000):
+        last_seen[selector.next_order()[0]] = step
+        # 任意连续 sum(weights) 次选择中，每个队列至少被选为首选一次
+        for i in last_seen:
+            assert step - last_seen[i] < sum(weights)
+
+
+def test_selector_interleaves_high_priority():
+    selector = WeightedFairSelector([8, 3, 1])
+    picks = [selector.next_order()[0] for _ in range(12)]
+
+    # 平滑加权轮询不会连续把同一档的份额一次性用完
+    assert picks[:8] != [0] * 8
+
+
+def test_fallback_order_covers_every_queue():
+    selector = WeightedFairSelector([1, 3, 8])
+
+    for _ in range(12):
+        order = selector.next_order()
+        assert sorted(order) == [0, 1, 2]
+        assert order[1:] == [i for i in (2, 1, 0) if i != order[0]]
@@ -0,0 +1,54 @@
+# tests/test_wasm_artifact_cache.py
+
+import os
+import time
+
+import pytest
+from wasmtime import Engine
+
+from app.tasks import wasm_artifact_cache
+from app.tasks.wasm_artifact_cache import ModuleArtifactCache
+
+
+class _FakeModule:
+    def serialize(self):
+        return b"compiled"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ModuleArtifactCache(Engine(), tmp_path, max_bytes=1 << 20, engine_fingerprint="test")
+
+
+def test_missing_artifact_is_a_miss(cache):
+    assert cache.load("0" * 64) is None
+
+
+def test_store_writes_artifact(cache, tmp_path):
+    cache.store("a" * 64, _FakeModule())
+
+    assert [path.suffix for path in tmp_path.iterdir()] == [wasm_artifact_cache.ARTIFACT_SUFFIX]
+
+
+def test_failed_store_leaves_no_temporary_file(cache, tmp_path, monkeypatch):
+    def no_space(src, dst):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(wasm_artifact_cache.os, "replace", no_space)
+    cache.store("a" * 64, _FakeModule())
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_eviction_removes_stale_temporary_files(cache, tmp_path):
+    stale = tmp_path / f"stale{wasm_artifact_cache.TMP_SUFFIX}"
+    fresh = tmp_path / f"fresh{wasm_artifact_cache.TMP_SUFFIX}"
+    stale.write_bytes(b"x")
+    fresh.write_bytes(b"x")
+    old = time.time() - wasm_artifact_cache.STALE_TMP_SECONDS - 1
+    os.utime(stale, (old, old))
+
+    cache.store("a" * 64, _FakeModule())
+
+    assert not stale.exists()
+    assert fresh.exists()
@@ -0,0 +1,78 @@
+# tests/test_wasm_limits.py
+
+import asyncio
+
+import pytest
+from wasmtime import wat2wasm
+
+from app.core.config import settings
+from app.tasks.wasm_manager import WasmManager
+
+# 遵循内存投递协议的最小模块：run 固定返回 {"ok":true}
+OK_WAT = r"""
+(module
+  (memory (export "memory") 1)
+  (data (i32.const 16) "{\"ok\":true}")
+  (func (export "allocate_memory") (param i32) (result i32) (i32.const 1024))
+  (func (export "free_memory") (param i32 i32))
+  (func (export "run") (param i32 i32) (result i64)
+    (i64.or (i64.shl (i64.const 16) (i64.const 32)) (i64.const 11))))
+"""
+
+# run 永不返回，只能被燃料或墙钟超时终止
+SPIN_WAT = r"""
+(module
+  (memory (export "memory") 1)
+  (func (export "allocate_memory") (param i32) (result i32) (i32.const 1024))
+  (func (export "free_memory") (param i32 i32))
+  (func (export "run") (param i32 i32) (result i64) (loop (br 0)) (i64.const 0)))
+"""
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(settings, "WASM_ARTIFACT_CACHE_DIR", "")
+    monkeypatch.setattr(settings, "WASM_INSTANCE_POOL_ENABLED", False)
+    return WasmManager()
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    path = tmp_path / "workspace"
+    path.mkdir()
+    return path
+
+
+def _module(tmp_path, name, wat):
+    path = tmp_path / f"{name}.wasm"
+    path.write_bytes(wat2wasm(wat))
+    return str(path)
+
+
+def _execute(manager, module_path, workspace, resource_limits):
+    return asyncio.run(manager.execute("g", 1, module_path, {}, workspace, {}, resource_limits))
+
+
+def test_success_reports_fuel_consumed(manager, workspace, tmp_path):
+    result = _execute(manager, _module(tmp_path, "ok", OK_WAT), workspace, {"fuel": 1_000_000})
+
+    assert result["status"] == "SUCCESS"
+    assert result["output"] == {"ok": True}
+    assert 0 < result["fuel_consumed"] < 1_000_000
+
+
+def test_fuel_exhaustion_consumes_whole_budget(manager, workspace, tmp_path):
+    result = _execute(manager, _module(tmp_path, "spin", SPIN_WAT), workspace, {"fuel": 100_000, "timeout_seconds": 0})
+
+    assert result["status"] == "FAILED"
+    assert "fuel" in result["error"]
+    assert result["fuel_consumed"] == 100_000
+
+
+def test_timeout_does_not_report_bogus_fuel(manager, workspace, tmp_path):
+    result = _execute(manager, _module(tmp_path, "spin", SPIN_WAT), workspace, {"fuel": 10**12, "timeout_seconds": 0.2})
+
+    assert result["status"] == "FAILED"
+    assert "interrupt" in result["error"]
+    # epoch中断后Store中的剩余燃料不可信，真实消耗未知
+    assert result["fuel_consumed"] is None
@@ -0,0 +1,93 @@
+# tests/test_wasm_module_cache.py
+
+import asyncio
+
+import pytest
+
+from app.tasks.wasm_module_cache import ModuleCache
+
+
+class _Loader:
+    """代替编译的加载器：为每个内容哈希返回一个新对象，并记录调用次数。"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, module_path, content_hash):
+        self.calls.append(module_path)
+        return object()
+
+
+def _write_modules(tmp_path, *names):
+    paths = []
+    for name in names:
+        path = tmp_path / f"{name}.wasm"
+        path.write_bytes(name.encode())
+        paths.append(str(path))
+    return paths
+
+
+def test_cache_hit_does_not_reload(tmp_path):
+    (a,) = _write_modules(tmp_path, "a")
+    cache, loader = ModuleCache(max_entries=4, max_bytes=1 << 20), _Loader()
+
+    first = asyncio.run(cache.get(a, loader))
+    second = asyncio.run(cache.get(a, loader))
+
+    assert first is second
+    assert loader.calls == [a]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_module_is_evicted(tmp_path):
+    a, b, c = _write_modules(tmp_path, "a", "b", "c")
+    evicted = []
+    cache, loader = ModuleCache(max_entries=2, max_bytes=1 << 20, on_evict=evicted.append), _Loader()
+
+    module_a = asyncio.run(cache.get(a, loader))
+    asyncio.run(cache.get(b, loader))
+    asyncio.run(cache.get(a, loader))  # a 变为最近使用，b 成为淘汰候选
+    asyncio.run(cache.get(c, loader))
+
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 1
+    assert len(evicted) == 1 and evicted[0] is not module_a
+    assert asyncio.run(cache.get(a, loader)) is module_a
+    asyncio.run(cache.get(b, loader))
+    assert loader.calls == [a, b, c, b]
+
+
+def test_byte_limit_evicts_but_keeps_newest(tmp_path):
+    a, b = _write_modules(tmp_path, "a" * 10, "b" * 10)
+    cache, loader = ModuleCache(max_entries=10, max_bytes=15), _Loader()
+
+    asyncio.run(cache.get(a, loader))
+    asyncio.run(cache.get(b, loader))
+
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == 10
+
+
+def test_changed_file_is_reloaded(tmp_path):
+    (a,) = _write_modules(tmp_path, "a")
+    cache, loader = ModuleCache(max_entries=4, max_bytes=1 << 20), _Loader()
+
+    old = asyncio.run(cache.get(a, loader))
+    (tmp_path / "a.wasm").write_bytes(b"changed")
+
+    assert asyncio.run(cache.get(a, loader)) is not old
+    assert loader.calls == [a, a]
+
+
+def test_failed_load_is_not_cached(tmp_path):
+    (a,) = _write_modules(tmp_path, "a")
+    cache, loader = ModuleCache(max_entries=4, max_bytes=1 << 20), _Loader()
+
+    async def failing(module_path, content_hash):
+        raise RuntimeError("compile failed")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(cache.get(a, failing))
+    asyncio.run(cache.get(a, loader))
+
+    assert loader.calls == [a]